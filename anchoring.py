@@ -0,0 +1,258 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+from ledger.merkle import MerkleTree
+
+# ==============================
+# チェーンへのアンカリング（記録ハッシュをまとめて1回の書き込みにする）
+# ==============================
+# 発行された記録ハッシュをバッファに溜め、N 件たまるか最古の1件が T 秒待ったら
+# その集合の Merkle 根だけをチェーンに書く。各記録は根 + 証明（O(log N) 個のハッシュ）で検証できる。
+# 書き込みが追いつかずバッファが上限に達したら、submit が空きを待つ（＝発行ワーカーが止まり、
+# 発行キューが満杯になって「混雑中」になる）。チェーンの失敗は同じバッチを指数バックオフで再送する。
+# ``store`` を渡すと確定したアンカー（根・取引・葉の位置）を永続化し、再起動後も引ける。
+# バッファに残っていた分は永続化しないので、起動時に台帳から未アンカーの記録を投入し直す前提。
+TREE_CACHE_SIZE = 64
+
+
+class AnchorBackpressure(Exception):
+    """バッファが上限のまま ``timeout`` 秒たった（呼び出し側で「混雑中」として扱う）。"""
+
+
+class LocalChain:
+    """チェーン書き込みのスタンドイン（プロセス内）。1回の書き込みに ``latency`` 秒かかる。"""
+
+    def __init__(self, latency: float = 0.2, block_time: float = 2.0):
+        self.latency = float(latency)
+        self.block_time = float(block_time)
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+        self._nonce = itertools.count()
+
+    def anchor(self, root: str, count: int) -> dict:
+        """根を1回の取引で書き、``tx_hash`` と取り込まれたブロック番号を返す。"""
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            self.writes += 1
+            nonce = next(self._nonce)
+        tx = hashlib.sha256(f"{root}:{count}:{nonce}".encode()).hexdigest()
+        return dict(tx_hash="0x" + tx, block=int((time.time() - self._t0) / self.block_time) + 1)
+
+
+@dataclass
+class Anchor:
+    seq: int
+    hashes: tuple  # バッチの記録ハッシュ（葉の順）
+    tree: MerkleTree  # 証明はここから O(log N) で作る（木を作り直さない）
+    tx_hash: str
+    block: int
+    committed_at: float
+    trigger: str  # "size" | "time" | "flush"
+
+    @property
+    def root(self) -> str:
+        return self.tree.root
+
+
+def _pct(values, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class AnchorScheduler:
+    """記録ハッシュを ``max_batch`` 件 / ``max_delay`` 秒ごとにまとめてアンカリングする。
+
+    ``chain`` は ``anchor(root, count) -> dict(tx_hash, block)`` を持つクライアント。
+    ``store``（CertificateIndex など）は ``add_anchor`` / ``lookup_anchor`` / ``anchor_hashes`` /
+    ``last_anchor_seq`` を持つ永続先。なければ直近 ``retention`` バッチ分だけをメモリで引ける。
+    """
+
+    def __init__(self, chain, max_batch: int = 64, max_delay: float = 5.0, max_pending: int = 4096,
+                 retention: int = 1024, retry_max: float = 30.0, store=None):
+        self.chain = chain
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max(0.0, float(max_delay))
+        self.max_pending = max(self.max_batch, int(max_pending))
+        self.retry_max = float(retry_max)
+        self.store = store
+        self._buf: deque = deque()  # (record_hash, 受付時刻)
+        self._cv = threading.Condition()
+        self._closing = False
+        self._seq = itertools.count((store.last_anchor_seq() if store is not None else 0) + 1)
+        self._anchors: OrderedDict = OrderedDict()
+        self._by_hash: dict = {}  # record_hash → (seq, 葉の位置)
+        self._trees: OrderedDict = OrderedDict()  # 永続先から読み直したバッチの木（seq → MerkleTree）
+        self._retention = max(1, int(retention))
+        self._recent: deque = deque(maxlen=1024)  # (件数, 書き込み秒, 最大待ち秒)
+        self._stats = dict(records=0, writes=0, by_size=0, by_time=0, failures=0,
+                           backpressure_waits=0, rejected=0, store_errors=0)
+        self._thread = threading.Thread(target=self._run, name="anchor-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, record_hashes, timeout: float | None = None):
+        """記録ハッシュを受け付ける。バッファが上限なら空くまで待つ（``timeout`` 秒で諦める）。"""
+        hashes = list(record_hashes)
+        if not hashes:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cv:
+            waited = False
+            # バッファが空なら上限を超える一括投入も受け付ける（永久に待たないため）
+            while self._buf and len(self._buf) + len(hashes) > self.max_pending and not self._closing:
+                if not waited:
+                    self._stats["backpressure_waits"] += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._stats["rejected"] += len(hashes)
+                    raise AnchorBackpressure(f"anchor buffer is full ({len(self._buf)} pending)")
+                self._cv.wait(remaining)
+            now = time.monotonic()
+            self._buf.extend((h, now) for h in hashes)
+            self._cv.notify_all()
+
+    def lookup(self, record_hash: str) -> dict | None:
+        """アンカー済みなら ``dict(root, tx_hash, block, leaf, proof, ...)``。未確定なら None。"""
+        with self._cv:
+            hit = self._by_hash.get(record_hash)
+            anchor = self._anchors.get(hit[0]) if hit else None
+        if anchor is not None:
+            seq, leaf = hit
+            return dict(seq=seq, root=anchor.root, tx_hash=anchor.tx_hash, block=anchor.block,
+                        size=len(anchor.tree), leaf=leaf, proof=anchor.tree.proof(leaf))
+        if self.store is None:
+            return None
+        row = self.store.lookup_anchor(record_hash)
+        if row is None:
+            return None
+        tree = self._stored_tree(row["seq"])
+        return dict(row, proof=tree.proof(row["leaf"]))
+
+    def _stored_tree(self, seq: int) -> MerkleTree:
+        with self._cv:
+            tree = self._trees.get(seq)
+            if tree is not None:
+                self._trees.move_to_end(seq)
+                return tree
+        tree = MerkleTree(self.store.anchor_hashes(seq))
+        with self._cv:
+            self._trees[seq] = tree
+            while len(self._trees) > TREE_CACHE_SIZE:
+                self._trees.popitem(last=False)
+        return tree
+
+    # --- スレッド ---
+    def _take(self) -> tuple | None:
+        # N 件たまる / 最古が T 秒待つ / 終了時のどれかまで待って、先頭から最大 N 件を取り出す
+        with self._cv:
+            while True:
+                if self._buf:
+                    age = time.monotonic() - self._buf[0][1]
+                    if len(self._buf) >= self.max_batch:
+                        trigger = "size"
+                        break
+                    if age >= self.max_delay:
+                        trigger = "time"
+                        break
+                    if self._closing:
+                        trigger = "flush"
+                        break
+                    self._cv.wait(self.max_delay - age)
+                elif self._closing:
+                    return None
+                else:
+                    self._cv.wait()
+            n = min(self.max_batch, len(self._buf))
+            batch = [self._buf.popleft() for _ in range(n)]
+            self._cv.notify_all()  # 空きを待っている submit を起こす
+        return batch, trigger
+
+    def _run(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            batch, trigger = taken
+            # 同じハッシュが2回入っても葉は1つ（索引の葉番号と根が食い違わないように）
+            hashes = tuple(dict.fromkeys(h for h, _ in batch))
+            tree = MerkleTree(hashes)
+            root, count = tree.root, len(hashes)
+            delay = 1.0
+            while True:
+                t0 = time.monotonic()
+                try:
+                    receipt = self.chain.anchor(root, count)
+                    break
+                except Exception:  # 同じバッチを再送する（その間に溜まった分は次のバッチへ）
+                    with self._cv:
+                        self._stats["failures"] += 1
+                        if self._closing:
+                            return
+                        self._cv.wait(delay)
+                    delay = min(self.retry_max, delay * 2)
+            now = time.monotonic()
+            self._record(Anchor(next(self._seq), hashes, tree, receipt["tx_hash"], receipt["block"],
+                                time.time(), trigger),
+                         now - t0, now - batch[0][1])
+
+    def _record(self, anchor: Anchor, write_s: float, max_wait: float):
+        if self.store is not None:
+            try:
+                self.store.add_anchor(anchor.seq, anchor.root, anchor.tx_hash, anchor.block,
+                                      anchor.hashes, anchor.committed_at)
+            except Exception:  # 永続化できなくても止めない（次回起動時に再投入される）
+                with self._cv:
+                    self._stats["store_errors"] += 1
+        with self._cv:
+            self._anchors[anchor.seq] = anchor
+            for i, h in enumerate(anchor.hashes):
+                self._by_hash.setdefault(h, (anchor.seq, i))
+            while len(self._anchors) > self._retention:
+                _, old = self._anchors.popitem(last=False)
+                for h in old.hashes:
+                    if self._by_hash.get(h, (None,))[0] == old.seq:
+                        del self._by_hash[h]
+            self._recent.append((len(anchor.hashes), write_s, max_wait))
+            self._stats["records"] += len(anchor.hashes)
+            self._stats["writes"] += 1
+            if anchor.trigger in ("size", "time"):
+                self._stats[f"by_{anchor.trigger}"] += 1
+
+    def close(self, flush: bool = True, timeout: float | None = 10.0):
+        """スレッドを止める。``flush=True`` ならバッファに残った分を書いてから。"""
+        with self._cv:
+            self._closing = True
+            if not flush:
+                self._buf.clear()
+            self._cv.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """件数・書き込み回数と、直近バッチのサイズ・書き込み時間・確定までの待ち時間。
+
+        ``saved`` は「記録1件ごとに1回書く」場合と比べて減った書き込み回数。
+        """
+        with self._cv:
+            out = dict(self._stats)
+            recent = list(self._recent)
+            out["pending"] = len(self._buf)
+        out["max_pending"] = self.max_pending
+        out["max_batch"] = self.max_batch
+        out["max_delay"] = self.max_delay
+        out["saved"] = out["records"] - out["writes"]
+        sizes = [r[0] for r in recent]
+        out["batch_mean"] = sum(sizes) / len(sizes) if sizes else 0.0
+        out["batch_max"] = max(sizes, default=0)
+        out["write_p50"] = _pct([r[1] for r in recent], 0.5)
+        out["write_p95"] = _pct([r[1] for r in recent], 0.95)
+        out["delay_p50"] = _pct([r[2] for r in recent], 0.5)
+        out["delay_p95"] = _pct([r[2] for r in recent], 0.95)
+        return out
@@ -0,0 +1,292 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+import streamlit as st
+import metrics
+from circuit_breaker import CircuitBreaker
+from response_cache import ResponseCache, ValidatorCache, make_key
+from shared_cache import SharedCircuitBreaker, SharedResponseCache, SharedStore
+
+# 高速JSONデコーダ（任意依存。入っていれば大きい本文のデコードに使う）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# requests / urllib3 は最初の通信時に import する（起動直後の描画を待たせない）
+if TYPE_CHECKING:
+    import requests
+    from urllib3.util.retry import Retry
+
+# ==============================
+# 接続設定（環境変数/Secrets対応）
+# ==============================
+DEFAULT_API_BASE = "https://teamx-quest-api-234584649227.asia-northeast1.run.app"
+
+
+def get_setting(name: str, default):
+    # 優先順: 1) OS環境変数 2) Streamlit Secrets 3) デフォルト
+    raw = os.getenv(name)
+    if raw is None:
+        try:
+            raw = st.secrets.get(name, None)
+        except Exception:
+            raw = None
+    if raw is None:
+        return default
+    try:
+        return type(default)(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+API_BASE_URL = get_setting("API_BASE_URL", DEFAULT_API_BASE)
+
+# 接続タイムアウトと読み取りタイムアウトは分けて管理する
+CONNECT_TIMEOUT = get_setting("API_CONNECT_TIMEOUT", 2.0)
+READ_TIMEOUT = get_setting("API_READ_TIMEOUT", 5.0)
+
+# コネクションプール（全セッション共有）
+POOL_CONNECTIONS = get_setting("API_POOL_CONNECTIONS", 4)
+POOL_MAXSIZE = get_setting("API_POOL_MAXSIZE", 32)
+
+# リトライ（接続エラーと一時的な5xxのみ、ジッター付き指数バックオフ）
+RETRY_TOTAL = get_setting("API_RETRY_TOTAL", 2)
+RETRY_BACKOFF = get_setting("API_RETRY_BACKOFF", 0.2)
+RETRY_JITTER = get_setting("API_RETRY_JITTER", 0.1)
+RETRY_STATUS = (502, 503, 504)
+
+# レスポンスキャッシュ（TTL秒 / 期限切れ後に古い値を返してよい秒数 / 最大件数）
+CACHE_TTL = get_setting("API_CACHE_TTL", 60.0)
+CACHE_STALE_TTL = get_setting("API_CACHE_STALE_TTL", 600.0)
+CACHE_MAX_ENTRIES = get_setting("API_CACHE_MAX_ENTRIES", 128)
+
+# サーキットブレーカー（連続失敗回数 / OPEN を維持する秒数）
+BREAKER_FAILURES = get_setting("API_BREAKER_FAILURES", 3)
+BREAKER_RESET = get_setting("API_BREAKER_RESET", 30.0)
+
+# この本文サイズ（バイト）以上なら orjson でデコードする
+FAST_JSON_MIN_BYTES = get_setting("API_FAST_JSON_MIN_BYTES", 16384)
+
+# 画面で使うフィールドだけを抜き出してキャッシュする（0 で本文をそのまま保持）
+EXTRACT_FIELDS = str(get_setting("API_EXTRACT_FIELDS", "1")).lower() not in ("0", "false", "off")
+
+# ワーカー間共有キャッシュ（SQLiteファイル。空文字 / off でプロセス内キャッシュのみ）
+SHARED_CACHE_PATH = get_setting(
+    "API_SHARED_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "api.sqlite")
+)
+# 他ワーカーの取得結果を待つ上限（秒）
+SHARED_CACHE_WAIT = get_setting("API_SHARED_CACHE_WAIT", 2.0)
+
+
+def _build_retry() -> "Retry":
+    from urllib3.util.retry import Retry
+
+    kwargs = dict(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=RETRY_JITTER, **kwargs)
+    except TypeError:
+        # urllib3 < 2 はジッター未対応
+        return Retry(**kwargs)
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> "requests.Session":
+    # プロセス全体で1つの Session を共有し、TCP/TLS 接続を再利用する
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import make_headers
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=_build_retry(),
+        pool_block=False,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept": "application/json",
+        # gzip/deflate に加え、brotli / zstandard が入っていればそれも受け付ける
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+        "Connection": "keep-alive",
+        "User-Agent": "teamx-blockchain-moc/1.0",
+    })
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_validator_cache() -> ValidatorCache:
+    return ValidatorCache(max_entries=CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_store() -> SharedStore | None:
+    # 作れない環境（読み取り専用FSなど）ではプロセス内キャッシュにフォールバック
+    if not SHARED_CACHE_PATH or SHARED_CACHE_PATH.lower() in ("0", "off", "false"):
+        return None
+    try:
+        return SharedStore(SHARED_CACHE_PATH)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> ResponseCache | SharedResponseCache:
+    store = get_shared_store()
+    if store is None:
+        return ResponseCache(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, stale_ttl=CACHE_STALE_TTL)
+    return SharedResponseCache(
+        store, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, stale_ttl=CACHE_STALE_TTL,
+        lease_ttl=CONNECT_TIMEOUT + READ_TIMEOUT * (RETRY_TOTAL + 1), wait=SHARED_CACHE_WAIT,
+        namespace=API_BASE_URL,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_circuit_breaker() -> CircuitBreaker | SharedCircuitBreaker:
+    store = get_shared_store()
+    if store is None:
+        return CircuitBreaker(failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET)
+    return SharedCircuitBreaker(
+        store, name=API_BASE_URL, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET,
+        trial_ttl=CONNECT_TIMEOUT + READ_TIMEOUT,
+    )
+
+
+def api_health() -> dict:
+    # 全セッション共通の API 状態（state / last_ok / retry_in）
+    return get_circuit_breaker().health()
+
+
+def api_get(path: str, params: dict | None = None, timeout=None, headers: dict | None = None) -> "requests.Response":
+    # timeout は (connect, read) のタプル。単一値が渡されたら read 側に使う
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    elif not isinstance(timeout, tuple):
+        timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+    return get_http_session().get(f"{API_BASE_URL}{path}", params=params, timeout=timeout, headers=headers)
+
+
+def _guarded_get(path: str, params: dict | None = None, timeout=None, headers: dict | None = None):
+    # ブレーカー OPEN 中は通信せず None を返す。結果はブレーカーに反映する
+    breaker = get_circuit_breaker()
+    if not breaker.allow():
+        return None
+    import requests
+
+    ok = False
+    try:
+        r = api_get(path, params=params, timeout=timeout, headers=headers)
+        ok = r.status_code < 500
+        return r
+    except requests.RequestException:
+        return None
+    finally:
+        # 想定外の例外でも必ず結果を反映する（HALF_OPEN の試行枠を塞いだままにしない）
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+
+def ping_api(timeout=3) -> bool:
+    r = _guarded_get("/api/v1/quests/available", timeout=timeout)
+    return r is not None and r.status_code == 200
+
+
+def decode_json(r: "requests.Response"):
+    # 大きい本文は orjson（あれば）で。どちらも失敗時は ValueError
+    body = r.content
+    if orjson is not None and len(body) >= FAST_JSON_MIN_BYTES:
+        return orjson.loads(body)
+    return r.json()
+
+
+def extract_fields(data, spec):
+    """``spec`` に挙げたキーだけを残す。
+
+    spec は ``True``（そのまま）か ``{キー: 子spec}`` の dict。リストには各要素へ
+    同じ spec を適用し、``"_limit"`` があれば先頭からその件数だけ残す。
+    """
+    if spec is True:
+        return data
+    if isinstance(data, list):
+        limit = spec.get("_limit")
+        return [extract_fields(v, spec) for v in (data if limit is None else data[:limit])]
+    if isinstance(data, dict):
+        return {k: extract_fields(data[k], sub) for k, sub in spec.items()
+                if not k.startswith("_") and k in data}
+    return data
+
+
+def hit_api(path: str, params: dict | None = None, timeout=None, fields: dict | None = None,
+            revalidate: bool = True):
+    # 共有 Session（keep-alive・コネクションプール・リトライ付き）経由で取得。
+    # 前回の ETag / Last-Modified があれば条件付きで送り、304 なら前回の本文を返す。
+    # revalidate=False は呼び出し側が結果を保持する場合（本文を検証用キャッシュに重複して持たない）
+    validators = get_validator_cache()
+    key = make_key(path, params, fields)
+    prev = validators.get(key) if revalidate else None
+    headers = None
+    if prev is not None:
+        etag, last_modified, _ = prev
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    t0 = time.perf_counter()
+    r = _guarded_get(path, params=params, timeout=timeout, headers=headers)
+    if metrics.ENABLED:
+        metrics.observe("api_request_seconds", time.perf_counter() - t0,
+                        endpoint=path, status=r.status_code if r is not None else "unavailable")
+    if prev is not None and r is not None:
+        validators.record(r.status_code == 304)
+    if r is not None and r.status_code == 304 and prev is not None:
+        return prev[2], True
+    if r is None or r.status_code != 200:
+        return {}, False
+    try:
+        data = decode_json(r)
+    except ValueError:
+        return {}, False
+    if fields and EXTRACT_FIELDS:
+        data = extract_fields(data, fields)
+    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    if revalidate and (etag or last_modified):
+        validators.put(key, etag, last_modified, data)
+    return data, True
+
+
+def cached_hit_api(path: str, params: dict | None = None, fields: dict | None = None):
+    # 成功レスポンスのみキャッシュ。期限切れは古い値を返しつつ裏で再取得（条件付きリクエスト）
+    cache, key = get_response_cache(), make_key(path, params, fields)
+    if not metrics.ENABLED:
+        return cache.get_or_load(key, lambda: hit_api(path, params=params, fields=fields))
+
+    # 呼び出しスレッドでローダーが動いたらミス（裏の再取得は stale ヒット扱い）
+    caller, loaded = threading.get_ident(), []
+
+    def loader():
+        if threading.get_ident() == caller:
+            loaded.append(True)
+        return hit_api(path, params=params, fields=fields)
+
+    t0 = time.perf_counter()
+    res = cache.get_or_load(key, loader)
+    metrics.observe("api_call_seconds", time.perf_counter() - t0,
+                    endpoint=path, cache="miss" if loaded else "hit")
+    return res
@@ -0,0 +1,60 @@
+"""アンカリングのバッチ設定（N 件 / T 秒）ごとの書き込み削減と確定までの待ちを計測する。
+
+    python bench/anchor_batching.py --rate 100 --seconds 3 --latency 0.05 --configs 1:0,16:1,64:2,256:5
+
+一定のレート（件/秒）で記録ハッシュを投入し、スタンドインのチェーン（1書き込み ``--latency`` 秒）に
+アンカリングする。各設定について、書き込み回数・「1件ずつ書く」場合に比べた削減数・
+バッチサイズ・書き込み時間・確定までの待ち（p50/p95）と、バックプレッシャーで待った回数を出す。
+``1:0`` は現状の「記録1件ごとに1回書く」に相当する（書き込みが追いつかず投入側が待たされる）。
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anchoring import AnchorScheduler, LocalChain  # noqa: E402
+
+
+def run(rate: float, seconds: float, latency: float, max_batch: int, max_delay: float,
+        max_pending: int) -> tuple:
+    sched = AnchorScheduler(LocalChain(latency=latency), max_batch=max_batch, max_delay=max_delay,
+                            max_pending=max_pending)
+    total = int(rate * seconds)
+    t0 = time.monotonic()
+    for i in range(total):
+        # 予定時刻まで待ってから投入する（遅れていれば待たずに続ける）
+        wait = t0 + i / rate - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        sched.submit([hashlib.sha256(str(i).encode()).hexdigest()])
+    submit_s = time.monotonic() - t0
+    sched.close(flush=True, timeout=None)
+    return sched.stats(), total / submit_s
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rate", type=float, default=100.0, help="投入レート（件/秒）")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--latency", type=float, default=0.05, help="チェーン1書き込みの所要秒")
+    ap.add_argument("--max-pending", type=int, default=64, help="バッファ上限（超えると投入側が待つ）")
+    ap.add_argument("--configs", default="1:0,16:1,64:2,256:5", help="N:T（件:秒）のカンマ区切り")
+    args = ap.parse_args()
+
+    print(f"rate={args.rate:g}/s seconds={args.seconds:g} latency={args.latency * 1000:.0f} ms "
+          f"max_pending={args.max_pending}")
+    print(f"{'N:T':>8} {'records':>8} {'writes':>7} {'saved':>7} {'batch':>6} {'write p95':>10} "
+          f"{'delay p50':>10} {'delay p95':>10} {'bp waits':>9} {'achieved/s':>11}")
+    for spec in args.configs.split(","):
+        n, t = spec.split(":")
+        s, achieved = run(args.rate, args.seconds, args.latency, int(n), float(t), args.max_pending)
+        print(f"{spec:>8} {s['records']:>8,} {s['writes']:>7,} {s['saved']:>7,} {s['batch_mean']:>6.1f} "
+              f"{s['write_p95'] * 1000:>8.0f}ms {s['delay_p50']:>9.2f}s {s['delay_p95']:>9.2f}s "
+              f"{s['backpressure_waits']:>9,} {achieved:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""チェーン読み出しのスループットを、単発 / JSON-RPC バッチ / 確定済みキャッシュで比較する。
+
+    python bench/chain_rpc.py --calls 2000 --latency 20 --batch 100
+
+ローカルのスタンドインノード（HTTP 1往復に ``--latency`` ミリ秒）に ``--anchors`` 件の根を書き、
+``anchoredAt(root)`` の eth_call を ``--calls`` 回読む。比較するのは次の4つ:
+  - 接続を使い回さない単発呼び出し（要求ごとに新しい接続）
+  - プール済み接続での単発呼び出し
+  - ``--batch`` 件ずつの JSON-RPC バッチ
+  - 確定済みの高さを指定した2回目以降（キャッシュから返り、往復しない）
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+from chain_client import SEL_ANCHORED_AT, ChainClient, word  # noqa: E402
+from chain_node import LocalNode  # noqa: E402
+
+
+def report(label: str, calls: int, seconds: float, http: int):
+    print(f"{label:<22} {calls / seconds:>10,.0f} calls/s {seconds * 1000:>9.0f} ms {http:>7,} HTTP")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--anchors", type=int, default=50)
+    ap.add_argument("--latency", type=float, default=20.0, help="HTTP 1往復の遅延（ミリ秒）")
+    ap.add_argument("--batch", type=int, default=100, help="1回の POST にまとめる呼び出し数")
+    ap.add_argument("--single-max", type=int, default=200, help="単発呼び出しで実際に測る回数の上限")
+    args = ap.parse_args()
+
+    with LocalNode(latency=0, block_time=0) as node:
+        client = ChainClient(node.url, max_batch=args.batch, confirmations=0)
+        roots = [f"{i:064x}" for i in range(1, args.anchors + 1)]
+        for r in roots:
+            client.anchor(r, 1)
+        head = client.head()
+        node.latency = args.latency / 1000
+        queries = [roots[i % len(roots)] for i in range(args.calls)]
+        single_n = min(args.calls, args.single_max)
+        print(f"calls={args.calls:,} anchors={args.anchors} latency={args.latency:g} ms batch={args.batch} "
+              f"(単発は {single_n} 回で測定)")
+
+        # 接続を使い回さない単発（requests.post を毎回）
+        t0 = time.perf_counter()
+        for i, r in enumerate(queries[:single_n]):
+            body = dict(jsonrpc="2.0", id=i, method="eth_call",
+                        params=[dict(to=client.contract, data=SEL_ANCHORED_AT + word(r)), "latest"])
+            requests.post(node.url, data=json.dumps(body), headers={"Connection": "close"},
+                          timeout=5).json()
+        report("single / no pool", single_n, time.perf_counter() - t0, single_n)
+
+        # プール済み接続での単発（"latest" なのでキャッシュされない）
+        c = ChainClient(node.url, max_batch=args.batch, confirmations=0)
+        t0 = time.perf_counter()
+        for r in queries[:single_n]:
+            c.anchored_at([r])
+        report("single / pooled", single_n, time.perf_counter() - t0, c.stats()["http_requests"])
+
+        # バッチ（重複は anchored_at が1回にまとめるので、ここでは生の batch を使う）
+        c = ChainClient(node.url, max_batch=args.batch, confirmations=0)
+        calls = [("eth_call", [dict(to=c.contract, data=SEL_ANCHORED_AT + word(r)), "latest"]) for r in queries]
+        t0 = time.perf_counter()
+        out = c.batch(calls)
+        report(f"batch x{args.batch}", len(calls), time.perf_counter() - t0, c.stats()["http_requests"])
+        assert all(int(v, 16) for v in out)
+
+        # 確定済みの高さを指定: 1回目で埋まり、2回目以降は往復しない
+        pinned = [(m, [p[0], hex(head)]) for m, p in calls]
+        c.batch(pinned)
+        before = c.stats()["http_requests"]
+        t0 = time.perf_counter()
+        c.batch(pinned)
+        report("batch / finalized hit", len(pinned), time.perf_counter() - t0, c.stats()["http_requests"] - before)
+
+
+if __name__ == "__main__":
+    main()
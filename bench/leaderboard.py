@@ -0,0 +1,90 @@
+"""ランキングの更新・順位参照のスループットとメモリを計測する。
+
+    python bench/leaderboard.py --users 1000000 --updates 200000 --k 100
+
+``--users`` 人分のスコアからランキングを作り、ランダムなユーザーへの加点（発行1件に相当）と
+順位参照・上位K件の取得を繰り返して 1 秒あたりの件数を出す。
+比較として「更新のたびに全ユーザーを並べ直す」素朴な方法を ``--naive`` 回だけ測る。
+メモリは tracemalloc で、スコア辞書（台帳の集計に相当）を除いたランキング本体の分を出す。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger.leaderboard import Leaderboard  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--updates", type=int, default=200_000)
+    ap.add_argument("--queries", type=int, default=200_000)
+    ap.add_argument("--k", type=int, default=100)
+    ap.add_argument("--naive", type=int, default=3, help="素朴な並べ直しの計測回数（0 で省略）")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    names = [f"user{i:07d}" for i in range(args.users)]
+    scores = {n: rng.randrange(0, 5000) for n in names}
+
+    t0 = time.perf_counter()
+    board = Leaderboard.from_scores(scores.items(), k=args.k)
+    build_s = time.perf_counter() - t0
+
+    # board.scores は台帳側の集計と同じ内容なので、それ以外（BIT・ヒープ・索引）を本体として出す
+    tracemalloc.start()
+    probe = Leaderboard.from_scores(scores.items(), k=args.k)
+    total = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    dict_bytes = sys.getsizeof(probe.scores)
+    del probe
+    print(f"users={args.users:,} k={args.k} build={build_s * 1000:.0f} ms  "
+          f"memory: ranking {(total - dict_bytes) / 2**10:,.0f} KiB + score dict {dict_bytes / 2**20:.1f} MiB")
+
+    picks = [rng.choice(names) for _ in range(max(args.updates, args.queries))]
+    gains = [rng.randrange(1, 101) for _ in range(args.updates)]
+
+    t0 = time.perf_counter()
+    for name, gain in zip(picks, gains):
+        board.update(name, board.scores[name] + gain)
+    dt = time.perf_counter() - t0
+    print(f"update: {args.updates / dt:,.0f}/s ({dt / args.updates * 1e6:.2f} us each)")
+
+    t0 = time.perf_counter()
+    for name in picks[:args.queries]:
+        board.rank(name)
+    dt = time.perf_counter() - t0
+    print(f"rank:   {args.queries / dt:,.0f}/s ({dt / args.queries * 1e6:.2f} us each)")
+
+    reps = 1000
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        board.top(10)
+    dt = time.perf_counter() - t0
+    print(f"top10:  {reps / dt:,.0f}/s ({dt / reps * 1e6:.2f} us each)")
+
+    # 検算: 上位K件と数人の順位を全件ソートと突き合わせる
+    ranked = sorted(board.scores.values(), reverse=True)
+    assert [s for _, _, s in board.top(args.k)] == ranked[:args.k]
+    for name in picks[:20]:
+        s = board.scores[name]
+        assert board.rank(name)[0] == 1 + sum(1 for v in ranked if v > s)
+
+    if args.naive:
+        t0 = time.perf_counter()
+        for name, gain in zip(picks[:args.naive], gains):
+            board.scores[name] += gain
+            order = sorted(board.scores, key=board.scores.__getitem__, reverse=True)
+            order.index(name)
+        dt = (time.perf_counter() - t0) / args.naive
+        print(f"naive re-sort per update: {dt * 1000:.0f} ms ({1 / dt:,.1f}/s)")
+
+
+if __name__ == "__main__":
+    main()
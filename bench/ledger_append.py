@@ -0,0 +1,50 @@
+"""台帳の追記スループット計測。
+
+    python bench/ledger_append.py --blocks 20000 --writers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import Ledger, Record  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--blocks", type=int, default=20000)
+    ap.add_argument("--writers", type=int, default=8)
+    ap.add_argument("--no-durable", action="store_true", help="fsync を待たずに返す")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        ledger = Ledger(d)
+        per_writer = args.blocks // args.writers
+
+        def writer(w):
+            for i in range(per_writer):
+                rec = Record(name=f"user{w}-{i}", course="Python基礎講座", score=i % 100, date="2025-08-30")
+                ledger.append([rec], durable=not args.no_durable)
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ledger.sync()
+        elapsed = time.perf_counter() - t0
+        stats = ledger.stats()
+        ledger.close()
+
+    total = per_writer * args.writers
+    print(f"appends: {total}  elapsed: {elapsed:.2f}s  throughput: {total / elapsed:,.0f} blocks/s")
+    print(f"fsyncs: {stats['fsyncs']}  max group: {stats['max_group']}  segments: {stats['segments']}")
+
+
+if __name__ == "__main__":
+    main()
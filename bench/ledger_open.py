@@ -0,0 +1,73 @@
+"""台帳のコールドスタート時間を履歴の長さごとに計測する。
+
+    python bench/ledger_open.py --records 1000,100000,1000000 --per-block 1000
+
+各件数の台帳を一時ディレクトリに作って閉じ、開き直して
+「open（索引の mmap・末尾の確認・スナップショット読み込み）」と
+「最初の集計参照（スナップショット以降のブロックの反映）」の時間を測る。
+比較としてスナップショットを消した状態（全ブロックを反映し直す）も測る。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import Ledger, Record  # noqa: E402
+from ledger.snapshot import list_snapshots  # noqa: E402
+
+
+def build(path: str, records: int, per_block: int, segment_bytes: int):
+    ledger = Ledger(path, segment_max_bytes=segment_bytes, snapshot_every=10)
+    for start in range(0, records, per_block):
+        n = min(per_block, records - start)
+        ledger.append([
+            Record(name=f"user{(start + i) % 997}", course="Python基礎講座", score=(start + i) % 100,
+                   date="2025-08-30", kind="certificate" if i % 10 == 0 else "course")
+            for i in range(n)
+        ], durable=False)
+    ledger.close()  # 閉じるときに最終スナップショットを書く
+
+
+def cold_start(path: str, segment_bytes: int) -> tuple:
+    t0 = time.perf_counter()
+    ledger = Ledger(path, segment_max_bytes=segment_bytes, snapshot_every=0)
+    t1 = time.perf_counter()
+    ledger.user_stats("user0")
+    t2 = time.perf_counter()
+    summary = ledger.state_summary()
+    ledger.close()
+    return (t1 - t0) * 1000, (t2 - t1) * 1000, summary
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", default="1000,100000", help="計測する記録件数（カンマ区切り）")
+    ap.add_argument("--per-block", type=int, default=1000)
+    ap.add_argument("--segment-mb", type=float, default=4.0, help="セグメントの上限（MiB）")
+    args = ap.parse_args()
+    segment_bytes = int(args.segment_mb * 1024 * 1024)
+
+    print(f"{'records':>12} {'blocks':>8} {'archives':>8} {'open ms':>9} {'state ms':>9} "
+          f"{'no-snap open':>13} {'no-snap state':>14}")
+    for records in (int(x) for x in args.records.split(",")):
+        d = tempfile.mkdtemp(prefix="ledger-open-")
+        try:
+            build(d, records, args.per_block, segment_bytes)
+            archives = sum(1 for f in os.listdir(d) if f.endswith(".arc"))
+            open_ms, state_ms, summary = cold_start(d, segment_bytes)
+            for _, p in list_snapshots(d):
+                os.remove(p)
+            open2, state2, summary2 = cold_start(d, segment_bytes)
+            assert summary["tip_hash"] == summary2["tip_hash"] and summary["records"] == summary2["records"]
+            print(f"{records:>12,} {summary['height']:>8,} {archives:>8} {open_ms:>9.2f} {state_ms:>9.2f} "
+                  f"{open2:>13.2f} {state2:>14.2f}")
+        finally:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""複数セッションの負荷試験（1プロセス = Streamlit ワーカー1つ分）。
+
+    python bench/load.py --sessions 16 --rounds 2 --latency 80 --error-rate 0.02
+
+AppTest でセッションを N 個作り、それぞれステップ 0→4 を最後まで進めて
+「最初から見る」で戻る流れを --rounds 回繰り返す。API はローカルのスタブ
+（bench/stub_api.py）に向け、台帳は一時ディレクトリに作る。
+再実行レイテンシの p50/p95/p99、スループット、ピークRSSを表示し、
+結果を bench/results/ に JSON で保存する（--compare で前回と比較）。
+
+AppTest はスレッドセーフではない（再実行ごとにグローバルな Runtime を差し替える）
+ため、スクリプトの実行自体は1本ずつ直列化している。セッション・発行ワーカー・
+先読み・API 呼び出しはすべて並行に動く。再実行時間（rerun）はスクリプト実行
+そのもの、応答時間（response）は実行待ちの行列を含めた値。
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_api import QUESTS_PATH, StubAPI  # noqa: E402
+
+APP = os.path.join(ROOT, "streamlit_app.py")
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+SKIP_LABELS = ("接続テスト", "接続テストを実行")
+RESET_LABEL = "🔄 最初から見る"
+MAX_CLICKS = 20  # 1周あたりのクリック上限（進めなくなったら打ち切り）
+
+_SCRIPT_LOCK = threading.Lock()
+
+
+def pct(values, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, max(0, int(round(q * len(s))) - 1))]
+
+
+def rss_kb() -> int:
+    # 現在の常駐メモリ（Linux の /proc から。無ければ最大値で代用）
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+class Session:
+    """1ユーザー分の操作。各再実行の所要時間を ``timings`` に記録する。"""
+
+    def __init__(self, sid: int, poll: float, think: float, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.sid = sid
+        self.poll = poll
+        self.think = think
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.timings = []
+        self.responses = []
+        self.flows = []
+        self.errors = []
+
+    def _run(self, fn):
+        t0 = time.perf_counter()
+        with _SCRIPT_LOCK:
+            t1 = time.perf_counter()
+            fn()
+            t2 = time.perf_counter()
+        self.timings.append(t2 - t1)
+        self.responses.append(t2 - t0)
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def _next_button(self):
+        for b in self.at.button:
+            if b.label and b.label not in SKIP_LABELS and not b.disabled:
+                return b
+        return None
+
+    def _busy(self) -> bool:
+        return any(b.label.startswith("⏳") for b in self.at.button)
+
+    def run(self, rounds: int):
+        try:
+            self._run(self.at.run)
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                for _ in range(MAX_CLICKS):
+                    # 発行ジョブ待ちはブラウザ側のポーリングと同じ間隔で再実行する
+                    while self._busy():
+                        time.sleep(self.poll)
+                        self._run(self.at.run)
+                    btn = self._next_button()
+                    if btn is None:
+                        raise RuntimeError(f"no button to click at step {self.at.session_state['demo_step']}")
+                    label = btn.label
+                    if self.think:
+                        time.sleep(self.think)
+                    self._run(btn.click().run)
+                    if label == RESET_LABEL:
+                        break
+                else:
+                    raise RuntimeError("flow did not reach the last step")
+                self.flows.append(time.perf_counter() - t0)
+        except Exception as e:  # 1セッションの失敗で全体を止めない
+            self.errors.append(f"session {self.sid}: {e}")
+
+
+def run_load(args) -> dict:
+    sessions = [Session(i, args.poll, args.think / 1000, args.timeout) for i in range(args.sessions)]
+    peak = [rss_kb()]
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.wait(0.1):
+            peak[0] = max(peak[0], rss_kb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=s.run, args=(args.rounds,), name=f"session-{s.sid}")
+               for s in sessions]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+        if args.ramp:
+            time.sleep(args.ramp / 1000)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    sampler.join()
+
+    timings = [x for s in sessions for x in s.timings]
+    responses = [x for s in sessions for x in s.responses]
+    flows = [x for s in sessions for x in s.flows]
+    errors = [e for s in sessions for e in s.errors]
+    return dict(
+        elapsed=elapsed,
+        reruns=len(timings),
+        flows=len(flows),
+        errors=errors,
+        rerun_ms=dict(
+            mean=statistics.mean(timings) * 1000 if timings else 0.0,
+            p50=pct(timings, 0.50) * 1000, p95=pct(timings, 0.95) * 1000,
+            p99=pct(timings, 0.99) * 1000, max=max(timings, default=0.0) * 1000,
+        ),
+        response_ms=dict(
+            p50=pct(responses, 0.50) * 1000, p95=pct(responses, 0.95) * 1000,
+            p99=pct(responses, 0.99) * 1000, max=max(responses, default=0.0) * 1000,
+        ),
+        flow_s=dict(p50=pct(flows, 0.50), p95=pct(flows, 0.95)),
+        reruns_per_s=len(timings) / elapsed if elapsed else 0.0,
+        flows_per_s=len(flows) / elapsed if elapsed else 0.0,
+        peak_rss_mb=max(peak[0], resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) / 1024,
+    )
+
+
+def print_result(res: dict, prev: dict | None = None):
+    r, p = res["result"], res["params"]
+
+    def line(label, key, fmt, sub=None):
+        cur = r[key] if sub is None else r[key][sub]
+        out = f"  {label:<18}{fmt.format(cur)}"
+        if prev is not None:
+            old = prev["result"][key] if sub is None else prev["result"][key][sub]
+            if old:
+                out += f"   (prev {fmt.format(old)}, {(cur - old) / old * 100:+.1f}%)"
+        print(out)
+
+    print(f"{p['sessions']} sessions x {p['rounds']} rounds, API latency {p['latency']} ms, "
+          f"error rate {p['error_rate']}, quests {p['quests']} ({r['elapsed']:.1f}s, rev {res['rev'] or '?'})")
+    line("rerun p50 ms", "rerun_ms", "{:.1f}", "p50")
+    line("rerun p95 ms", "rerun_ms", "{:.1f}", "p95")
+    line("rerun p99 ms", "rerun_ms", "{:.1f}", "p99")
+    line("response p95 ms", "response_ms", "{:.1f}", "p95")
+    line("response p99 ms", "response_ms", "{:.1f}", "p99")
+    line("reruns/s", "reruns_per_s", "{:.1f}")
+    line("flows/s", "flows_per_s", "{:.2f}")
+    line("flow p95 s", "flow_s", "{:.2f}", "p95")
+    line("peak RSS MB", "peak_rss_mb", "{:.1f}")
+    print(f"  {'completed flows':<18}{r['flows']} / {p['sessions'] * p['rounds']}, "
+          f"stub requests {r.get('stub', {}).get('requests', 0)}")
+    for e in r["errors"][:10]:
+        print(f"  ! {e}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--rounds", type=int, default=1, help="各セッションが 0→4 を通す回数")
+    ap.add_argument("--ramp", type=float, default=50.0, help="セッション開始間隔（ミリ秒）")
+    ap.add_argument("--think", type=float, default=0.0, help="クリック前の待ち時間（ミリ秒）")
+    ap.add_argument("--poll", type=float, default=0.5, help="発行待ちの再実行間隔（秒）")
+    ap.add_argument("--timeout", type=float, default=60.0, help="1回の再実行のタイムアウト（秒）")
+    ap.add_argument("--latency", type=float, default=50.0, help="スタブAPIの応答遅延（ミリ秒）")
+    ap.add_argument("--jitter", type=float, default=0.0, help="スタブAPIの遅延ゆらぎ（ミリ秒）")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="スタブAPIが 503 を返す割合")
+    ap.add_argument("--quests", type=int, default=20, help="クエスト一覧の件数（ペイロードサイズ）")
+    ap.add_argument("--api-url", default=None, help="スタブを起動せず既存のAPIを使う")
+    ap.add_argument("--out", default=None, help="結果JSONの保存先（既定: bench/results/load-<日時>.json）")
+    ap.add_argument("--compare", default=None, help="比較する過去の結果JSON")
+    args = ap.parse_args()
+
+    stub = None
+    if args.api_url is None:
+        stub = StubAPI(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                       error_rate=args.error_rate, quests=args.quests).start()
+    ledger_dir = tempfile.mkdtemp(prefix="load-ledger-")
+    # アプリのモジュールは設定をimport時に読むので、AppTest を作る前に環境変数を入れる
+    os.environ["API_BASE_URL"] = args.api_url or stub.url
+    os.environ["LEDGER_DIR"] = ledger_dir
+    os.environ["API_SHARED_CACHE"] = os.path.join(ledger_dir, "api-cache.sqlite")
+    os.environ.setdefault("ISSUANCE_POLL", str(args.poll))
+
+    try:
+        result = run_load(args)
+    finally:
+        if stub is not None:
+            stub.stop()
+    if stub is not None:
+        result["stub"] = dict(stub.counts, payload_bytes=len(stub.payloads[QUESTS_PATH]))
+
+    res = dict(
+        rev=git_rev(),
+        at=datetime.now().isoformat(timespec="seconds"),
+        params={k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        result=result,
+    )
+    prev = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            prev = json.load(f)
+    print_result(res, prev)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(res, f, ensure_ascii=False, indent=2)
+    print(f"saved {out}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
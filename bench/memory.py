@@ -0,0 +1,95 @@
+"""セッションあたりのメモリ（記録履歴 + サンプル履歴HTML）を旧形式と比較する。
+
+    python bench/memory.py --sessions 2000 --records 20
+
+旧形式は「dict のリスト + 64文字の16進ハッシュ + セッションごとに組み立てるサンプルHTML」、
+新形式は「HistoryRecord（32バイトのダイジェスト・intern した文字列）を上限付きで保持 +
+プロセス共有のサンプルHTML」。どちらもジョブ結果を JSON から復元した文字列（セッションごとに
+別オブジェクト）で作り、セッションに残った確保量を tracemalloc で測る。
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history import HistoryRecord, RecordHistory  # noqa: E402
+
+COURSES = ("Python基礎講座", "データ分析入門", "機械学習基礎", "地域農産物PR用SNS運用")
+
+
+def job_results(sid: int, n: int) -> list:
+    # 発行ワーカーから届く結果と同じく、毎回デコードされた別々の文字列にする
+    out = []
+    for i in range(n):
+        payload = dict(name="拓叶", course=COURSES[i % len(COURSES)], score=80 + i % 20, date="2025-08-30",
+                       hash=hashlib.sha256(f"{sid}-{i}".encode()).hexdigest(), block=sid * n + i)
+        out.append(json.loads(json.dumps(payload, ensure_ascii=False)))
+    return out
+
+
+def legacy_sample_md() -> str:
+    # 旧 pages/03_overview.py と同じくセッションごとに組み立てる
+    rows = [("Python基礎講座", 95), ("データ分析入門", 88), ("機械学習基礎", 92)]
+    return "<h3>🔍 検証可能な学習履歴</h3>" + "".join(
+        f"""<div class="highlight-box" style="margin-bottom:.5rem; padding:.8rem;">
+    <p style="margin:0;"><strong>{t}</strong> ({s}点)</p>
+    <p style="font-size:.7rem; color:#666; margin:.3rem 0 0 0;">Hash: {hashlib.sha256(f"{t}-{s}".encode()).hexdigest()[:20]}...</p>
+    </div>""" for t, s in rows)
+
+
+def build_legacy(results: list) -> dict:
+    # 旧 streamlit_app.py: ジョブ結果の文字列をそのまま dict に入れて保持
+    records = [dict(name=r["name"], course=r["course"], score=r["score"], hash=r["hash"], date=r["date"],
+                    block=r["block"]) for r in results]
+    return dict(records=records, sample_md=legacy_sample_md())
+
+
+def build_compact(results: list, history_max: int, shared_md: str) -> dict:
+    history = RecordHistory(history_max)
+    for r in results:
+        history.append(HistoryRecord.from_hex(r["name"], r["course"], r["score"], r["hash"], r["date"], r["block"]))
+    return dict(records=history, sample_md=shared_md)
+
+
+def measure(build, sessions: int, records: int) -> int:
+    # ジョブ結果はセッションごとに作って捨て、セッションに残った分だけを数える
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    alive = [build(job_results(sid, records)) for sid in range(sessions)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del alive
+    return used
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=2000)
+    ap.add_argument("--records", type=int, default=20, help="1セッションあたりの記録件数")
+    ap.add_argument("--history-max", type=int, default=50, help="新形式で保持する履歴の上限")
+    args = ap.parse_args()
+
+    shared_md = legacy_sample_md()  # 新形式は cache_resource の1つを全セッションで参照
+    for c in COURSES:
+        sys.intern(c)  # 講座名の intern は初回の1回だけなので計測の外で済ませる
+
+    before = measure(build_legacy, args.sessions, args.records)
+    after = measure(lambda r: build_compact(r, args.history_max, shared_md), args.sessions, args.records)
+    kept = min(args.records, args.history_max)
+
+    print(f"{args.sessions} sessions x {args.records} records (history max {args.history_max}, kept {kept})")
+    print(f"  before  {before / args.sessions:10,.0f} bytes/session  ({before / 2**20:.1f} MiB)")
+    print(f"  after   {after / args.sessions:10,.0f} bytes/session  ({after / 2**20:.1f} MiB)")
+    print(f"  saved   {(1 - after / before) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
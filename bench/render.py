@@ -0,0 +1,48 @@
+"""再実行1回あたりの描画時間と送信バイト数（Markdown要素の合計）を計測する。
+
+    python bench/render.py --step 4 --reruns 50
+
+変更前後のリビジョンで実行して比較する。API は到達不能なアドレスに向けて
+フォールバック表示で計測する（ネットワーク遅延を含めないため）。
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--step", type=int, default=4)
+    ap.add_argument("--reruns", type=int, default=50)
+    args = ap.parse_args()
+
+    os.environ.setdefault("API_BASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("API_PREFETCH", "0")
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=60)
+    at.query_params["step"] = str(args.step)
+    at.query_params["api"] = "0"
+    at.run()  # 初回（キャッシュ生成）は除外
+
+    times = []
+    for _ in range(args.reruns):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+    md_bytes = sum(len(m.value.encode("utf-8")) for m in at.markdown)
+    style_bytes = sum(len(m.value.encode("utf-8")) for m in at.markdown if m.value.startswith("<style"))
+
+    print(f"step {args.step}: {args.reruns} reruns")
+    print(f"  rerun time  mean {statistics.mean(times) * 1000:.1f} ms  "
+          f"p95 {sorted(times)[int(len(times) * 0.95) - 1] * 1000:.1f} ms")
+    print(f"  markdown bytes per rerun {md_bytes:,} (style block {style_bytes:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""コールドスタート計測: ページごとに新しいプロセスで最初の描画完了までの時間。
+
+    python bench/startup.py --repeat 5
+
+各ページを別プロセスの AppTest で1回描画し、
+  - process: プロセス起動から最初の描画完了まで（インタープリタ起動を含む）
+  - import:  ``import streamlit`` 完了まで
+  - render:  アプリ側のimportを含む最初のスクリプト実行
+を測る。API は到達不能なアドレスに向け、台帳は一時ディレクトリに作る。
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(page: str):
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    t1 = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60)
+    at.run()
+    t2 = time.perf_counter()
+    print(json.dumps(dict(import_s=t1 - t0, render_s=t2 - t1, exceptions=len(at.exception))))
+
+
+def measure(page: str, env: dict) -> dict:
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", page],
+                         capture_output=True, text=True, env=env, cwd=ROOT, timeout=300)
+    elapsed = time.perf_counter() - t0
+    lines = [ln for ln in out.stdout.splitlines() if ln.startswith("{")]
+    if out.returncode or not lines:
+        raise RuntimeError(f"{page}: {out.stderr.strip().splitlines()[-1:]}")
+    res = json.loads(lines[-1])
+    res["process_s"] = elapsed
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--page", action="append", help="対象ページ（既定: メイン + pages/*.py）")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    pages = args.page or ["streamlit_app.py"] + sorted(
+        os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, "pages", "*.py"))
+    )
+    env = dict(os.environ)
+    env.setdefault("API_BASE_URL", "http://127.0.0.1:9")
+    env["LEDGER_DIR"] = tempfile.mkdtemp(prefix="startup-ledger-")
+
+    print(f"{'page':<24}{'process ms':>12}{'import ms':>12}{'render ms':>12}   (median of {args.repeat})")
+    for page in pages:
+        runs = [measure(page, env) for _ in range(args.repeat)]
+        med = {k: statistics.median(r[k] for r in runs) * 1000 for k in ("process_s", "import_s", "render_s")}
+        note = "  ! exceptions" if any(r["exceptions"] for r in runs) else ""
+        print(f"{page:<24}{med['process_s']:>12.1f}{med['import_s']:>12.1f}{med['render_s']:>12.1f}{note}")
+
+
+if __name__ == "__main__":
+    main()
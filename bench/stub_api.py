@@ -0,0 +1,183 @@
+"""クエストAPIのローカルスタブ（負荷試験・オフライン開発用）。
+
+    python bench/stub_api.py --port 8765 --latency 50 --error-rate 0.05 --quests 200
+
+/api/v1/quests/available と /api/v1/profile だけを返す。遅延・エラー率・
+ペイロードサイズ（クエスト件数）を指定できる。ETag / Last-Modified を付け、
+条件付きリクエストには 304、Accept-Encoding: gzip には圧縮した本文を返す。
+クエスト一覧は ?offset=&limit= でページ単位でも返す（total_count は全件数）。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+QUESTS_PATH = "/api/v1/quests/available"
+PROFILE_PATH = "/api/v1/profile"
+
+
+def make_quests(quests: int) -> list:
+    return [
+        {"id": i, "title": f"地域課題クエスト {i:04d}", "provider_name": f"Provider {i % 17}",
+         "reward": 100 + i % 50, "description": "地域の事業者と連携した実践型の課題です。" * 3}
+        for i in range(1, quests + 1)
+    ]
+
+
+def quests_body(items: list, total: int) -> bytes:
+    return json.dumps({"status": "available", "quests": items, "total_count": total},
+                      ensure_ascii=False).encode("utf-8")
+
+
+def make_payloads(quests: int) -> dict:
+    return {
+        QUESTS_PATH: quests_body(make_quests(quests), quests),
+        PROFILE_PATH: json.dumps({
+            "user": {"name": "拓叶", "current_total_score": 782, "completed_quests": 15},
+        }, ensure_ascii=False).encode("utf-8"),
+    }
+
+
+class StubAPI:
+    """バックグラウンドスレッドで動く HTTP スタブ。``with StubAPI(...) as api:`` で使う。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, quests: int = 20, seed: int | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quests = make_quests(quests)
+        self.payloads = make_payloads(quests)
+        self.gzipped = {p: gzip.compress(b, 6) for p, b in self.payloads.items()}
+        self.etags = {p: '"%s"' % hashlib.sha1(b).hexdigest()[:16] for p, b in self.payloads.items()}
+        self.last_modified = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())
+        self.counts = dict(requests=0, errors=0, not_found=0, not_modified=0, bytes_sent=0)
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] += n
+
+    def _paged(self, offset: int, limit: int) -> str:
+        # ページの本文はキャッシュ用のキー（"path?offset&limit"）で payloads に足していく
+        key = f"{QUESTS_PATH}?{offset}&{limit}"
+        if key not in self.payloads:
+            body = quests_body(self.quests[offset:offset + limit], len(self.quests))
+            with self._lock:
+                self.payloads[key] = body
+                self.gzipped[key] = gzip.compress(body, 6)
+                self.etags[key] = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        return key
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive（アプリ側のコネクションプールを効かせる）
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                qs = parse_qs(query)
+                if path == QUESTS_PATH and ("offset" in qs or "limit" in qs):
+                    try:
+                        offset = max(0, int(qs.get("offset", ["0"])[0]))
+                        limit = max(1, int(qs.get("limit", ["100"])[0]))
+                    except ValueError:
+                        offset, limit = 0, 100
+                    path = stub._paged(offset, limit)
+                with stub._lock:
+                    stub.counts["requests"] += 1
+                    fail = stub._rng.random() < stub.error_rate
+                    delay = stub.latency + stub._rng.uniform(0, stub.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                body = stub.payloads.get(path)
+                headers = {"Content-Type": "application/json"}
+                if body is None:
+                    status, body = 404, b'{"detail": "not found"}'
+                    stub._count("not_found")
+                elif fail:
+                    status, body = 503, b'{"detail": "injected error"}'
+                    stub._count("errors")
+                else:
+                    headers["ETag"] = stub.etags[path]
+                    headers["Last-Modified"] = stub.last_modified
+                    if self.headers.get("If-None-Match") == stub.etags[path] or (
+                        "If-None-Match" not in self.headers
+                        and self.headers.get("If-Modified-Since") == stub.last_modified
+                    ):
+                        status, body = 304, b""
+                        stub._count("not_modified")
+                    else:
+                        status = 200
+                        if "gzip" in self.headers.get("Accept-Encoding", ""):
+                            body = stub.gzipped[path]
+                            headers["Content-Encoding"] = "gzip"
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                stub._count("bytes_sent", len(body))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="応答遅延（ミリ秒）")
+    ap.add_argument("--jitter", type=float, default=0.0, help="遅延に加える一様乱数の上限（ミリ秒）")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="503 を返す割合（0〜1）")
+    ap.add_argument("--quests", type=int, default=20, help="クエスト一覧の件数（ペイロードサイズ）")
+    args = ap.parse_args()
+
+    api = StubAPI(args.host, args.port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                  error_rate=args.error_rate, quests=args.quests)
+    size = len(api.payloads[QUESTS_PATH])
+    print(f"stub API on {api.url}  (quests payload {size:,} bytes)  Ctrl+C で終了")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+# 高速JSON（任意依存。入っていればバッチ応答のデコードに使う）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# requests は最初の通信時に import する（api_client と同じ）
+if TYPE_CHECKING:
+    import requests
+
+# ==============================
+# チェーンの JSON-RPC クライアント（証明書アンカーのコントラクト用）
+# ==============================
+# - HTTP はコネクションプール付きの Session を1つ使い回す（接続の張り直しをしない）
+# - 複数の読み出し（eth_call / eth_getLogs など）は JSON-RPC バッチで1回の POST にまとめる
+# - 確定済みブロック（先端から ``confirmations`` 以上前）を指す応答は変わらないのでキャッシュする
+#   先端の高さが古ければ、同じバッチの先頭に eth_blockNumber を足して一緒に取る
+
+
+# --- Keccak-256（関数セレクタ・イベントトピック用。hashlib の sha3_256 はパディングが異なる） ---
+_RC = (
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+)
+_ROT = (0, 1, 62, 28, 27, 36, 44, 6, 55, 20, 3, 10, 43, 25, 39, 41, 45, 15, 21, 8, 18, 2, 61, 56, 14)
+_M64 = (1 << 64) - 1
+
+
+def _keccak_f(a: list) -> list:
+    for rc in _RC:
+        c = [a[x] ^ a[x + 5] ^ a[x + 10] ^ a[x + 15] ^ a[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ (((c[(x + 1) % 5] << 1) | (c[(x + 1) % 5] >> 63)) & _M64) for x in range(5)]
+        a = [a[i] ^ d[i % 5] for i in range(25)]
+        b = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                v, r = a[x + 5 * y], _ROT[x + 5 * y]
+                b[y + 5 * ((2 * x + 3 * y) % 5)] = ((v << r) | (v >> (64 - r))) & _M64 if r else v
+        a = [b[i] ^ (~b[(i % 5 + 1) % 5 + 5 * (i // 5)] & b[(i % 5 + 2) % 5 + 5 * (i // 5)]) for i in range(25)]
+        a[0] ^= rc
+    return a
+
+
+def keccak256(data: bytes) -> bytes:
+    rate = 136
+    buf = bytearray(data) + b"\x01" + bytes(-(len(data) + 1) % rate)
+    buf[-1] |= 0x80
+    a = [0] * 25
+    for off in range(0, len(buf), rate):
+        for i in range(rate // 8):
+            a[i] ^= int.from_bytes(buf[off + 8 * i:off + 8 * i + 8], "little")
+        a = _keccak_f(a)
+    return b"".join(a[i].to_bytes(8, "little") for i in range(4))
+
+
+# --- アンカー用コントラクトの ABI ---
+#   function anchor(bytes32 root, uint256 count)
+#   function anchoredAt(bytes32 root) view returns (uint256 blockNumber)  // 未登録なら 0
+#   event Anchored(bytes32 indexed root, uint256 count)
+SEL_ANCHOR = "0x" + keccak256(b"anchor(bytes32,uint256)")[:4].hex()
+SEL_ANCHORED_AT = "0x" + keccak256(b"anchoredAt(bytes32)")[:4].hex()
+TOPIC_ANCHORED = "0x" + keccak256(b"Anchored(bytes32,uint256)").hex()
+DEFAULT_CONTRACT = "0x" + "a7" * 20
+DEFAULT_SENDER = "0x" + "5e" * 20
+
+
+def word(value) -> str:
+    """uint256 / bytes32（hex文字列）を32バイトのABIワード（hex 64桁）にする。"""
+    if isinstance(value, int):
+        return f"{value:064x}"
+    v = value[2:] if value.startswith("0x") else value
+    return v.lower().rjust(64, "0")
+
+
+def hex_int(v) -> int:
+    return int(v, 16) if isinstance(v, str) else int(v)
+
+
+def block_tag(block) -> str:
+    return hex(block) if isinstance(block, int) else block
+
+
+class ChainError(Exception):
+    """JSON-RPC のエラー応答または通信エラー。"""
+
+    def __init__(self, message: str, code: int | None = None):
+        super().__init__(message)
+        self.code = code
+
+
+class ChainClient:
+    """JSON-RPC クライアント。``batch`` で複数の呼び出しを1往復にまとめる。
+
+    スレッドセーフ。``anchor`` は AnchorScheduler のチェーン書き込みとして使える。
+    """
+
+    def __init__(self, url: str, contract: str = DEFAULT_CONTRACT, sender: str = DEFAULT_SENDER,
+                 timeout: tuple = (2.0, 5.0), pool_size: int = 8, max_batch: int = 100,
+                 confirmations: int = 2, cache_size: int = 4096, head_ttl: float = 1.0,
+                 receipt_timeout: float = 30.0):
+        self.url = url
+        self.contract = contract
+        self.sender = sender
+        self.timeout = timeout
+        self.pool_size = max(1, int(pool_size))
+        self.max_batch = max(1, int(max_batch))
+        self.confirmations = max(0, int(confirmations))
+        self.head_ttl = float(head_ttl)
+        self.receipt_timeout = float(receipt_timeout)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._session = None
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = max(0, int(cache_size))
+        self._head = 0
+        self._head_at = 0.0
+        self._stats = dict(http_requests=0, calls=0, cache_hits=0, errors=0)
+
+    # --- 転送 ---
+    def _http(self) -> "requests.Session":
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+            with self._lock:
+                if self._session is None:
+                    self._session = session
+        return self._session
+
+    def _post(self, body):
+        import requests
+
+        try:
+            resp = self._http().post(self.url, data=json.dumps(body, separators=(",", ":")),
+                                     timeout=self.timeout)
+        except requests.RequestException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise ChainError(f"RPC transport error: {type(e).__name__}") from e
+        with self._lock:
+            self._stats["http_requests"] += 1
+        if resp.status_code != 200:
+            raise ChainError(f"RPC HTTP {resp.status_code}")
+        try:
+            return orjson.loads(resp.content) if orjson is not None else resp.json()
+        except ValueError as e:
+            raise ChainError("RPC response is not JSON") from e
+
+    # --- キャッシュ ---
+    @property
+    def finalized(self) -> int:
+        return max(0, self._head - self.confirmations)
+
+    def _cache_key(self, method: str, params: list) -> str:
+        return method + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+    def _final(self, method: str, params: list, result) -> bool:
+        # 確定済みブロックだけを指す呼び出しか（応答が今後変わらないか）
+        fin = self.finalized
+        try:
+            if method == "eth_chainId":
+                return True
+            if method in ("eth_call", "eth_getBlockByNumber"):
+                tag = params[1] if method == "eth_call" else params[0]
+                return isinstance(tag, str) and tag.startswith("0x") and hex_int(tag) <= fin
+            if method == "eth_getLogs":
+                to = params[0].get("toBlock")
+                return isinstance(to, str) and to.startswith("0x") and hex_int(to) <= fin
+            if method == "eth_getTransactionReceipt":
+                return result is not None and hex_int(result["blockNumber"]) <= fin
+        except (IndexError, KeyError, TypeError, ValueError, AttributeError):
+            return False
+        return False
+
+    # --- 呼び出し ---
+    def batch(self, calls, raise_errors: bool = True) -> list:
+        """``[(method, params), ...]`` をまとめて呼び、結果を同じ順で返す。
+
+        キャッシュにないものだけを ``max_batch`` 件ずつ1回の POST にする。
+        ``raise_errors=False`` ならエラーは例外を投げずに ``ChainError`` を結果の位置に入れる。
+        """
+        calls = [(m, list(p)) for m, p in calls]
+        results: list = [None] * len(calls)
+        todo = []
+        with self._lock:
+            self._stats["calls"] += len(calls)
+            for i, (m, p) in enumerate(calls):
+                key = self._cache_key(m, p)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                    self._stats["cache_hits"] += 1
+                else:
+                    todo.append(i)
+            need_head = time.monotonic() - self._head_at > self.head_ttl
+        for start in range(0, len(todo), self.max_batch):
+            chunk = todo[start:start + self.max_batch]
+            ids = {}
+            body = []
+            if need_head:
+                hid = next(self._ids)
+                body.append(dict(jsonrpc="2.0", id=hid, method="eth_blockNumber", params=[]))
+                need_head = False
+            else:
+                hid = None
+            for i in chunk:
+                rid = next(self._ids)
+                ids[rid] = i
+                body.append(dict(jsonrpc="2.0", id=rid, method=calls[i][0], params=calls[i][1]))
+            reply = self._post(body)
+            if not isinstance(reply, list):  # バッチ全体の失敗（パースエラーなど）
+                err = (reply or {}).get("error") or {}
+                raise ChainError(err.get("message", "invalid batch response"), err.get("code"))
+            by_id = {r.get("id"): r for r in reply if isinstance(r, dict)}
+            if hid is not None and "result" in by_id.get(hid, {}):
+                with self._lock:
+                    self._head = max(self._head, hex_int(by_id[hid]["result"]))
+                    self._head_at = time.monotonic()
+            for rid, i in ids.items():
+                r = by_id.get(rid)
+                if r is None or "error" in r:
+                    err = (r or {}).get("error") or {"message": "missing response"}
+                    e = ChainError(str(err.get("message")), err.get("code"))
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    if raise_errors:
+                        raise e
+                    results[i] = e
+                    continue
+                results[i] = r.get("result")
+                m, p = calls[i]
+                if self._cache_size and self._final(m, p, results[i]):
+                    with self._lock:
+                        self._cache[self._cache_key(m, p)] = results[i]
+                        while len(self._cache) > self._cache_size:
+                            self._cache.popitem(last=False)
+        return results
+
+    def call(self, method: str, *params):
+        return self.batch([(method, params)])[0]
+
+    def head(self) -> int:
+        """先端のブロック番号（確定済みの判定にも使う）。"""
+        n = hex_int(self.call("eth_blockNumber"))
+        with self._lock:
+            self._head = max(self._head, n)
+            self._head_at = time.monotonic()
+        return n
+
+    # --- アンカー用コントラクト ---
+    def anchor(self, root: str, count: int) -> dict:
+        """根を書き込み、取り込まれるまで待って ``dict(tx_hash, block)`` を返す。"""
+        tx = self.call("eth_sendTransaction", dict(
+            to=self.contract, data=SEL_ANCHOR + word(root) + word(count), **{"from": self.sender}))
+        deadline = time.monotonic() + self.receipt_timeout
+        delay = 0.05
+        while True:
+            receipt = self.call("eth_getTransactionReceipt", tx)
+            if receipt is not None:
+                if hex_int(receipt.get("status", "0x1")) != 1:
+                    raise ChainError(f"anchor transaction reverted: {tx}")
+                block = hex_int(receipt["blockNumber"])
+                with self._lock:
+                    self._head = max(self._head, block)
+                return dict(tx_hash=tx, block=block)
+            if time.monotonic() > deadline:
+                raise ChainError(f"anchor transaction not mined: {tx}")
+            time.sleep(delay)
+            delay = min(1.0, delay * 2)
+
+    def anchored_at(self, roots, block="latest") -> dict:
+        """根 → 取り込まれたブロック番号（未登録は 0）。全件を1回のバッチで問い合わせる。"""
+        roots = list(dict.fromkeys(roots))
+        out = self.batch([
+            ("eth_call", [dict(to=self.contract, data=SEL_ANCHORED_AT + word(r)), block_tag(block)])
+            for r in roots
+        ])
+        return {r: hex_int(v or "0x0") for r, v in zip(roots, out)}
+
+    def anchor_logs(self, from_block: int, to_block, chunk: int = 2000) -> list:
+        """``Anchored`` イベントを ``[(root, count, block, tx_hash), ...]`` で返す（範囲ごとにまとめて取得）。
+
+        ``root`` は台帳の Merkle 根と同じ 0x なしの hex。
+        """
+        to = self.head() if to_block == "latest" else int(to_block)
+        calls = [
+            ("eth_getLogs", [dict(address=self.contract, topics=[TOPIC_ANCHORED],
+                                  fromBlock=hex(lo), toBlock=hex(min(to, lo + chunk - 1)))])
+            for lo in range(int(from_block), to + 1, chunk)
+        ]
+        out = []
+        for logs in self.batch(calls):
+            for log in logs or ():
+                out.append((log["topics"][1][2:], hex_int("0x" + log["data"][2:66]),
+                            hex_int(log["blockNumber"]), log["transactionHash"]))
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["cached"] = len(self._cache)
+            out["head"] = self._head
+            out["finalized"] = self.finalized
+        return out
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,271 @@
+"""オフライン用の EVM 互換ノードのスタンドイン（JSON-RPC over HTTP）。
+
+    python chain_node.py --port 8545 --latency 50 --block-time 2 --path .ledger/chain-node.jsonl
+
+証明書アンカーのコントラクト（chain_client の ABI）だけを実装した最小のノード。
+``eth_sendTransaction`` ごとに1ブロックを掘り（自動マイニング）、それとは別に
+``block_time`` 秒ごとに空ブロックが進む（確定の判定が進むように）。バッチ要求に対応し、
+``latency`` は HTTP 要求1回ごとにかかる（バッチにすると1往復ぶんで済む）。
+``path`` を渡すと取引を JSON Lines で追記し、次の起動時に読み直す（再起動してもアンカーが残る）。
+署名・ガス・EVM の実行はしない。
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chain_client import DEFAULT_CONTRACT, SEL_ANCHOR, SEL_ANCHORED_AT, TOPIC_ANCHORED, hex_int, word
+
+CHAIN_ID = 80002  # Polygon Amoy と同じ ID を返す
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _h(*parts) -> str:
+    return "0x" + hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+
+
+class LocalNode:
+    """バックグラウンドスレッドで動くノード。``with LocalNode() as node:`` で使う。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 block_time: float = 2.0, contract: str = DEFAULT_CONTRACT, path: str | None = None):
+        self.latency = float(latency)
+        self.block_time = float(block_time)
+        self.contract = contract.lower()
+        self.counts = dict(http_requests=0, calls=0, transactions=0)
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._height = 0
+        self._blocks: dict = {}  # 取引を含むブロックだけ: 番号 → dict(timestamp, txs)
+        self._anchored: dict = {}  # root(hex64) → ブロック番号
+        self._logs: list = []  # (ブロック番号, ログ dict)
+        self._receipts: dict = {}
+        self.path = path
+        self._journal = None
+        if path:
+            self._replay(path)
+            self._journal = open(path, "a", encoding="utf-8")
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LocalNode":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="chain-node", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._journal is not None:
+            self._journal.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _replay(self, path: str):
+        # 追記済みの取引を順に適用し直す。壊れた末尾（書き込み途中の停止）は切り詰める
+        good = 0
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        t = json.loads(line)
+                        self._apply(t["root"], int(t["count"]), int(t["block"]), int(t["timestamp"]))
+                    except (ValueError, KeyError, TypeError):
+                        break
+                    good += len(line)
+        except FileNotFoundError:
+            return
+        if good != os.path.getsize(path):
+            os.truncate(path, good)
+        # 空ブロックの時刻進行は最後の高さから続ける
+        self._t0 = time.monotonic() - self._height * self.block_time
+
+    # --- チェーン状態（呼び出し側で _lock 取得済み） ---
+    def _advance(self) -> int:
+        if self.block_time > 0:
+            self._height = max(self._height, int((time.monotonic() - self._t0) / self.block_time))
+        return self._height
+
+    def _block(self, n: int, full: bool) -> dict | None:
+        if n < 0 or n > self._advance():
+            return None
+        b = self._blocks.get(n)
+        txs = b["txs"] if b else []
+        return {
+            "number": hex(n), "hash": _h("block", n, *txs), "parentHash": _h("block", n - 1) if n else "0x" + "0" * 64,
+            "timestamp": hex(b["timestamp"] if b else int(time.time())),
+            "transactions": [self._receipts[t] for t in txs] if full else list(txs),
+        }
+
+    def _resolve_block(self, tag) -> int:
+        head = self._advance()
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return head
+        if tag == "earliest":
+            return 0
+        try:
+            return min(hex_int(tag), head)
+        except (TypeError, ValueError):
+            raise RPCError(-32602, f"invalid block tag: {tag!r}")
+
+    # --- メソッド ---
+    def _send(self, tx: dict) -> str:
+        data = (tx.get("data") or tx.get("input") or "").lower()
+        if str(tx.get("to", "")).lower() != self.contract or not data.startswith(SEL_ANCHOR):
+            raise RPCError(-32000, "execution reverted: unknown call")
+        body = data[len(SEL_ANCHOR):]
+        if len(body) != 128:
+            raise RPCError(-32602, "invalid calldata")
+        root, count = body[:64], int(body[64:], 16)
+        n, ts = self._advance() + 1, int(time.time())
+        if self._journal is not None:
+            self._journal.write(json.dumps(dict(root=root, count=count, block=n, timestamp=ts)) + "\n")
+            self._journal.flush()
+        self.counts["transactions"] += 1
+        return self._apply(root, count, n, ts)
+
+    def _apply(self, root: str, count: int, n: int, ts: int) -> str:
+        self._height = max(self._height, n)
+        tx_hash = _h("tx", n, root, count)
+        self._anchored.setdefault(root, n)
+        log = dict(address=self.contract, topics=[TOPIC_ANCHORED, "0x" + root], data="0x" + word(count),
+                   blockNumber=hex(n), transactionHash=tx_hash, logIndex="0x0")
+        self._logs.append((n, log))
+        self._blocks[n] = dict(timestamp=ts, txs=[tx_hash])
+        self._receipts[tx_hash] = dict(transactionHash=tx_hash, blockNumber=hex(n), status="0x1",
+                                       to=self.contract, logs=[log])
+        return tx_hash
+
+    def _call(self, tx: dict, tag) -> str:
+        n = self._resolve_block(tag)
+        data = (tx.get("data") or tx.get("input") or "").lower()
+        if str(tx.get("to", "")).lower() != self.contract or not data.startswith(SEL_ANCHORED_AT):
+            raise RPCError(-32000, "execution reverted: unknown call")
+        at = self._anchored.get(data[len(SEL_ANCHORED_AT):].rjust(64, "0"), 0)
+        return "0x" + word(at if at <= n else 0)
+
+    def _get_logs(self, f: dict) -> list:
+        lo, hi = self._resolve_block(f.get("fromBlock", "earliest")), self._resolve_block(f.get("toBlock"))
+        addr = f.get("address")
+        topics = f.get("topics") or []
+        out = []
+        for n, log in self._logs:
+            if not lo <= n <= hi or (addr and addr.lower() != log["address"]):
+                continue
+            if any(t is not None and t != log["topics"][i] for i, t in enumerate(topics[:2])):
+                continue
+            out.append(log)
+        return out
+
+    def dispatch(self, method: str, params: list):
+        with self._lock:
+            self.counts["calls"] += 1
+            if method == "eth_chainId":
+                return hex(CHAIN_ID)
+            if method == "net_version":
+                return str(CHAIN_ID)
+            if method == "web3_clientVersion":
+                return "teamx-localnode/1"
+            if method == "eth_blockNumber":
+                return hex(self._advance())
+            if method == "eth_getBlockByNumber":
+                return self._block(self._resolve_block(params[0]), bool(params[1]) if len(params) > 1 else False)
+            if method == "eth_sendTransaction":
+                return self._send(params[0])
+            if method == "eth_getTransactionReceipt":
+                return self._receipts.get(params[0])
+            if method == "eth_call":
+                return self._call(params[0], params[1] if len(params) > 1 else "latest")
+            if method == "eth_getLogs":
+                return self._get_logs(params[0])
+        raise RPCError(-32601, f"method not found: {method}")
+
+    def _one(self, req) -> dict:
+        rid = req.get("id") if isinstance(req, dict) else None
+        try:
+            if not isinstance(req, dict) or "method" not in req:
+                raise RPCError(-32600, "invalid request")
+            result = self.dispatch(req["method"], list(req.get("params") or []))
+            return dict(jsonrpc="2.0", id=rid, result=result)
+        except RPCError as e:
+            return dict(jsonrpc="2.0", id=rid, error=dict(code=e.code, message=str(e)))
+        except (IndexError, KeyError, TypeError, ValueError, AttributeError) as e:
+            return dict(jsonrpc="2.0", id=rid, error=dict(code=-32602, message=f"invalid params: {e}"))
+
+    def _handler(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive（クライアントのコネクションプールを活かす）
+            disable_nagle_algorithm = True  # ヘッダと本文の2回の書き込みで遅延 ACK を待たない
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                with node._lock:
+                    node.counts["http_requests"] += 1
+                if node.latency > 0:
+                    time.sleep(node.latency)
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    req = json.loads(raw)
+                except ValueError:
+                    reply = dict(jsonrpc="2.0", id=None, error=dict(code=-32700, message="parse error"))
+                else:
+                    if isinstance(req, list):
+                        reply = [node._one(r) for r in req] if req else \
+                            dict(jsonrpc="2.0", id=None, error=dict(code=-32600, message="empty batch"))
+                    else:
+                        reply = node._one(req)
+                body = json.dumps(reply, separators=(",", ":")).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8545)
+    ap.add_argument("--latency", type=float, default=0.0, help="HTTP 要求1回ごとの遅延（ミリ秒）")
+    ap.add_argument("--block-time", type=float, default=2.0, help="空ブロックが進む間隔（秒。0 で無効）")
+    ap.add_argument("--path", default=None, help="取引を追記して再起動後も残すファイル（JSON Lines）")
+    args = ap.parse_args()
+    node = LocalNode(args.host, args.port, latency=args.latency / 1000, block_time=args.block_time,
+                     path=args.path)
+    print(f"local chain node on {node.url} (chain id {CHAIN_ID}, contract {node.contract})")
+    try:
+        node._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        node._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
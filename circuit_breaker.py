@@ -0,0 +1,79 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """プロセス共有のサーキットブレーカー。
+
+    連続 ``failure_threshold`` 回失敗で OPEN になり、``reset_timeout`` 秒間は
+    通信を試みずに即フォールバックさせる。経過後は HALF_OPEN で1件だけ試行し、
+    成功なら CLOSED、失敗なら再び OPEN に戻る。
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._last_ok = None
+        self._last_change = time.time()
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            self._state = state
+            self._last_change = time.time()
+
+    def allow(self) -> bool:
+        # 通信してよいか（OPEN中は False、HALF_OPEN は試行1件のみ True）
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._last_ok = True
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            self._last_ok = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def health(self) -> dict:
+        # render_status_float 用の共有ヘルス情報
+        with self._lock:
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return dict(
+                state=self._state,
+                last_ok=self._last_ok,
+                failures=self._failures,
+                retry_in=retry_in,
+                since=self._last_change,
+            )
@@ -0,0 +1,57 @@
+import streamlit as st
+
+import metrics
+
+# ==============================
+# 診断ビュー（?diag=1 かつ METRICS_ENABLED のときだけ表示される隠しページ）
+# ==============================
+
+
+def _fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.3f}"
+
+
+def summary_rows() -> list:
+    rows = []
+    for name, labels, h in metrics.REGISTRY.series():
+        snap = h.snapshot()
+        if not snap["count"]:
+            continue
+        rows.append({
+            "metric": name,
+            "labels": ", ".join(f"{k}={v}" for k, v in labels.items()),
+            "count": snap["count"],
+            "mean ms": _fmt_ms(snap["sum"] / snap["count"]),
+            "p50 ms": _fmt_ms(h.quantile(0.50, snap)),
+            "p95 ms": _fmt_ms(h.quantile(0.95, snap)),
+            "p99 ms": _fmt_ms(h.quantile(0.99, snap)),
+            "total ms": _fmt_ms(snap["sum"]),
+        })
+    return rows
+
+
+def render_diagnostics():
+    st.markdown('<div class="step-indicator">診断: 再実行プロファイル</div>', unsafe_allow_html=True)
+    st.caption("プロセス内ヒストグラム（全セッション共通）。分位点はバケットからの推定値です。")
+
+    rows = summary_rows()
+    if rows:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    else:
+        st.info("まだ計測データがありません。デモ画面を操作してから再表示してください。")
+
+    text = metrics.REGISTRY.to_prometheus()
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        if st.button("ファイルに書き出し", use_container_width=True):
+            st.success(f"書き出しました: {metrics.dump()}")
+    with c2:
+        st.download_button("metrics.prom", text, file_name="metrics.prom",
+                           mime="text/plain", use_container_width=True)
+    with c3:
+        if st.button("リセット", use_container_width=True):
+            metrics.REGISTRY.reset()
+            st.rerun()
+
+    with st.expander("Prometheus テキスト形式", expanded=False):
+        st.code(text, language="text")
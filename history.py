@@ -0,0 +1,86 @@
+import sys
+from collections import deque
+
+# ==============================
+# セッションごとの記録履歴（コンパクト表現）
+# ==============================
+# 1件ごとの dict + 64文字の16進ハッシュをやめ、__slots__ のオブジェクトに 32 バイトの
+# 生ダイジェストを持つ。講座名などはプロセス内で intern して全セッションで共有し、
+# 履歴は上限件数で古いものから捨てる。
+
+
+class HistoryRecord:
+    """ステップ1で記録した1件。``hash`` は16進表記（表示・互換用）。"""
+
+    __slots__ = ("name", "course", "score", "digest", "date", "block")
+
+    def __init__(self, name: str, course: str, score, digest: bytes, date: str, block: int):
+        self.name = sys.intern(name)
+        self.course = sys.intern(course)
+        self.score = score
+        self.digest = digest
+        self.date = sys.intern(date)
+        self.block = block
+
+    @classmethod
+    def from_hex(cls, name: str, course: str, score, hash_hex: str, date: str, block: int) -> "HistoryRecord":
+        return cls(name, course, score, bytes.fromhex(hash_hex), date, block)
+
+    @property
+    def hash(self) -> str:
+        return self.digest.hex()
+
+    def to_dict(self) -> dict:
+        return dict(name=self.name, course=self.course, score=self.score, hash=self.hash,
+                    date=self.date, block=self.block)
+
+    def to_state(self) -> list:
+        return [self.name, self.course, self.score, self.hash, self.date, self.block]
+
+    @classmethod
+    def from_state(cls, s) -> "HistoryRecord":
+        if isinstance(s, dict):  # 旧形式（dict のリスト）で保存されたセッション
+            return cls.from_hex(s["name"], s["course"], s.get("score"), s["hash"], s.get("date", ""),
+                                s.get("block", 0))
+        name, course, score, hash_hex, date, block = s
+        return cls.from_hex(name, course, score, hash_hex, date, block)
+
+    def __eq__(self, other):
+        if not isinstance(other, HistoryRecord):
+            return NotImplemented
+        return self.to_state() == other.to_state()
+
+    def __repr__(self):
+        return f"HistoryRecord({self.course!r}, block={self.block}, hash={self.hash[:12]}...)"
+
+
+class RecordHistory:
+    """上限付きの記録履歴（直近 ``maxlen`` 件を古い順に保持）。"""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, maxlen: int = 50, items=()):
+        self._items = deque(items, maxlen=max(1, int(maxlen)))
+
+    @property
+    def maxlen(self) -> int:
+        return self._items.maxlen
+
+    def append(self, rec: HistoryRecord):
+        self._items.append(rec)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, i: int) -> HistoryRecord:
+        return self._items[i]
+
+    def to_state(self) -> list:
+        return [r.to_state() for r in self._items]
+
+    @classmethod
+    def from_state(cls, state, maxlen: int = 50) -> "RecordHistory":
+        return cls(maxlen, (HistoryRecord.from_state(s) for s in state or ()))
@@ -0,0 +1,130 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+# ==============================
+# 発行ジョブキュー（記録 / NFT証明書の発行をワーカーで非同期処理）
+# ==============================
+PENDING = "pending"
+RUNNING = "running"
+COMMITTED = "committed"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """キューが満杯（呼び出し側で「混雑中」として扱う）。"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: dict
+    status: str = PENDING
+    result: dict = field(default_factory=dict)
+    error: str = ""
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (COMMITTED, FAILED)
+
+
+class IssuanceQueue:
+    """有界キュー + ワーカースレッド。
+
+    ワーカーは1件取り出したあと、待っているジョブを最大 ``batch`` 件まで
+    まとめて ``handler(jobs)`` に渡す（1ブロックにまとめて確定できる）。
+    handler はジョブごとの結果 dict のリストを返す。
+    """
+
+    def __init__(self, handler, workers: int = 2, maxsize: int = 256,
+                 batch: int = 64, retention: float = 3600.0):
+        self.handler = handler
+        self.batch = max(1, int(batch))
+        self.retention = float(retention)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._jobs: dict = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._stats = dict(submitted=0, committed=0, failed=0, rejected=0, batches=0)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"issuance-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, kind: str, payload: dict) -> str:
+        job = Job(id=f"{next(self._seq):06d}-{uuid.uuid4().hex[:8]}", kind=kind, payload=dict(payload))
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._stats["rejected"] += 1
+            raise QueueFull(f"issuance queue is full ({self._queue.maxsize} jobs)")
+        with self._lock:
+            self._stats["submitted"] += 1
+        return job.id
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        # 呼び出し側でロック取得済み。完了から retention 秒過ぎたジョブを捨てる
+        cutoff = time.time() - self.retention
+        for jid in [j.id for j in self._jobs.values() if j.done and j.updated < cutoff]:
+            del self._jobs[jid]
+
+    def _worker(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < self.batch:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._set(jobs, RUNNING)
+            try:
+                results = self.handler(jobs)
+            except Exception as e:  # ジョブ単位で失敗として記録し、ワーカーは止めない
+                self._set(jobs, FAILED, error=str(e) or type(e).__name__)
+            else:
+                for job, res in zip(jobs, results):
+                    self._set([job], COMMITTED, result=res)
+            finally:
+                with self._lock:
+                    self._stats["batches"] += 1
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def _set(self, jobs, status: str, result: dict | None = None, error: str = ""):
+        now = time.time()
+        with self._lock:
+            for job in jobs:
+                job.status = status
+                job.updated = now
+                if result is not None:
+                    job.result = result
+                if error:
+                    job.error = error
+                if status == COMMITTED:
+                    self._stats["committed"] += 1
+                elif status == FAILED:
+                    self._stats["failed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["queued"] = self._queue.qsize()
+            out["maxsize"] = self._queue.maxsize
+        return out
@@ -0,0 +1,12 @@
+from ledger.engine import BlockBuilder, Ledger, LedgerError, LedgerLocked
+from ledger.index import CertificateIndex
+from ledger.merkle import MerkleTree, verify_proof
+from ledger.records import Block, Record
+from ledger.snapshot import LedgerState
+from ledger.verify import Verification, verify_certificate, verify_inclusion, verify_many
+
+__all__ = [
+    "Block", "BlockBuilder", "CertificateIndex", "Ledger", "LedgerError", "LedgerLocked", "LedgerState",
+    "MerkleTree", "Record", "Verification", "verify_certificate", "verify_inclusion", "verify_many",
+    "verify_proof",
+]
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+# ==============================
+# 確定済みセグメントの圧縮アーカイブ（不変・チェックサム付き）
+# ==============================
+# 形式: [ヘッダ][チャンク表][圧縮チャンク...]
+#   ヘッダ: magic, セグメント番号, 元サイズ, チャンクサイズ, 元データの SHA-256, チャンク数
+#   チャンク表: 各チャンクの [ファイル内オフセット:u64][圧縮後サイズ:u32][CRC32:u32]
+# チャンクごとに独立して zlib 圧縮するので、古いブロック1件の読み出しは
+# 該当チャンクの展開だけで済む（セグメント全体を展開しない）。
+MAGIC = b"LDGARC01"
+HEADER = struct.Struct("<8sIQI32sI")
+CHUNK = struct.Struct("<QII")
+CHUNK_SIZE = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def write_archive(src_path: str, dst_path: str, seg_no: int, chunk_size: int = CHUNK_SIZE,
+                  level: int = 6) -> dict:
+    """セグメント ``src_path`` をアーカイブ ``dst_path`` に書き出す（一時ファイル経由で置き換え）。"""
+    raw_size = os.path.getsize(src_path)
+    n_chunks = -(-raw_size // chunk_size)
+    table, digest = [], hashlib.sha256()
+    tmp = dst_path + ".tmp"
+    with open(src_path, "rb") as src, open(tmp, "wb") as dst:
+        dst.seek(HEADER.size + CHUNK.size * n_chunks)
+        for _ in range(n_chunks):
+            raw = src.read(chunk_size)
+            digest.update(raw)
+            comp = zlib.compress(raw, level)
+            table.append((dst.tell(), len(comp), zlib.crc32(comp)))
+            dst.write(comp)
+        dst.seek(0)
+        dst.write(HEADER.pack(MAGIC, seg_no, raw_size, chunk_size, digest.digest(), n_chunks))
+        dst.write(b"".join(CHUNK.pack(*t) for t in table))
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.chmod(tmp, 0o444)
+    os.replace(tmp, dst_path)
+    return dict(seg_no=seg_no, raw_bytes=raw_size, archive_bytes=os.path.getsize(dst_path), chunks=n_chunks)
+
+
+class ArchiveReader:
+    """アーカイブからの範囲読み出し。展開済みチャンクを少数だけキャッシュする。"""
+
+    def __init__(self, path: str, cache_chunks: int = 8):
+        self.path = path
+        self._f = open(path, "rb")
+        head = self._f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            raise ArchiveError(f"truncated archive: {path}")
+        magic, self.seg_no, self.raw_size, self.chunk_size, self.sha256, n = HEADER.unpack(head)
+        if magic != MAGIC:
+            raise ArchiveError(f"not a ledger archive: {path}")
+        table = self._f.read(CHUNK.size * n)
+        if len(table) < CHUNK.size * n:
+            raise ArchiveError(f"truncated archive: {path}")
+        self._table = list(CHUNK.iter_unpack(table))
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_chunks = max(1, int(cache_chunks))
+        self._lock = threading.Lock()
+
+    def _chunk(self, i: int) -> bytes:
+        raw = self._cache.get(i)
+        if raw is not None:
+            self._cache.move_to_end(i)
+            return raw
+        off, clen, crc = self._table[i]
+        self._f.seek(off)
+        comp = self._f.read(clen)
+        if len(comp) != clen or zlib.crc32(comp) != crc:
+            raise ArchiveError(f"chunk {i} checksum mismatch: {self.path}")
+        raw = zlib.decompress(comp)
+        self._cache[i] = raw
+        while len(self._cache) > self._cache_chunks:
+            self._cache.popitem(last=False)
+        return raw
+
+    def read(self, offset: int, length: int) -> bytes:
+        if offset < 0 or offset + length > self.raw_size:
+            raise ArchiveError(f"range {offset}+{length} outside archive ({self.raw_size} bytes)")
+        out = []
+        with self._lock:
+            while length > 0:
+                i, pos = divmod(offset, self.chunk_size)
+                part = self._chunk(i)[pos:pos + length]
+                out.append(part)
+                offset += len(part)
+                length -= len(part)
+        return b"".join(out)
+
+    def verify(self) -> bool:
+        # 全チャンクの CRC と、元データ全体の SHA-256 を確認する
+        digest = hashlib.sha256()
+        try:
+            with self._lock:
+                for i in range(len(self._table)):
+                    off, clen, crc = self._table[i]
+                    self._f.seek(off)
+                    comp = self._f.read(clen)
+                    if len(comp) != clen or zlib.crc32(comp) != crc:
+                        return False
+                    digest.update(zlib.decompress(comp))
+        except (OSError, zlib.error):
+            return False
+        return digest.digest() == self.sha256
+
+    def close(self):
+        self._f.close()
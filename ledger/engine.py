@@ -0,0 +1,564 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows: ロックファイルによる排他はしない
+    fcntl = None
+
+from ledger.archive import ArchiveError, ArchiveReader, write_archive
+from ledger.leaderboard import Leaderboard
+from ledger.merkle import MerkleTree
+from ledger.records import ZERO_HASH, Block, make_block
+from ledger.snapshot import LedgerState, list_snapshots, read_snapshot, write_snapshot
+
+# ==============================
+# 追記専用セグメント + オフセット索引
+# ==============================
+# セグメント: [len:u32][crc32:u32][payload] の繰り返し（payload はブロックのJSON）
+# 索引 blocks.idx: ブロック番号順に [segment:u32][offset:u64][len:u32] の固定長16バイト
+# 起動時は索引を読み込まずに mmap し、導出状態は最新スナップショット以降だけを遅延反映する。
+# スナップショットより前のブロックだけを含むセグメントは圧縮アーカイブ（seg-*.arc）に置き換える。
+FRAME = struct.Struct("<II")
+INDEX_ENTRY = struct.Struct("<IQI")
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+TREE_CACHE_SIZE = 64
+ARCHIVE_READERS = 4
+SNAPSHOT_EVERY = 1000
+ARCHIVE_RE = re.compile(r"^seg-(\d{6})\.arc$")
+SEGMENT_RE = re.compile(r"^seg-(\d{6})\.log$")
+LOCK_FILE = "LOCK"
+
+
+class LedgerError(Exception):
+    pass
+
+
+class LedgerLocked(LedgerError):
+    """別の書き込みプロセスがディレクトリのロックを持っている。"""
+
+
+class Ledger:
+    """ハッシュ連結された追記専用の台帳。
+
+    追記は O(1)（セグメント末尾とオフセット索引への書き込みのみ）。fsync は
+    バックグラウンドのコミットスレッドがまとめて行い（グループコミット）、
+    ``durable=True`` の追記はその fsync 完了まで待つ。読み出しは mmap 経由。
+    ``snapshot_every`` ブロックごとに裏のスレッドが導出状態のスナップショットを書き、
+    ``compact=True`` ならそれより前の確定済みセグメントをアーカイブに圧縮する。
+    ランキング（上位 ``leaderboard_k`` 件と順位）は最初の参照時に集計から作り、以降は差分更新する。
+    1ディレクトリにつき書き込みプロセスは1つで、ディレクトリの ``LOCK`` を排他ロックして保証する
+    （別プロセスが開いていれば ``LedgerError``）。
+    """
+
+    def __init__(self, path: str, segment_max_bytes: int = SEGMENT_MAX_BYTES,
+                 commit_interval: float = 0.005, commit_batch: int = 256,
+                 snapshot_every: int = SNAPSHOT_EVERY, compact: bool = True, snapshot_keep: int = 2,
+                 leaderboard_k: int = 100):
+        self.path = path
+        self.segment_max_bytes = int(segment_max_bytes)
+        self.commit_interval = float(commit_interval)
+        self.commit_batch = max(1, int(commit_batch))
+        self.snapshot_every = max(0, int(snapshot_every))
+        self.compact_segments = bool(compact)
+        self.snapshot_keep = max(1, int(snapshot_keep))
+        self.leaderboard_k = max(1, int(leaderboard_k))
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = self._acquire_dir_lock()
+
+        self._lock = threading.Lock()
+        self._commit_cv = threading.Condition(self._lock)
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._closed = False
+        self._stats = dict(appends=0, fsyncs=0, max_group=0, snapshots=0, archived=0, maintenance_errors=0)
+
+        # ブロック番号 n は索引の n-1 番目。起動時点の分は mmap（_base）、以降の追記分は配列に持つ
+        self._base = None
+        self._base_n = 0
+        self._idx_seg = array("I")
+        self._idx_off = array("Q")
+        self._idx_len = array("I")
+        self._maps: dict = {}
+        self._trees: OrderedDict = OrderedDict()
+        self._archived = self._scan_archives()
+        self._readers: OrderedDict = OrderedDict()
+        self._load_index()
+        self._base_height = self.height
+
+        self._tip_hash = ZERO_HASH
+        if self.height:
+            self._tip_hash = self.get_block(self.height).hash
+
+        self._seg_no = self._entry(self.height - 1)[0] if self.height else 0
+        self._seg_file = open(self._segment_path(self._seg_no), "ab", buffering=0)
+        self._seg_size = self._seg_file.tell()
+        self._idx_file = open(self._index_path(), "ab", buffering=0)
+
+        # 導出状態はスナップショットから始め、以降のブロックは参照時に反映する
+        self._state_lock = threading.Lock()
+        self._state = self._load_snapshot()
+        self.snapshot_height = self._state.height
+
+        self._maint_wake = threading.Event()
+        self._maint_stop = False
+        self._syncer = threading.Thread(target=self._sync_loop, name="ledger-commit", daemon=True)
+        self._syncer.start()
+        self._maint = threading.Thread(target=self._maint_loop, name="ledger-snapshot", daemon=True)
+        self._maint.start()
+
+    # --- パス ---
+    def _segment_path(self, seg_no: int) -> str:
+        return os.path.join(self.path, f"seg-{seg_no:06d}.log")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.path, "blocks.idx")
+
+    def _archive_path(self, seg_no: int) -> str:
+        return os.path.join(self.path, f"seg-{seg_no:06d}.arc")
+
+    # --- 単一書き込みプロセスの保証 ---
+    def _acquire_dir_lock(self):
+        # 復旧（末尾の切り詰め・途中のアーカイブ削除）より前に取る。プロセス終了時は OS が解放する
+        f = open(os.path.join(self.path, LOCK_FILE), "a+b")
+        if fcntl is None:
+            return f
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            raise LedgerLocked(
+                f"ledger at {self.path!r} is already open by another writer "
+                "(stop the app before running ingest or benchmarks against it)"
+            ) from None
+        return f
+
+    # --- 起動時の復旧 ---
+    def _scan_archives(self) -> set:
+        archived = set()
+        for name in os.listdir(self.path):
+            m = ARCHIVE_RE.match(name)
+            if not m:
+                continue
+            seg = int(m.group(1))
+            if os.path.exists(self._segment_path(seg)):
+                # 圧縮の途中で止まった（元セグメントが残っている）。元を正として作り直させる
+                os.remove(self._archive_path(seg))
+            else:
+                archived.add(seg)
+        return archived
+
+    def _load_index(self):
+        # 索引は読み込まずに mmap する（起動時間を履歴の長さに依存させない）
+        idx_path = self._index_path()
+        n = os.path.getsize(idx_path) // INDEX_ENTRY.size if os.path.exists(idx_path) else 0
+
+        # 末尾の不完全な書き込み（クラッシュ時）を捨てる。末尾から確認するので通常は1件だけ読む
+        with open(idx_path, "ab+") as f:
+            while n:
+                f.seek((n - 1) * INDEX_ENTRY.size)
+                if self._frame_ok(INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))):
+                    break
+                n -= 1
+            f.truncate(n * INDEX_ENTRY.size)
+            if n:
+                self._base = mmap.mmap(f.fileno(), n * INDEX_ENTRY.size, access=mmap.ACCESS_READ)
+        self._base_n = n
+
+        # 索引に載っていないセグメント末尾も切り詰める
+        if n:
+            seg, off, length = self._entry(n - 1)
+            end = off + FRAME.size + length
+        else:
+            seg, end = 0, 0
+        seg_path = self._segment_path(seg)
+        if os.path.exists(seg_path) and os.path.getsize(seg_path) > end:
+            with open(seg_path, "ab") as f:
+                f.truncate(end)
+        # 切り替え直後に止まった場合、索引に載っていない新しいセグメントが残る。次の切り替えで
+        # 追記先になるので消しておく（残すと索引のオフセットが古いバイト列を指す）
+        for name in os.listdir(self.path):
+            m = SEGMENT_RE.match(name)
+            if m and int(m.group(1)) > seg:
+                os.remove(os.path.join(self.path, name))
+
+    def _entry(self, i: int) -> tuple:
+        # 索引の i 番目（ブロック番号 i+1）の (segment, offset, len)
+        if i < self._base_n:
+            return INDEX_ENTRY.unpack_from(self._base, i * INDEX_ENTRY.size)
+        i -= self._base_n
+        return self._idx_seg[i], self._idx_off[i], self._idx_len[i]
+
+    def _frame_ok(self, entry: tuple) -> bool:
+        seg_no, off, length = entry
+        seg_path = self._segment_path(seg_no)
+        try:
+            with open(seg_path, "rb") as f:
+                f.seek(off)
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return False
+                flen, crc = FRAME.unpack(head)
+                payload = f.read(flen)
+        except OSError:
+            return False
+        return flen == length and len(payload) == flen and zlib.crc32(payload) == crc
+
+    # --- 書き込み ---
+    @property
+    def height(self) -> int:
+        return self._base_n + len(self._idx_seg)
+
+    @property
+    def tip_hash(self) -> str:
+        return self._tip_hash
+
+    def append(self, records, record_hashes=None, durable: bool = True, root: str | None = None) -> Block:
+        """記録をまとめて1ブロックとして追記する。"""
+        records = tuple(records)
+        if record_hashes is None:
+            # ハッシュ計算はロックの外で行う
+            record_hashes = tuple(r.digest() for r in records)
+        with self._lock:
+            if self._closed:
+                raise LedgerError("ledger is closed")
+            block = make_block(self.height + 1, self._tip_hash, records, record_hashes, root=root)
+            payload = block.to_bytes()
+            if self._seg_size and self._seg_size + FRAME.size + len(payload) > self.segment_max_bytes:
+                self._roll_segment()
+            offset = self._seg_size
+            self._seg_file.write(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._idx_file.write(INDEX_ENTRY.pack(self._seg_no, offset, len(payload)))
+            self._seg_size += FRAME.size + len(payload)
+            self._idx_seg.append(self._seg_no)
+            self._idx_off.append(offset)
+            self._idx_len.append(len(payload))
+            self._tip_hash = block.hash
+            self._written_seq += 1
+            self._stats["appends"] += 1
+            seq = self._written_seq
+            self._commit_cv.notify_all()
+            if durable:
+                while self._synced_seq < seq and not self._closed:
+                    self._commit_cv.wait()
+        # 集計が追いついていればこのブロック分だけ足す（O(ブロック内の件数)）。
+        # 追いついていない間は参照時の _catch_up がまとめて反映する
+        with self._state_lock:
+            if self._state.height == block.number - 1:
+                self._state.apply(block)
+        return block
+
+    def _roll_segment(self):
+        # 呼び出し側でロック取得済み。旧セグメントは同期してから閉じる
+        self._seg_file.flush()
+        os.fsync(self._seg_file.fileno())
+        self._seg_file.close()
+        self._seg_no += 1
+        self._seg_file = open(self._segment_path(self._seg_no), "ab", buffering=0)
+        self._seg_size = self._seg_file.tell()
+
+    def _sync_loop(self):
+        while True:
+            with self._lock:
+                while self._synced_seq == self._written_seq and not self._closed:
+                    self._commit_cv.wait()
+                if self._closed and self._synced_seq == self._written_seq:
+                    return
+            # 少しだけ待って後続の追記をまとめる（commit_batch 件溜まったら即時）
+            deadline = time.monotonic() + self.commit_interval
+            while time.monotonic() < deadline:
+                with self._lock:
+                    if self._written_seq - self._synced_seq >= self.commit_batch or self._closed:
+                        break
+                time.sleep(self.commit_interval / 5)
+            with self._lock:
+                target = self._written_seq
+                seg_fd, idx_fd = self._seg_file.fileno(), self._idx_file.fileno()
+            # fsync 中も追記は止めない。途中でセグメントが切り替わった場合は
+            # 旧セグメントは切り替え時に fsync 済みなのでエラーは無視してよい
+            for fd in (seg_fd, idx_fd):
+                try:
+                    os.fsync(fd)
+                except OSError:
+                    pass
+            with self._lock:
+                self._stats["max_group"] = max(self._stats["max_group"], target - self._synced_seq)
+                self._stats["fsyncs"] += 1
+                self._synced_seq = target
+                self._commit_cv.notify_all()
+            if self.snapshot_every and self._base_height + target - self.snapshot_height >= self.snapshot_every:
+                self._maint_wake.set()
+
+    def sync(self):
+        # 書き込み済みの全ブロックが fsync されるまで待つ
+        with self._lock:
+            target = self._written_seq
+            self._commit_cv.notify_all()
+            while self._synced_seq < target and not self._closed:
+                self._commit_cv.wait()
+
+    def close(self):
+        self.sync()
+        self._maint_stop = True
+        self._maint_wake.set()
+        self._maint.join(timeout=30)
+        if self.snapshot_every:
+            # 次回起動時に反映するブロックを残さない
+            try:
+                self.snapshot()
+            except (OSError, ValueError, LedgerError, ArchiveError):
+                pass
+        with self._lock:
+            self._closed = True
+            self._commit_cv.notify_all()
+        self._syncer.join(timeout=5)
+        with self._lock:
+            for m in self._maps.values():
+                m.close()
+            self._maps.clear()
+            for r in self._readers.values():
+                r.close()
+            self._readers.clear()
+            if self._base is not None:
+                self._base.close()
+                self._base = None
+            self._seg_file.close()
+            self._idx_file.close()
+        self._lock_file.close()  # ロックも解放される
+
+    # --- スナップショット / アーカイブ ---
+    def _load_snapshot(self) -> LedgerState:
+        # 新しい順に、チェックサムと先端ハッシュが台帳と一致する最初のものを使う
+        for height, path in list_snapshots(self.path):
+            if height > self.height:
+                continue
+            body = read_snapshot(path)
+            if body is None:
+                continue
+            try:
+                state = LedgerState.from_dict(body["state"])
+                if state.height and self.get_block(state.height).hash != state.tip_hash:
+                    continue
+            except (KeyError, TypeError, ValueError, LedgerError, ArchiveError):
+                continue
+            return state
+        return LedgerState()
+
+    def _catch_up(self) -> LedgerState:
+        # 呼び出し側で _state_lock 取得済み。スナップショット以降の未反映ブロックを反映する
+        state = self._state
+        for block in self.iter_blocks(state.height + 1, self.height):
+            state.apply(block)
+        return state
+
+    def user_stats(self, name: str) -> dict:
+        """ユーザー別の集計（スコア合計・学習記録数・証明書数）。"""
+        with self._state_lock:
+            return self._catch_up().user(name)
+
+    def state_summary(self) -> dict:
+        with self._state_lock:
+            state = self._catch_up()
+            return dict(height=state.height, tip_hash=state.tip_hash, records=state.records,
+                        users=len(state.users), snapshot_height=self.snapshot_height)
+
+    def _board(self) -> Leaderboard:
+        # 呼び出し側で _state_lock 取得済み。初回だけ全ユーザーから作り、以降は apply が差分更新する
+        state = self._catch_up()
+        if state.board is None:
+            state.board = Leaderboard.from_scores(((n, u[0]) for n, u in state.users.items()),
+                                                  k=self.leaderboard_k)
+        return state.board
+
+    def top_users(self, n: int = 10) -> list:
+        """スコア上位 ``n``（<= leaderboard_k）件の ``[(順位, 名前, スコア), ...]``。"""
+        with self._state_lock:
+            return self._board().top(n)
+
+    def user_rank(self, name: str) -> dict | None:
+        """ユーザーの順位（同点は同順位）。台帳に記録がなければ None。"""
+        with self._state_lock:
+            board = self._board()
+            r = board.rank(name)
+            if r is None:
+                return None
+            return dict(rank=r[0], score=r[1], users=len(board))
+
+    def snapshot(self) -> str | None:
+        """導出状態のスナップショットを書く（対象ブロックの fsync を待ってから）。"""
+        with self._state_lock:
+            state = self._catch_up()
+            if state.height == self.snapshot_height:
+                return None
+            self.sync()
+            path = write_snapshot(self.path, state, keep=self.snapshot_keep)
+            self.snapshot_height = state.height
+        with self._lock:
+            self._stats["snapshots"] += 1
+        return path
+
+    def compact(self) -> list:
+        """スナップショットより前のブロックだけを含む確定済みセグメントをアーカイブに置き換える。"""
+        if not self.snapshot_height:
+            return []
+        with self._lock:
+            limit = min(self._entry(self.snapshot_height - 1)[0], self._seg_no)
+            targets = [s for s in range(limit)
+                       if s not in self._archived and os.path.exists(self._segment_path(s))]
+        done = []
+        for seg in targets:
+            src, dst = self._segment_path(seg), self._archive_path(seg)
+            info = write_archive(src, dst, seg)
+            reader = ArchiveReader(dst)
+            if not reader.verify():
+                reader.close()
+                os.remove(dst)
+                raise LedgerError(f"archive verification failed for segment {seg}")
+            with self._lock:
+                self._archived.add(seg)
+                m = self._maps.pop(seg, None)
+                if m is not None:
+                    m.close()
+                self._stats["archived"] += 1
+            reader.close()
+            os.remove(src)
+            done.append(info)
+        return done
+
+    def _maint_loop(self):
+        while True:
+            self._maint_wake.wait()
+            self._maint_wake.clear()
+            if self._maint_stop:
+                return
+            try:
+                if self.snapshot() and self.compact_segments:
+                    self.compact()
+            except (OSError, ValueError, LedgerError, ArchiveError):
+                # 次の周期で再試行（台帳への追記は止めない）
+                with self._lock:
+                    self._stats["maintenance_errors"] += 1
+
+    def _archive_reader(self, seg_no: int) -> ArchiveReader:
+        # 呼び出し側でロック取得済み。開いたリーダーは少数だけ保持する
+        reader = self._readers.get(seg_no)
+        if reader is None:
+            reader = self._readers[seg_no] = ArchiveReader(self._archive_path(seg_no))
+            while len(self._readers) > ARCHIVE_READERS:
+                self._readers.popitem(last=False)[1].close()
+        else:
+            self._readers.move_to_end(seg_no)
+        return reader
+
+    # --- 読み出し（mmap） ---
+    def _view(self, seg_no: int, end: int):
+        m = self._maps.get(seg_no)
+        if m is None or len(m) < end:
+            if m is not None:
+                m.close()
+            with open(self._segment_path(seg_no), "rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[seg_no] = m
+        return m
+
+    def get_block(self, number: int) -> Block:
+        if not 1 <= number <= self.height:
+            raise LedgerError(f"block #{number} does not exist (height={self.height})")
+        with self._lock:
+            seg, off, length = self._entry(number - 1)
+            start = off + FRAME.size
+            if seg in self._archived:
+                payload = self._archive_reader(seg).read(start, length)
+            else:
+                payload = self._view(seg, start + length)[start:start + length]
+        return Block.from_bytes(payload)
+
+    def tree(self, number: int) -> MerkleTree:
+        # ブロックの Merkle 木（直近 TREE_CACHE_SIZE ブロック分をキャッシュ）
+        with self._lock:
+            tree = self._trees.get(number)
+            if tree is not None:
+                self._trees.move_to_end(number)
+                return tree
+        tree = MerkleTree(self.get_block(number).record_hashes)
+        with self._lock:
+            self._trees[number] = tree
+            while len(self._trees) > TREE_CACHE_SIZE:
+                self._trees.popitem(last=False)
+        return tree
+
+    def prove(self, number: int, index: int) -> list:
+        """ブロック number の index 番目の記録の包含証明（O(log n)）。"""
+        return self.tree(number).proof(index)
+
+    def iter_blocks(self, start: int = 1, end: int | None = None):
+        end = self.height if end is None else min(end, self.height)
+        for number in range(max(1, start), end + 1):
+            yield self.get_block(number)
+
+    def verify_chain(self, start: int = 1, end: int | None = None) -> bool:
+        # 前ブロックハッシュの連結と各ブロックのハッシュを検証する
+        prev = ZERO_HASH if start <= 1 else self.get_block(start - 1).hash
+        for block in self.iter_blocks(start, end):
+            if block.prev_hash != prev or block.compute_hash() != block.hash:
+                return False
+            prev = block.hash
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["height"] = self.height
+            out["segments"] = self._seg_no + 1
+            out["snapshot_height"] = self.snapshot_height
+        return out
+
+
+class BlockBuilder:
+    """開いているブロック。記録を追加するたびに Merkle 木を差分更新し、
+    ``seal`` で根を再計算せずに台帳へ確定する。"""
+
+    def __init__(self, ledger: Ledger, max_records: int = 4096):
+        self.ledger = ledger
+        self.max_records = max(1, int(max_records))
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._records = []
+        self._hashes = []
+        self._tree = MerkleTree()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def full(self) -> bool:
+        return len(self._records) >= self.max_records
+
+    def add(self, records, record_hashes=None) -> list:
+        """記録を追加し、開いているブロック内の葉インデックスを返す。"""
+        records = list(records)
+        if record_hashes is None:
+            record_hashes = [r.digest() for r in records]
+        with self._lock:
+            start = len(self._records)
+            self._records.extend(records)
+            self._hashes.extend(record_hashes)
+            self._tree.extend(record_hashes)
+            return list(range(start, start + len(records)))
+
+    def seal(self, durable: bool = True) -> Block | None:
+        with self._lock:
+            if not self._records:
+                return None
+            records, hashes, root = self._records, self._hashes, self._tree.root
+            self._reset()
+        return self.ledger.append(records, hashes, durable=durable, root=root)
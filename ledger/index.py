@@ -0,0 +1,262 @@
+import os
+import re
+import sqlite3
+import threading
+
+# ==============================
+# 証明書ID / 記録ハッシュ → 記録位置（ブロック番号, 葉インデックス）の索引
+# ==============================
+# ハッシュは32バイトBLOBの主キー（WITHOUT ROWID のクラスタ化B木）で持ち、
+# 16進プレフィックス検索は範囲検索 [lo, hi) に変換して全件走査を避ける。
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS certs (
+    cert_id TEXT PRIMARY KEY,
+    block   INTEGER NOT NULL,
+    leaf    INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hashes (
+    hash  BLOB NOT NULL,
+    block INTEGER NOT NULL,
+    leaf  INTEGER NOT NULL,
+    PRIMARY KEY (hash, block, leaf)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cert_seq (id INTEGER PRIMARY KEY AUTOINCREMENT);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS anchors (
+    seq          INTEGER PRIMARY KEY,
+    root         BLOB NOT NULL,
+    tx_hash      TEXT NOT NULL,
+    block        INTEGER NOT NULL,
+    size         INTEGER NOT NULL,
+    committed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS anchor_leaves (
+    hash BLOB NOT NULL,
+    seq  INTEGER NOT NULL,
+    leaf INTEGER NOT NULL,
+    PRIMARY KEY (hash, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS anchor_leaves_seq ON anchor_leaves (seq, leaf);
+"""
+HEX_CHARS = frozenset("0123456789abcdef")
+# 採番済みの形式（PREFIX-連番）。取り込んだ ID の連番より後から採番を続ける
+CERT_SEQ_RE = re.compile(r"^[A-Za-z]+-(\d{1,18})$")
+
+
+def prefix_range(prefix: str):
+    """16進プレフィックスを BLOB の範囲 ``(lo, hi)`` に変換する（hi=None は上限なし）。"""
+    prefix = prefix.lower()
+    if len(prefix) % 2:
+        lo = bytes.fromhex(prefix + "0")
+        top = bytearray.fromhex(prefix + "f")
+    else:
+        lo = bytes.fromhex(prefix)
+        top = bytearray(lo)
+    # top を「同じ長さで次の値」に繰り上げる
+    for i in range(len(top) - 1, -1, -1):
+        if top[i] != 0xFF:
+            top[i] += 1
+            return lo, bytes(top[: i + 1])
+    return lo, None
+
+
+class CertificateIndex:
+    """SQLite（WALモード）上の証明書索引。スレッドごとに接続を持つ。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- 更新 ---
+    @property
+    def indexed_height(self) -> int:
+        row = self._conn().execute("SELECT value FROM meta WHERE key='height'").fetchone()
+        return row[0] if row else 0
+
+    def add_blocks(self, blocks):
+        # ブロック単位でまとめて1トランザクションに入れる（冪等）。
+        # 同じ証明書IDが後のブロックに現れても最初の記録を指したままにする
+        cert_rows, hash_rows, height, top_seq = [], [], None, 0
+        for block in blocks:
+            for leaf, (rec, h) in enumerate(zip(block.records, block.record_hashes)):
+                hash_rows.append((bytes.fromhex(h), block.number, leaf))
+                if rec.cert_id:
+                    cert_rows.append((rec.cert_id, block.number, leaf))
+                    m = CERT_SEQ_RE.match(rec.cert_id)
+                    if m:
+                        top_seq = max(top_seq, int(m.group(1)))
+            height = block.number
+        if height is None:
+            return
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO certs VALUES (?, ?, ?)", cert_rows)
+                conn.executemany("INSERT OR IGNORE INTO hashes VALUES (?, ?, ?)", hash_rows)
+                if top_seq:
+                    # AUTOINCREMENT の採番位置（sqlite_sequence）を取り込んだ最大の連番まで進める
+                    conn.execute("INSERT OR IGNORE INTO cert_seq (id) VALUES (?)", (top_seq,))
+                conn.execute(
+                    "INSERT INTO meta VALUES ('height', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value=max(value, excluded.value)",
+                    (height,),
+                )
+
+    def add_block(self, block):
+        self.add_blocks((block,))
+
+    def sync(self, ledger, batch: int = 1000) -> int:
+        # 索引に未反映のブロックを追いかけて取り込む
+        start = self.indexed_height + 1
+        added = 0
+        while start <= ledger.height:
+            end = min(ledger.height, start + batch - 1)
+            self.add_blocks(ledger.iter_blocks(start, end))
+            added += end - start + 1
+            start = end + 1
+        return added
+
+    def allocate_cert_id(self, prefix: str = "TXQ") -> str:
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                seq = conn.execute("INSERT INTO cert_seq DEFAULT VALUES").lastrowid
+        return f"{prefix}-{seq:04d}"
+
+    # --- 検索 ---
+    def lookup_cert(self, cert_id: str):
+        row = self._conn().execute(
+            "SELECT block, leaf FROM certs WHERE cert_id = ?", (cert_id,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def lookup_certs(self, cert_ids, chunk: int = 500) -> dict:
+        # 複数IDをまとめて引く（IN 句を chunk 件ずつ）
+        out, ids = {}, list(cert_ids)
+        conn = self._conn()
+        for i in range(0, len(ids), chunk):
+            part = ids[i:i + chunk]
+            marks = ",".join("?" * len(part))
+            for cid, b, leaf in conn.execute(
+                f"SELECT cert_id, block, leaf FROM certs WHERE cert_id IN ({marks})", part
+            ):
+                out[cid] = (b, leaf)
+        return out
+
+    def lookup_hashes(self, full_hashes, chunk: int = 500) -> dict:
+        # 64桁ハッシュをまとめて引く。同一ハッシュが複数あれば最初のブロックを返す
+        out, keys = {}, [bytes.fromhex(h) for h in full_hashes]
+        conn = self._conn()
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            marks = ",".join("?" * len(part))
+            for h, b, leaf in conn.execute(
+                f"SELECT hash, block, leaf FROM hashes WHERE hash IN ({marks}) ORDER BY block DESC", part
+            ):
+                out[bytes(h).hex()] = (b, leaf)
+        return out
+
+    def lookup_hash(self, prefix: str, limit: int = 10) -> list:
+        """完全一致または16進プレフィックスで ``[(hash_hex, block, leaf), ...]`` を返す。"""
+        prefix = prefix.lower()
+        if not prefix or len(prefix) > 64 or not set(prefix) <= HEX_CHARS:
+            return []
+        conn = self._conn()
+        if len(prefix) == 64:
+            rows = conn.execute(
+                "SELECT hash, block, leaf FROM hashes WHERE hash = ? LIMIT ?",
+                (bytes.fromhex(prefix), limit),
+            ).fetchall()
+        else:
+            lo, hi = prefix_range(prefix)
+            if hi is None:
+                rows = conn.execute(
+                    "SELECT hash, block, leaf FROM hashes WHERE hash >= ? ORDER BY hash LIMIT ?",
+                    (lo, limit),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT hash, block, leaf FROM hashes WHERE hash >= ? AND hash < ? ORDER BY hash LIMIT ?",
+                    (lo, hi, limit),
+                ).fetchall()
+        return [(bytes(h).hex(), b, i) for h, b, i in rows]
+
+    # --- チェーンへのアンカー（記録ハッシュ → バッチの根・取引・葉の位置） ---
+    def add_anchor(self, seq: int, root: str, tx_hash: str, block: int, hashes, committed_at: float):
+        # 同じハッシュが再投入されて2回アンカーされた場合も、バッチごとの葉はすべて残す（証明の再構築用）
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO anchors VALUES (?, ?, ?, ?, ?, ?)",
+                             (seq, bytes.fromhex(root), tx_hash, block, len(hashes), committed_at))
+                conn.executemany("INSERT OR IGNORE INTO anchor_leaves VALUES (?, ?, ?)",
+                                 [(bytes.fromhex(h), seq, i) for i, h in enumerate(hashes)])
+
+    def last_anchor_seq(self) -> int:
+        row = self._conn().execute("SELECT max(seq) FROM anchors").fetchone()
+        return row[0] or 0
+
+    def lookup_anchor(self, record_hash: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT a.seq, a.root, a.tx_hash, a.block, a.size, l.leaf FROM anchor_leaves l "
+            "JOIN anchors a ON a.seq = l.seq WHERE l.hash = ? ORDER BY l.seq LIMIT 1", (bytes.fromhex(record_hash),)
+        ).fetchone()
+        if row is None:
+            return None
+        seq, root, tx, block, size, leaf = row
+        return dict(seq=seq, root=bytes(root).hex(), tx_hash=tx, block=block, size=size, leaf=leaf)
+
+    def anchor_hashes(self, seq: int) -> list:
+        """バッチ ``seq`` の記録ハッシュを葉の順に返す（証明の再構築用）。"""
+        rows = self._conn().execute(
+            "SELECT hash FROM anchor_leaves WHERE seq = ? ORDER BY leaf", (seq,)
+        ).fetchall()
+        return [bytes(h).hex() for (h,) in rows]
+
+    def unanchored(self, record_hashes, chunk: int = 500) -> set:
+        """まだアンカーのない記録ハッシュ。"""
+        keys = list({bytes.fromhex(h) for h in record_hashes})
+        conn, found = self._conn(), set()
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            marks = ",".join("?" * len(part))
+            found.update(bytes(h) for (h,) in conn.execute(
+                f"SELECT hash FROM anchor_leaves WHERE hash IN ({marks})", part))
+        return {k.hex() for k in keys if k not in found}
+
+    @property
+    def anchored_height(self) -> int:
+        # このブロックまでの記録はすべてアンカー済み（起動時の再投入はこの次から調べる）
+        row = self._conn().execute("SELECT value FROM meta WHERE key='anchored_height'").fetchone()
+        return row[0] if row else 0
+
+    def set_anchored_height(self, height: int):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT INTO meta VALUES ('anchored_height', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value=max(value, excluded.value)",
+                    (height,),
+                )
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
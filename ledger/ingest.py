@@ -0,0 +1,187 @@
+"""修了記録（CSV / JSONL）を台帳へ一括取り込みする。
+
+    python -m ledger.ingest completions.csv --batch 5000 --workers 4
+
+列（キー）は st.session_state.records と同じ name, course, score, date。
+kind / cert_id / issued_at があればそれも取り込む。ファイルはストリームで読み、
+ハッシュ計算はプロセスプールに分散、台帳へはバッチ単位のブロックで確定する。
+台帳は単一書き込みプロセス前提なので、アプリを止めてから実行すること（動いていれば開けずに終了する）。
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from ledger.engine import Ledger, LedgerError
+from ledger.index import CertificateIndex
+from ledger.records import Record
+
+DEFAULT_LEDGER_DIR = os.getenv(
+    "LEDGER_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".ledger"),
+)
+
+
+def iter_rows(path: str):
+    # 拡張子で形式を判定し、1行ずつ dict を返す（全体をメモリに載せない）
+    fh = sys.stdin if path == "-" else io.open(path, "r", encoding="utf-8-sig", newline="")
+    try:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(fh)
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def iter_chunks(rows, size: int):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def hash_chunk(rows):
+    # ワーカープロセス側: 行 → Record とハッシュ。不正行は数だけ返す
+    records, hashes, skipped = [], [], 0
+    for row in rows:
+        try:
+            rec = Record.from_dict(row)
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        records.append(rec)
+        hashes.append(rec.digest())
+    return records, hashes, skipped
+
+
+def drop_duplicate_certs(records, hashes, seen: set, index: CertificateIndex | None = None) -> tuple:
+    # 入力内で既出、または索引に登録済みの証明書IDを持つ行を除く（先に現れた行を残す）
+    ids = [rec.cert_id for rec in records if rec.cert_id]
+    if not ids:
+        return records, hashes, 0
+    taken = index.lookup_certs(ids) if index is not None else {}
+    kept_records, kept_hashes = [], []
+    for rec, h in zip(records, hashes):
+        if rec.cert_id:
+            if rec.cert_id in seen or rec.cert_id in taken:
+                continue
+            seen.add(rec.cert_id)
+        kept_records.append(rec)
+        kept_hashes.append(h)
+    return kept_records, kept_hashes, len(records) - len(kept_records)
+
+
+def ingest(path: str, ledger: Ledger, index: CertificateIndex | None = None,
+           batch: int = 5000, workers: int | None = None, chunk: int = 1000,
+           progress=None) -> dict:
+    """ファイルを取り込み、件数・所要時間・records/s を返す。
+
+    同時に処理中のチャンクは ``workers * 2`` 個までに抑えるので、
+    メモリ使用量は入力サイズに依存しない（索引なしのときは証明書IDの集合だけ増える）。
+    既に使われている証明書IDの行は取り込まず ``duplicates`` に数える。
+    """
+    workers = workers or os.cpu_count() or 1
+    window = workers * 2
+    done = skipped = duplicates = blocks = 0
+    pending_records, pending_hashes = [], []
+    seen = set()  # 未確定の証明書ID（索引なしなら全件）
+    t0 = last_report = time.perf_counter()
+
+    def commit(n: int):
+        nonlocal blocks
+        if not pending_records:
+            return
+        block = ledger.append(pending_records[:n], pending_hashes[:n], durable=False)
+        if index is not None:
+            # 索引が台帳より先に進まないよう、fsync してから登録する
+            ledger.sync()
+            index.add_block(block)
+            seen.difference_update(rec.cert_id for rec in pending_records[:n] if rec.cert_id)
+        blocks += 1
+        del pending_records[:n], pending_hashes[:n]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = deque()
+        chunks = iter_chunks(iter_rows(path), chunk)
+        while True:
+            while len(inflight) < window:
+                rows = next(chunks, None)
+                if rows is None:
+                    break
+                inflight.append(pool.submit(hash_chunk, rows))
+            if not inflight:
+                break
+            records, hashes, bad = inflight.popleft().result()
+            skipped += bad
+            records, hashes, dup = drop_duplicate_certs(records, hashes, seen, index)
+            duplicates += dup
+            done += len(records)
+            pending_records.extend(records)
+            pending_hashes.extend(hashes)
+            while len(pending_records) >= batch:
+                commit(batch)
+            now = time.perf_counter()
+            if progress and now - last_report >= 1.0:
+                progress(done, now - t0)
+                last_report = now
+        commit(len(pending_records))
+
+    ledger.sync()
+    elapsed = time.perf_counter() - t0
+    return dict(
+        records=done, skipped=skipped, duplicates=duplicates, blocks=blocks, elapsed=elapsed,
+        rate=done / elapsed if elapsed else 0.0, height=ledger.height,
+    )
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m ledger.ingest", description=__doc__.splitlines()[0])
+    ap.add_argument("path", help="CSV / JSONL ファイル（- で標準入力のCSV）")
+    ap.add_argument("--ledger-dir", default=DEFAULT_LEDGER_DIR)
+    ap.add_argument("--batch", type=int, default=5000, help="1ブロックあたりの記録数")
+    ap.add_argument("--chunk", type=int, default=1000, help="ワーカーへ渡す1回分の行数")
+    ap.add_argument("--workers", type=int, default=None, help="ハッシュ計算のプロセス数")
+    ap.add_argument("--no-index", action="store_true", help="証明書索引を更新しない")
+    args = ap.parse_args(argv)
+
+    try:
+        ledger = Ledger(args.ledger_dir)
+    except LedgerError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    index = None if args.no_index else CertificateIndex(os.path.join(args.ledger_dir, "index.sqlite"))
+    if index is not None:
+        index.sync(ledger)
+
+    def report(n, elapsed):
+        print(f"\r{n:,} records  {n / elapsed:,.0f} records/s", end="", file=sys.stderr, flush=True)
+
+    try:
+        result = ingest(args.path, ledger, index, batch=args.batch, workers=args.workers,
+                        chunk=args.chunk, progress=report)
+    finally:
+        ledger.close()
+    print(file=sys.stderr)
+    print(
+        f"ingested {result['records']:,} records in {result['blocks']:,} blocks "
+        f"({result['skipped']:,} skipped, {result['duplicates']:,} duplicate cert IDs) "
+        f"in {result['elapsed']:.2f}s — "
+        f"{result['rate']:,.0f} records/s, ledger height {result['height']:,}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
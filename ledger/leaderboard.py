@@ -0,0 +1,184 @@
+import bisect
+import heapq
+from array import array
+
+# ==============================
+# スコアのランキング（上位K件 + 任意ユーザーの順位）
+# ==============================
+# 順位: スコア値ごとの人数を Fenwick 木（BIT）で持ち、「自分より高い人数 + 1」を O(log S) で求める
+#       （S はスコアの値域。必要に応じて2倍ずつ広げる）。
+# 上位K件: 最小ヒープ + メンバーの索引。発行でスコアは増える一方なので、更新のたびに
+#       境界（K位）と比べて入れ替えるだけでよい。減った場合だけ全件から作り直す。
+# 同点は同順位（1, 2, 2, 4 ...）。上位の一覧の中の同点は名前順で、K位の境界で同点が
+#       溢れるときも名前の小さい方を残す（差分更新と作り直しで同じ順序を使う）。
+# 値域の上限を超えるスコアは最後のバケットにまとめ、その中の順位だけ整列リストで求める（まれな想定）。
+MAX_DOMAIN = 1 << 20  # BIT は 4 バイト × 値域（上限で 4 MiB）
+
+
+class _Fenwick:
+    """0..size-1 の値ごとの件数を持つ BIT。"""
+
+    __slots__ = ("size", "tree", "total")
+
+    def __init__(self, size: int, counts=None):
+        self.size = size
+        self.tree = array("i", bytes(4 * (size + 1)))
+        self.total = 0
+        if counts is not None:
+            # O(size) で構築
+            t = self.tree
+            for i, c in enumerate(counts, 1):
+                t[i] += c
+                j = i + (i & -i)
+                if j <= size:
+                    t[j] += t[i]
+            self.total = sum(counts)
+
+    def add(self, i: int, delta: int):
+        self.total += delta
+        i += 1
+        t, n = self.tree, self.size
+        while i <= n:
+            t[i] += delta
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        # [0, i) の件数
+        s, t = 0, self.tree
+        while i > 0:
+            s += t[i]
+            i -= i & -i
+        return s
+
+    def counts(self) -> list:
+        return [self.prefix(i + 1) - self.prefix(i) for i in range(self.size)]
+
+
+class _Desc(str):
+    """大小が逆の名前。ヒープの要素 ``(score, _Desc(name))`` は小さいほど下位（同点は名前が大きい方）。
+
+    比較はスコアが同点のときだけここに来るので、通常は int の比較だけで済む。
+    """
+
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return str.__gt__(self, other)
+
+    def __gt__(self, other):
+        return str.__lt__(self, other)
+
+
+class Leaderboard:
+    """ユーザー名 → スコアのランキング。``update`` は O(log S + log K)。"""
+
+    def __init__(self, k: int = 100, domain: int = 1024):
+        self.k = max(1, int(k))
+        self.scores: dict = {}
+        self._bit = _Fenwick(max(2, int(domain)))
+        self._high: list = []  # 値域の上限以上のスコア（昇順）
+        self._top: dict = {}
+        self._heap: list = []
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @classmethod
+    def from_scores(cls, items, k: int = 100) -> "Leaderboard":
+        """``(name, score)`` の列からまとめて構築する（O(n log K + S)）。"""
+        board = cls(k)
+        board.scores = {name: max(0, int(score)) for name, score in items}
+        hi = max(board.scores.values(), default=0)
+        size = board._bit.size
+        while size <= min(hi, MAX_DOMAIN - 1):
+            size *= 2
+        counts = [0] * size
+        for s in board.scores.values():
+            counts[min(s, size - 1)] += 1
+        board._bit = _Fenwick(size, counts)
+        board._high = sorted(s for s in board.scores.values() if s >= MAX_DOMAIN - 1)
+        board._rebuild_top()
+        return board
+
+    # --- 更新 ---
+    def _bucket(self, score: int) -> int:
+        if score >= self._bit.size and self._bit.size < MAX_DOMAIN:
+            size = self._bit.size
+            while size <= min(score, MAX_DOMAIN - 1):
+                size *= 2
+            counts = self._bit.counts()
+            counts.extend([0] * (size - len(counts)))
+            self._bit = _Fenwick(size, counts)
+        return min(score, self._bit.size - 1)
+
+    def update(self, name: str, score: int):
+        score = max(0, int(score))
+        old = self.scores.get(name)
+        if old == score:
+            return
+        b = self._bucket(score)  # 値域を広げる場合があるので self._bit を触る前に求める
+        if old is not None:
+            self._bit.add(self._bucket(old), -1)
+            if old >= MAX_DOMAIN - 1:
+                del self._high[bisect.bisect_left(self._high, old)]
+        self._bit.add(b, 1)
+        if score >= MAX_DOMAIN - 1:
+            bisect.insort(self._high, score)
+        self.scores[name] = score
+
+        slot = (score, _Desc(name))
+        if name in self._top:
+            if old is not None and score < old:
+                self._rebuild_top()  # 下がった場合は入れ替え候補が分からないので作り直す
+                return
+            self._top[name] = score
+            heapq.heappush(self._heap, slot)
+        elif len(self._top) < self.k:
+            self._top[name] = score
+            heapq.heappush(self._heap, slot)
+        elif self._min_top() < slot:
+            _, out = heapq.heappop(self._heap)
+            del self._top[out]
+            self._top[name] = score
+            heapq.heappush(self._heap, slot)
+        self._compact_heap()
+
+    def _min_top(self) -> tuple:
+        # 古くなった（スコアが更新された）エントリを捨ててから最小を返す
+        heap, top = self._heap, self._top
+        while top.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def _compact_heap(self):
+        if len(self._heap) > 4 * self.k + 64:
+            self._heap = [(s, _Desc(n)) for n, s in self._top.items()]
+            heapq.heapify(self._heap)
+
+    def _rebuild_top(self):
+        # top() と同じ「スコアの高い順、同点は名前順」で上位K件を選ぶ
+        best = heapq.nsmallest(self.k, self.scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        self._top = dict(best)
+        self._heap = [(s, _Desc(n)) for n, s in best]
+        heapq.heapify(self._heap)
+
+    # --- 参照 ---
+    def rank(self, name: str):
+        """``(順位, スコア)``。未登録なら None。O(log S)。"""
+        score = self.scores.get(name)
+        if score is None:
+            return None
+        if score >= MAX_DOMAIN - 1:
+            return len(self._high) - bisect.bisect_right(self._high, score) + 1, score
+        b = self._bucket(score)
+        return self._bit.total - self._bit.prefix(b + 1) + 1, score
+
+    def top(self, n: int = 10) -> list:
+        """上位 ``n``（<= k）件の ``[(順位, 名前, スコア), ...]``。"""
+        rows = sorted(self._top.items(), key=lambda kv: (-kv[1], kv[0]))[:max(0, n)]
+        out, prev, rank = [], None, 0
+        for i, (name, score) in enumerate(rows, 1):
+            if score != prev:
+                rank, prev = i, score
+            out.append((rank, name, score))
+        return out
@@ -0,0 +1,97 @@
+import hashlib
+
+# ==============================
+# Merkle木（記録ハッシュ → ブロックの records_root）
+# ==============================
+# 葉と内部ノードはプレフィックスで区別する（第二原像攻撃対策）。
+# 奇数個のレベルでは末尾ノードをそのまま上に持ち上げる。
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+LEFT = "L"
+RIGHT = "R"
+
+
+def leaf_hash(record_hash: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(record_hash)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    """追記型のMerkle木。全レベルのノードを保持する。
+
+    ``extend`` は新しい葉から根までの右端だけを再計算するので、
+    開いているブロックに k 件追加するコストは O(k + log n)。
+    """
+
+    def __init__(self, record_hashes=()):
+        self._levels = [[]]
+        if record_hashes:
+            self.extend(record_hashes)
+
+    def __len__(self) -> int:
+        return len(self._levels[0])
+
+    def append(self, record_hash: str) -> int:
+        self.extend((record_hash,))
+        return len(self) - 1
+
+    def extend(self, record_hashes):
+        leaves = self._levels[0]
+        start = len(leaves)
+        leaves.extend(leaf_hash(h) for h in record_hashes)
+        if len(leaves) == start:
+            return
+        level = 0
+        while len(self._levels[level]) > 1:
+            nodes = self._levels[level]
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            parents = self._levels[level + 1]
+            # start を含むペアから右端まで親を作り直す
+            first = start // 2
+            del parents[first:]
+            for i in range(first * 2, len(nodes), 2):
+                if i + 1 < len(nodes):
+                    parents.append(node_hash(nodes[i], nodes[i + 1]))
+                else:
+                    parents.append(nodes[i])
+            start = first
+            level += 1
+        # 葉が減ることはないので余分な上位レベルは生じない
+
+    @property
+    def root(self) -> str:
+        if not self._levels[0]:
+            return "0" * 64
+        return self._levels[-1][0].hex()
+
+    def proof(self, index: int) -> list:
+        """葉 index の包含証明 ``[(side, sibling_hex), ...]`` を返す（O(log n)）。"""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        path = []
+        for nodes in self._levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                path.append((LEFT if sibling < index else RIGHT, nodes[sibling].hex()))
+            index //= 2
+        return path
+
+
+def verify_proof(record_hash: str, proof, root: str) -> bool:
+    # 葉から根まで O(log n) 回のハッシュで検証する
+    try:
+        h = leaf_hash(record_hash)
+        for side, sibling in proof:
+            s = bytes.fromhex(sibling)
+            h = node_hash(s, h) if side == LEFT else node_hash(h, s)
+    except ValueError:
+        return False
+    return h.hex() == root
+
+
+def merkle_root(record_hashes) -> str:
+    return MerkleTree(record_hashes).root
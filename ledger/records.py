@@ -0,0 +1,121 @@
+import hashlib
+import json
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+
+from ledger.merkle import merkle_root
+
+JST = timezone(timedelta(hours=9))
+ZERO_HASH = "0" * 64
+
+
+def _canonical(obj) -> bytes:
+    # ハッシュ計算用の正規化JSON（キー順固定・空白なし）
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class Record:
+    """台帳に記録する1件の実績（学習記録 / 証明書）。"""
+
+    name: str
+    course: str
+    score: int | None
+    date: str
+    kind: str = "course"
+    cert_id: str | None = None
+    issued_at: str = ""
+
+    def to_dict(self) -> dict:
+        d = dict(name=self.name, course=self.course, score=self.score, date=self.date, kind=self.kind)
+        if self.cert_id is not None:
+            d["cert_id"] = self.cert_id
+        if self.issued_at:
+            d["issued_at"] = self.issued_at
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Record":
+        score = d.get("score")
+        return cls(
+            name=str(d["name"]),
+            course=str(d["course"]),
+            score=int(score) if score not in (None, "") else None,
+            date=str(d.get("date", "")),
+            kind=str(d.get("kind") or "course"),
+            cert_id=d.get("cert_id") or None,
+            issued_at=str(d.get("issued_at") or ""),
+        )
+
+    def digest(self) -> str:
+        return sha256_hex(_canonical(self.to_dict()))
+
+
+@dataclass(frozen=True, slots=True)
+class Block:
+    """前ブロックのハッシュで連結されたブロック。"""
+
+    number: int
+    prev_hash: str
+    timestamp: str
+    records_root: str
+    records: tuple = ()
+    record_hashes: tuple = ()
+    hash: str = field(default="")
+
+    def header(self) -> dict:
+        return dict(
+            number=self.number,
+            prev_hash=self.prev_hash,
+            timestamp=self.timestamp,
+            records_root=self.records_root,
+            count=len(self.records),
+        )
+
+    def compute_hash(self) -> str:
+        return sha256_hex(_canonical(self.header()))
+
+    def to_bytes(self) -> bytes:
+        body = self.header()
+        body["hash"] = self.hash
+        body["records"] = [r.to_dict() for r in self.records]
+        body["record_hashes"] = list(self.record_hashes)
+        return _canonical(body)
+
+    @classmethod
+    def from_bytes(cls, raw) -> "Block":
+        d = json.loads(bytes(raw).decode("utf-8"))
+        return cls(
+            number=d["number"],
+            prev_hash=d["prev_hash"],
+            timestamp=d["timestamp"],
+            records_root=d["records_root"],
+            records=tuple(Record.from_dict(r) for r in d["records"]),
+            record_hashes=tuple(d["record_hashes"]),
+            hash=d["hash"],
+        )
+
+
+def make_block(number: int, prev_hash: str, records, record_hashes=None,
+               timestamp: str | None = None, root: str | None = None) -> Block:
+    # root を渡した場合は再計算しない（BlockBuilder が差分更新済みの根を渡す）
+    records = tuple(records)
+    if record_hashes is None:
+        record_hashes = tuple(r.digest() for r in records)
+    else:
+        record_hashes = tuple(record_hashes)
+    if timestamp is None:
+        timestamp = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+    block = Block(
+        number=number,
+        prev_hash=prev_hash,
+        timestamp=timestamp,
+        records_root=merkle_root(record_hashes) if root is None else root,
+        records=records,
+        record_hashes=record_hashes,
+    )
+    return replace(block, hash=block.compute_hash())
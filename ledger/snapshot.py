@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import re
+
+from ledger.records import ZERO_HASH
+
+# ==============================
+# 導出状態のスナップショット
+# ==============================
+# 起動時はブロックを先頭から読み直さず、最新のスナップショット（高さ・先端ハッシュ・
+# ユーザー別集計）から始め、それ以降のブロックだけを必要になった時点で反映する。
+# ファイルは snapshot-<高さ>.json。本文の正規化JSONの SHA-256 を一緒に書き、
+# 読み込み時に一致しないものは使わない。
+SNAPSHOT_RE = re.compile(r"^snapshot-(\d{12})\.json$")
+SNAPSHOT_VERSION = 1
+
+
+class LedgerState:
+    """台帳から導出する状態。``apply`` でブロックを順に反映する。
+
+    ``users`` はユーザー名 → [スコア合計, 学習記録数, 証明書数]。
+    ``board`` を設定するとスコアの変化をランキングにも反映する（スナップショットには含めない）。
+    """
+
+    __slots__ = ("height", "tip_hash", "records", "users", "board")
+
+    def __init__(self, height: int = 0, tip_hash: str = ZERO_HASH, records: int = 0, users: dict | None = None):
+        self.height = height
+        self.tip_hash = tip_hash
+        self.records = records
+        self.users = {} if users is None else users
+        self.board = None
+
+    def apply(self, block):
+        if block.number != self.height + 1:
+            raise ValueError(f"block #{block.number} does not follow #{self.height}")
+        for rec in block.records:
+            u = self.users.get(rec.name)
+            if u is None:
+                u = self.users[rec.name] = [0, 0, 0]
+                if self.board is not None:
+                    self.board.update(rec.name, 0)
+            if rec.kind == "certificate":
+                u[2] += 1
+            else:
+                u[1] += 1
+                if rec.score is not None:
+                    u[0] += rec.score
+                    if self.board is not None:
+                        self.board.update(rec.name, u[0])
+        self.records += len(block.records)
+        self.height = block.number
+        self.tip_hash = block.hash
+
+    def user(self, name: str) -> dict:
+        score, courses, certificates = self.users.get(name, (0, 0, 0))
+        return dict(score=score, courses=courses, certificates=certificates)
+
+    def to_dict(self) -> dict:
+        return dict(height=self.height, tip_hash=self.tip_hash, records=self.records, users=self.users)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "LedgerState":
+        return cls(int(d["height"]), str(d["tip_hash"]), int(d["records"]),
+                   {str(k): [int(x) for x in v] for k, v in d["users"].items()})
+
+
+def _canonical(body: dict) -> bytes:
+    return json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def snapshot_path(dirpath: str, height: int) -> str:
+    return os.path.join(dirpath, f"snapshot-{height:012d}.json")
+
+
+def list_snapshots(dirpath: str) -> list:
+    """``[(高さ, パス), ...]`` を新しい順に返す。"""
+    out = []
+    for name in os.listdir(dirpath):
+        m = SNAPSHOT_RE.match(name)
+        if m:
+            out.append((int(m.group(1)), os.path.join(dirpath, name)))
+    return sorted(out, reverse=True)
+
+
+def write_snapshot(dirpath: str, state: LedgerState, keep: int = 2, **extra) -> str:
+    """スナップショットを原子的に書き、新しい ``keep`` 個を残して古いものを消す。"""
+    body = dict(version=SNAPSHOT_VERSION, state=state.to_dict(), **extra)
+    data = _canonical(body)
+    doc = json.dumps({"sha256": hashlib.sha256(data).hexdigest(), "body": body},
+                     separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    path = snapshot_path(dirpath, state.height)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(doc)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    try:
+        fd = os.open(dirpath, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass  # ディレクトリの fsync ができない環境
+    for _, old in list_snapshots(dirpath)[max(1, keep):]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return path
+
+
+def read_snapshot(path: str) -> dict | None:
+    """チェックサムが一致すれば本文を返す。壊れていれば None。"""
+    try:
+        with open(path, "rb") as f:
+            doc = json.loads(f.read())
+        body = doc["body"]
+        if hashlib.sha256(_canonical(body)).hexdigest() != doc["sha256"]:
+            return None
+        if body.get("version") != SNAPSHOT_VERSION:
+            return None
+        return body
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
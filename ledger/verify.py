@@ -0,0 +1,150 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from ledger.engine import Ledger, LedgerError
+from ledger.index import HEX_CHARS
+from ledger.merkle import verify_proof
+
+
+@dataclass(frozen=True)
+class Verification:
+    """証明書1件の検証結果。"""
+
+    ok: bool
+    record_hash: str
+    block_number: int | None = None
+    leaf_index: int | None = None
+    proof_length: int = 0
+    record: object = None
+    reason: str = ""
+
+
+def verify_inclusion(ledger: Ledger, record_hash: str, block_number: int, leaf_index: int) -> Verification:
+    # 包含証明とブロックヘッダだけで検証する（台帳の再走査はしない）
+    try:
+        block = ledger.get_block(block_number)
+        proof = ledger.prove(block_number, leaf_index)
+    except (LedgerError, IndexError):
+        return Verification(False, record_hash, block_number, leaf_index, reason="記録が見つかりません")
+    if block.compute_hash() != block.hash:
+        return Verification(False, record_hash, block_number, leaf_index, reason="ブロックハッシュ不一致")
+    if not verify_proof(record_hash, proof, block.records_root):
+        return Verification(False, record_hash, block_number, leaf_index, len(proof), reason="Merkle証明が一致しません")
+    return Verification(True, record_hash, block_number, leaf_index, len(proof), record=block.records[leaf_index])
+
+
+MIN_PREFIX = 8
+
+
+def normalize_query(query: str) -> str:
+    # "#TXQ-0023" / "abcd1234..." など画面表示のままの入力を受け付ける
+    return query.strip().lstrip("#").rstrip(".…").strip()
+
+
+def verify_certificate(ledger: Ledger, index, query: str) -> Verification:
+    """証明書IDまたは記録ハッシュ（完全一致・8桁以上のプレフィックス）で検証する。"""
+    q = normalize_query(query)
+    if not q:
+        return Verification(False, "", reason="証明書IDを入力してください")
+    loc = index.lookup_cert(q) or index.lookup_cert(q.upper())
+    if loc is not None:
+        block_number, leaf = loc
+        try:
+            record_hash = ledger.get_block(block_number).record_hashes[leaf]
+        except (LedgerError, IndexError):
+            # 索引が台帳より先に進んでいる（台帳の末尾が失われた）など
+            return Verification(False, q, block_number, leaf, reason="記録が見つかりません")
+        return verify_inclusion(ledger, record_hash, block_number, leaf)
+    if len(q) < MIN_PREFIX or not set(q.lower()) <= HEX_CHARS:
+        return Verification(False, q, reason="該当する証明書がありません")
+    matches = index.lookup_hash(q, limit=2)
+    if not matches:
+        return Verification(False, q, reason="該当する記録がありません")
+    if len(matches) > 1 and matches[0][0] != matches[1][0]:
+        return Verification(False, q, reason="複数の記録に一致します（桁数を増やしてください）")
+    record_hash, block_number, leaf = matches[0]
+    return verify_inclusion(ledger, record_hash, block_number, leaf)
+
+
+def _resolve(index, queries):
+    # 入力を証明書ID / 完全ハッシュ / プレフィックスに振り分け、まとめて位置を引く
+    located, failed = {}, {}
+    ids, fulls = [], []
+    for q in queries:
+        if len(q) == 64 and set(q.lower()) <= HEX_CHARS:
+            fulls.append(q.lower())
+        else:
+            ids.append(q)
+    by_id = index.lookup_certs(ids + [q.upper() for q in ids if q.upper() != q])
+    by_hash = index.lookup_hashes(fulls)
+    for q in queries:
+        loc = by_id.get(q) or by_id.get(q.upper()) or by_hash.get(q.lower())
+        if loc is not None:
+            located[q] = loc
+            continue
+        if len(q) < MIN_PREFIX or len(q) == 64 or not set(q.lower()) <= HEX_CHARS:
+            failed[q] = "該当する証明書がありません"
+            continue
+        matches = index.lookup_hash(q, limit=2)
+        if not matches:
+            failed[q] = "該当する記録がありません"
+        elif len(matches) > 1 and matches[0][0] != matches[1][0]:
+            failed[q] = "複数の記録に一致します（桁数を増やしてください）"
+        else:
+            located[q] = matches[0][1:]
+    return located, failed
+
+
+def _verify_block(ledger: Ledger, block_number: int, items) -> list:
+    # 同じブロックの証明書はブロック読み込み・ヘッダ検証・Merkle木を共有する
+    try:
+        block = ledger.get_block(block_number)
+        tree = ledger.tree(block_number)
+    except LedgerError:
+        return [(q, Verification(False, "", block_number, leaf, reason="記録が見つかりません")) for q, leaf in items]
+    header_ok = block.compute_hash() == block.hash
+    out = []
+    for q, leaf in items:
+        if not 0 <= leaf < len(block.record_hashes):
+            # 索引がブロックの外を指している（索引と台帳の食い違い）
+            out.append((q, Verification(False, "", block_number, leaf, reason="記録が見つかりません")))
+            continue
+        record_hash = block.record_hashes[leaf]
+        if not header_ok:
+            out.append((q, Verification(False, record_hash, block_number, leaf, reason="ブロックハッシュ不一致")))
+            continue
+        proof = tree.proof(leaf)
+        if verify_proof(record_hash, proof, block.records_root):
+            out.append((q, Verification(True, record_hash, block_number, leaf, len(proof), record=block.records[leaf])))
+        else:
+            out.append((q, Verification(False, record_hash, block_number, leaf, len(proof), reason="Merkle証明が一致しません")))
+    return out
+
+
+def verify_many(ledger: Ledger, index, queries, workers: int = 4):
+    """証明書ID / ハッシュのリストを一括検証し、``(入力, Verification)`` を逐次返す。
+
+    重複入力は1回だけ検証し、位置の解決は IN 句でまとめて行う。ブロックごとに
+    グループ化してスレッドプールで並列に検証し、終わったブロックから順に返す。
+    """
+    seen, uniq = set(), []
+    for raw in queries:
+        q = normalize_query(str(raw))
+        if q and q not in seen:
+            seen.add(q)
+            uniq.append(q)
+
+    located, failed = _resolve(index, uniq)
+    for q, reason in failed.items():
+        yield q, Verification(False, q, reason=reason)
+
+    groups = defaultdict(list)
+    for q, (block_number, leaf) in located.items():
+        groups[block_number].append((q, leaf))
+    if not groups:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="verify") as pool:
+        futures = [pool.submit(_verify_block, ledger, b, items) for b, items in groups.items()]
+        for fut in as_completed(futures):
+            yield from fut.result()
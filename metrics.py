@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+
+# ==============================
+# 計測（オプトイン）: プロセス内ヒストグラム + Prometheus テキスト形式の書き出し
+# ==============================
+# 無効時は timed / instrument がラッパーを挟まず元の関数をそのまま返し、
+# timer は共有の nullcontext を返すだけなので、ホットパスのコストはほぼゼロ。
+
+
+def _setting(name: str, default: str) -> str:
+    # api_client.get_setting と同じ優先順（環境変数 → Secrets → デフォルト）。
+    # api_client から import されるため、ここでは streamlit を遅延importする
+    raw = os.getenv(name)
+    if raw is None:
+        try:
+            import streamlit as st
+            raw = st.secrets.get(name, None)
+        except Exception:
+            raw = None
+    return default if raw is None else str(raw)
+
+
+ENABLED = _setting("METRICS_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+METRICS_FILE = _setting(
+    "METRICS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".metrics", "metrics.prom")
+)
+METRICS_EXPORT_INTERVAL = float(_setting("METRICS_EXPORT_INTERVAL", "15"))
+
+# 上限（秒）。Prometheus のデフォルトより細かい側に寄せている（描画・ハッシュはµs〜ms）
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+HELP = {
+    "rerun_seconds": "Wall time of one script run of the main page.",
+    "step_seconds": "Time spent rendering one demo step (mode=live|build|frozen).",
+    "api_request_seconds": "Latency of HTTP requests to the quest API.",
+    "api_call_seconds": "Latency of cached API lookups (cache=hit|miss).",
+    "hash_seconds": "Time spent in one hashing call.",
+    "card_render_seconds": "Time spent rendering one card.",
+}
+
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """累積しない（バケットごとの）カウントを持つ固定バケットのヒストグラム。"""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 末尾は +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(counts=list(self.counts), sum=self.sum, count=self.count)
+
+    def clear(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+            self.count = 0
+
+    def quantile(self, q: float, snap: dict | None = None) -> float:
+        # バケット内は線形補間。+Inf に入った分は最大バケットの上限で打ち切る
+        snap = snap or self.snapshot()
+        if not snap["count"]:
+            return 0.0
+        rank = q * snap["count"]
+        seen = 0
+        for i, c in enumerate(snap["counts"]):
+            if c and seen + c >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+class Registry:
+    """メトリクス名 + ラベルの組ごとに Histogram を持つ。"""
+
+    def __init__(self):
+        self._series: dict = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        h = self._series.get(key)
+        if h is None:
+            with self._lock:
+                h = self._series.setdefault(key, Histogram())
+        return h
+
+    def series(self) -> list:
+        # [(name, labels, Histogram), ...] を名前・ラベル順で返す
+        with self._lock:
+            items = list(self._series.items())
+        return [(name, dict(labels), h) for (name, labels), h in sorted(items, key=lambda kv: kv[0])]
+
+    def reset(self):
+        # 系列は残して値だけ0に戻す（timed / instrument の関数は作成時の Histogram を持ち続けるため）
+        with self._lock:
+            for h in self._series.values():
+                h.clear()
+
+    def to_prometheus(self) -> str:
+        lines, last = [], None
+        for name, labels, h in self.series():
+            if name != last:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                last = name
+            snap = h.snapshot()
+            base = [f'{k}="{_escape_label(v)}"' for k, v in labels.items()]
+            cum = 0
+            for le, c in zip(h.buckets + (float("inf"),), snap["counts"]):
+                cum += c
+                le_label = 'le="+Inf"' if le == float("inf") else f'le="{le!r}"'
+                lines.append(f"{name}_bucket{{{','.join(base + [le_label])}}} {cum}")
+            lab = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{name}_sum{lab} {snap['sum']:.9f}")
+            lines.append(f"{name}_count{lab} {snap['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = Registry()
+
+
+def observe(name: str, seconds: float, **labels):
+    REGISTRY.histogram(name, **labels).observe(seconds)
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: Histogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0)
+        return False
+
+
+def timer(name: str, **labels):
+    """``with timer("step_seconds", step="2"):`` の区間を計測する（無効時は何もしない）。"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(REGISTRY.histogram(name, **labels))
+
+
+def timed(name: str, **labels):
+    """関数の実行時間を計測するデコレーター。無効時は関数をそのまま返す。"""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        hist = REGISTRY.histogram(name, **labels)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+def instrument(obj, attr: str, name: str, **labels):
+    # 既存モジュールの関数を計測付きに差し替える（ledger のように計測に依存させたくない箇所用）
+    fn = getattr(obj, attr)
+    if ENABLED and not hasattr(fn, "__wrapped__"):
+        setattr(obj, attr, timed(name, **labels)(fn))
+
+
+def dump(path: str = METRICS_FILE) -> str:
+    # 一時ファイルに書いてから置き換える（スクレイプ側が途中の内容を読まないように）
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.to_prometheus())
+    os.replace(tmp, path)
+    return path
+
+
+def start_exporter(path: str = METRICS_FILE, interval: float = METRICS_EXPORT_INTERVAL) -> threading.Thread:
+    """``interval`` 秒ごとに ``dump(path)`` するデーモンスレッドを起動する。"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(path)
+            except OSError:
+                pass
+
+    t = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+    t.start()
+    return t
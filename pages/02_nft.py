@@ -1,6 +1,9 @@
 import streamlit as st
-import hashlib, time
-from utils import css, header, card, primary_button, go, get_quests_available, render_status_float
+from html import escape
+from issuance import COMMITTED, FAILED
+from ledger import verify_certificate
+from services import DEMO_USER, await_job, get_cert_index, get_ledger, get_user_counters, submit_issuance
+from utils import css, header, card, primary_button, go, get_quests_available, now_jst_str, render_status_float
 
 st.set_page_config(page_title="NFT証明書", page_icon="🏅",
                    layout="centered", initial_sidebar_state="collapsed")
@@ -12,10 +15,14 @@ st.session_state.setdefault("show_certificate", False)
 st.session_state.setdefault("nft_issued", False)
 st.session_state.setdefault("nft_hash", None)
 st.session_state.setdefault("certificate_id", None)
+st.session_state.setdefault("nft_job", None)
 
 quests_json, ok = get_quests_available()
 quests = quests_json.get("quests", [])
-if quests:
+if st.session_state.get("selected_quest"):
+    # デモ画面のクエスト一覧で選んだもの
+    quest_title, quest_provider = st.session_state.selected_quest
+elif quests:
     q = quests[0]
     quest_title = str(q.get("title", "地域農産物PR用SNS運用"))
     quest_provider = str(q.get("provider_name") or q.get("provider") or "Team X")
@@ -35,15 +42,27 @@ card(f"""
 """)
 
 if not st.session_state.show_certificate:
-    if primary_button("🎨 NFT証明書を発行"):
-        with st.spinner("NFT証明書を生成中..."):
-            time.sleep(1.0)
-        hv = hashlib.sha256(f"QuestNFT-{quest_title}-拓叶".encode("utf-8")).hexdigest()
-        st.session_state.nft_hash = hv
-        st.session_state.certificate_id = "TXQ-0023"
+    job = await_job(st.session_state.nft_job, "NFT証明書を生成中...")
+    if job is not None and job.status == COMMITTED:
+        st.session_state.nft_hash = job.result["hash"]
+        st.session_state.certificate_id = job.result["cert_id"]
         st.session_state.show_certificate = True
         st.session_state.nft_issued = True
+        st.session_state.nft_job = None
         st.rerun()
+    elif job is None or job.status == FAILED:
+        if job is not None:
+            st.error(f"NFT証明書の発行に失敗しました（{job.error}）")
+        if primary_button("🎨 NFT証明書を発行"):
+            issued_at = now_jst_str()
+            job_id = submit_issuance("certificate", dict(
+                name=DEMO_USER, course=quest_title, score=None, date=issued_at[:10], issued_at=issued_at,
+            ))
+            if job_id:
+                st.session_state.nft_job = job_id
+                st.rerun()
+    else:
+        primary_button("⏳ NFT証明書を生成中...", disabled=True)
 else:
     primary_button("✅ NFT証明書発行済み", disabled=True)
     card(f"""
@@ -51,7 +70,7 @@ else:
       <h3>🏅 デジタル証明書</h3>
       <p>Quest Completion NFT</p>
       <p><strong>ID:</strong> #{st.session_state.certificate_id}</p>
-      <p><strong>所有者:</strong> 拓叶</p>
+      <p><strong>所有者:</strong> {escape(DEMO_USER)}</p>
       <p style="font-size:.7rem;"><strong>Hash:</strong> {st.session_state.nft_hash[:12]}...</p>
       <hr style="opacity:.3; margin:1rem 0;">
       <p style="font-size:.85rem;">この証明書は世界中で有効です</p>
@@ -59,22 +78,42 @@ else:
     """)
     st.success("✅ NFT証明書が発行されました！")
 
-card("""
-<h3>🏢 採用企業での活用</h3>
-<div class="benefit-box">
-  <h4>株式会社〇〇 人事部</h4>
-  <p><strong>応募者:</strong> 拓叶</p>
-  <p><strong>証明書ID:</strong> #TXQ-0023</p>
-  <p><strong>検証結果:</strong> <span style="color:green;">✓ 真正性確認済み</span></p>
-  <hr style="margin:.5rem 0;">
-  <p><strong>確認された実績:</strong></p>
-  <ul style="font-size:.85rem;">
-    <li>Python基礎講座 (95点)</li>
-    <li>地域農産物PR用SNS運用</li>
-    <li>総合スコア: 782点</li>
-  </ul>
-</div>
-""")
+# 採用企業側の検証: 発行した証明書を台帳で検証し、実績はその応募者の台帳上の集計から出す
+if st.session_state.certificate_id:
+    v = verify_certificate(get_ledger(), get_cert_index(), st.session_state.certificate_id)
+    if v.ok:
+        verdict = ('<span style="color:green;">✓ 真正性確認済み</span> '
+                   f'<span style="font-size:.75rem; color:#666;">(ブロック #{v.block_number})</span>')
+        applicant, achievement = v.record.name, v.record.course
+        if v.record.score is not None:
+            achievement += f" ({v.record.score}点)"
+    else:
+        verdict = f'<span style="color:#A50E0E;">✗ 検証できません（{escape(v.reason)}）</span>'
+        applicant, achievement = DEMO_USER, quest_title
+    c = get_user_counters(applicant)
+    card(f"""
+    <h3>🏢 採用企業での活用</h3>
+    <div class="benefit-box">
+      <h4>株式会社〇〇 人事部</h4>
+      <p><strong>応募者:</strong> {escape(applicant)}</p>
+      <p><strong>証明書ID:</strong> #{escape(st.session_state.certificate_id)}</p>
+      <p><strong>検証結果:</strong> {verdict}</p>
+      <hr style="margin:.5rem 0;">
+      <p><strong>確認された実績:</strong></p>
+      <ul style="font-size:.85rem;">
+        <li>{escape(achievement)}</li>
+        <li>学習記録 {c["courses"]:,}件 / NFT証明書 {c["certificates"]:,}件</li>
+        <li>総合スコア: {c["score"]:,}点</li>
+      </ul>
+    </div>
+    """)
+else:
+    card("""
+    <h3>🏢 採用企業での活用</h3>
+    <div class="benefit-box">
+      <p>証明書を発行すると、採用企業がその証明書IDで台帳を照会した結果（真正性と実績）をここに表示します。</p>
+    </div>
+    """)
 
 # ナビゲーション
 cols = st.columns(2)
@@ -0,0 +1,78 @@
+import csv
+import io
+import time
+
+import streamlit as st
+
+from ledger import verify_many
+from ledger.verify import normalize_query
+from services import CHAIN_LABELS, anchor_status, get_cert_index, get_ledger
+from utils import css, header
+
+st.set_page_config(page_title="一括検証", page_icon="🔍",
+                   layout="centered", initial_sidebar_state="collapsed")
+
+css(); header()
+st.markdown('<div class="step-indicator">証明書の一括検証（採用担当者向け）</div>', unsafe_allow_html=True)
+st.caption("応募者リストの証明書ID（#TXQ-0001 など）または記録ハッシュ（8桁以上）をまとめて照会します。")
+
+# 結果表示の更新間隔（件）
+FLUSH_EVERY = 200
+
+
+def parse_queries(text: str) -> list:
+    # CSV/TXT どちらでも: 各行の最初の列。ヘッダ行（cert_id / hash など）は読み飛ばす
+    out = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row:
+            continue
+        v = row[0].strip()
+        if v and v.lower() not in ("cert_id", "certificate_id", "hash", "id", "証明書id"):
+            out.append(v)
+    return out
+
+
+uploaded = st.file_uploader("証明書IDリスト（CSV / TXT）", type=["csv", "txt"])
+pasted = st.text_area("または直接入力（1行1件）", height=120, placeholder="#TXQ-0001\n#TXQ-0002")
+
+queries = []
+if uploaded is not None:
+    queries.extend(parse_queries(uploaded.getvalue().decode("utf-8-sig", errors="replace")))
+if pasted:
+    queries.extend(parse_queries(pasted))
+
+if st.button("一括検証を実行", type="primary", disabled=not queries):
+    # verify_many と同じ正規化で重複を数える（"#TXQ-0001" と "TXQ-0001" は1件）
+    total = len({q for q in map(normalize_query, queries) if q})
+    progress = st.progress(0.0, text=f"0 / {total}")
+    summary = st.empty()
+    table = st.empty()
+    rows, hashes, ok_count = [], [], 0
+    t0 = time.perf_counter()
+    for q, v in verify_many(get_ledger(), get_cert_index(), queries):
+        ok_count += v.ok
+        rows.append({
+            "入力": q,
+            "検証結果": "✓ 真正性確認済み" if v.ok else f"✗ {v.reason}",
+            "受講者": v.record.name if v.ok else "",
+            "内容": v.record.course if v.ok else "",
+            "ブロック": v.block_number,
+            "ハッシュ": (v.record_hash[:16] + "...") if v.ok else "",
+            "チェーン": "照会中" if v.ok else "",
+        })
+        hashes.append(v.record_hash if v.ok else None)
+        if len(rows) % FLUSH_EVERY == 0:
+            progress.progress(min(1.0, len(rows) / total), text=f"{len(rows)} / {total}")
+            table.dataframe(rows, use_container_width=True, hide_index=True)
+    # チェーン上のアンカーは全件まとめて照会する（JSON-RPC バッチ。確定済みはキャッシュから）
+    chain = anchor_status(h for h in hashes if h)
+    for row, h in zip(rows, hashes):
+        if h:
+            row["チェーン"] = CHAIN_LABELS[chain[h]["state"]]
+    elapsed = time.perf_counter() - t0
+    progress.progress(1.0, text=f"{len(rows)} / {total}")
+    table.dataframe(rows, use_container_width=True, hide_index=True)
+    summary.success(
+        f"{len(rows)} 件を検証（重複除外後）: 確認済み {ok_count} 件 / 失敗 {len(rows) - ok_count} 件"
+        f" ・ {elapsed:.2f}秒"
+    )
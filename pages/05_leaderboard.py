@@ -0,0 +1,38 @@
+import json
+
+import streamlit as st
+
+from services import DEMO_USER, LEADERBOARD_K, get_leaderboard
+from utils import css, header
+
+st.set_page_config(page_title="ランキング", page_icon="🏆",
+                   layout="centered", initial_sidebar_state="collapsed")
+
+css(); header()
+st.markdown('<div class="step-indicator">スコアランキング</div>', unsafe_allow_html=True)
+st.caption("台帳に記録された総合スコアの順位です。発行のたびに差分更新されます（同点は同順位）。")
+
+n = st.slider("表示件数", min_value=5, max_value=int(LEADERBOARD_K), value=min(20, int(LEADERBOARD_K)), step=5)
+name = st.text_input("順位を調べるユーザー", value=DEMO_USER).strip()
+
+board = get_leaderboard(n, name or None)
+
+c1, c2 = st.columns(2)
+c1.metric("参加ユーザー", f"{board['users']:,}")
+if board["me"]:
+    c2.metric(f"{board['me']['name']} の順位", f"{board['me']['rank']:,} 位", f"{board['me']['score']:,} pt",
+              delta_color="off")
+elif name:
+    c2.metric(f"{name} の順位", "—")
+
+if board["top"]:
+    st.dataframe(
+        [{"順位": r["rank"], "ユーザー": r["name"], "スコア": r["score"]} for r in board["top"]],
+        use_container_width=True, hide_index=True,
+    )
+else:
+    st.info("まだ記録がありません。デモで学習記録を発行するとここに表示されます。")
+
+# 他システムから取り込めるよう同じ内容を JSON でも出す
+st.download_button("JSON で取得", json.dumps(board, ensure_ascii=False, indent=2),
+                   file_name="leaderboard.json", mime="application/json")
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
+
+from api_client import cached_hit_api, get_setting
+
+# ==============================
+# 次ステップのAPI先読み（共有スレッドプール）
+# ==============================
+QUESTS_PATH = "/api/v1/quests/available"
+PROFILE_PATH = "/api/v1/profile"
+
+# 各ステップの描画で必要になるエンドポイント
+STEP_ENDPOINTS = {
+    2: (QUESTS_PATH,),
+    4: (PROFILE_PATH,),
+}
+
+# 画面で使うフィールドだけを抜き出す指定（api_client.extract_fields の形式）
+ENDPOINT_FIELDS = {
+    QUESTS_PATH: {"quests": {"_limit": 1, "title": True, "provider_name": True, "provider": True}},
+    PROFILE_PATH: {"user": {"current_total_score": True}},
+}
+
+PREFETCH_ENABLED = str(get_setting("API_PREFETCH", "1")).lower() not in ("0", "false", "off")
+PREFETCH_WORKERS = get_setting("API_PREFETCH_WORKERS", 4)
+# 描画時に先読み完了を待つ上限（秒）。超えたらプレースホルダーを表示
+PREFETCH_WAIT = get_setting("API_PREFETCH_WAIT", 0.3)
+
+PENDING = object()  # 先読みが未完了であることを示す番兵
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="api-prefetch")
+
+
+def endpoints_for(step: int, include_current: bool = False) -> list:
+    # 次のステップで必要なもの。include_current なら現在までの表示分も含める
+    # （URLから途中のステップで復元した初回描画など）
+    lo = -1 if include_current else step
+    paths = []
+    for s, eps in sorted(STEP_ENDPOINTS.items()):
+        if lo < s <= step + 1:
+            paths.extend(p for p in eps if p not in paths)
+    return paths
+
+
+def start_prefetch(store: dict, paths) -> None:
+    # まだ投入していないエンドポイントを同時に投入する（store は session_state 内の dict）
+    pool = get_prefetch_pool()
+    for path in paths:
+        if path not in store:
+            store[path] = pool.submit(cached_hit_api, path, fields=ENDPOINT_FIELDS.get(path))
+
+
+def take_prefetched(store: dict, path: str, timeout: float | None = None):
+    """先読み結果 ``(data, ok)`` を返す。未投入なら None、未完了なら PENDING。"""
+    fut = store.get(path)
+    if fut is None:
+        return None
+    if not fut.done():
+        wait([fut], timeout=PREFETCH_WAIT if timeout is None else timeout)
+    if not fut.done():
+        return PENDING
+    # 消費したら破棄（以降はレスポンスキャッシュから返る）
+    store.pop(path, None)
+    try:
+        return fut.result()
+    except Exception:
+        return {}, False
@@ -0,0 +1,171 @@
+import threading
+import unicodedata
+from array import array
+
+# ==============================
+# クエストカタログ（ページ単位の遅延取得 + ローカル検索索引）
+# ==============================
+# 数万件でも扱えるよう、取得はジェネレーターでページごとに必要な分だけ進め、
+# 保持はタイトル / 提供元の並列リストのみ（dict を件数分持たない）。
+# 検索は文字 bigram の転置索引で候補を絞り、部分一致で確定する（日本語は空白で
+# 区切られないため単語索引は使わない）。
+DEFAULT_PAGE_SIZE = 100
+
+
+def normalize(s: str) -> str:
+    # 全角/半角・大文字小文字の違いを吸収
+    return unicodedata.normalize("NFKC", s).casefold()
+
+
+def bigrams(s: str) -> set:
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+def iter_quest_pages(fetch, page_size: int = DEFAULT_PAGE_SIZE, start: int = 0):
+    """``fetch(offset, limit) -> (data, ok)`` でページを順に取得し、``(quests, total_count)`` を yield する。
+
+    ``total_count`` に達したら、空ページ / 短いページが返ったら終わる。
+    サーバーがページ指定を無視して全件返した場合もその1回で終わる。取得に失敗したら
+    ``CatalogError``（それまでに yield した分は有効）。
+    """
+    offset = start
+    while True:
+        data, ok = fetch(offset, page_size)
+        if not ok:
+            raise CatalogError(f"failed to fetch quests at offset {offset}")
+        quests = data.get("quests") or []
+        if not isinstance(quests, list) or not quests:
+            return
+        total = data.get("total_count")
+        total = total if isinstance(total, int) and not isinstance(total, bool) else None
+        yield quests, total
+        offset += len(quests)
+        if len(quests) != page_size or (total is not None and offset >= total):
+            return
+
+
+class CatalogError(Exception):
+    """クエスト一覧の取得に失敗した。"""
+
+
+class QuestCatalog:
+    """プロセス共有のクエストカタログ。表示・検索に必要な分だけページを読み込む。"""
+
+    def __init__(self, fetch, page_size: int = DEFAULT_PAGE_SIZE, max_items: int = 100_000):
+        self._fetch = fetch
+        self.page_size = max(1, int(page_size))
+        self.max_items = int(max_items)
+        self.ids: list = []
+        self.titles: list = []
+        self.providers: list = []
+        self._rows: dict = {}  # クエストID -> 行番号
+        self._texts: list = []
+        self._postings: dict = {}
+        self.total = None  # total_count（分からなければ None、読み切ったら実件数）
+        self.complete = False
+        self.error = None
+        self._pages = None
+        self._lock = threading.Lock()
+        self._loader = None
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def _add(self, quests):
+        for q in quests:
+            if not isinstance(q, dict):
+                continue
+            i = len(self.titles)
+            title = str(q.get("title") or "")
+            provider = str(q.get("provider_name") or q.get("provider") or "")
+            # ID の無い応答ではタイトル+提供元を ID の代わりにする
+            qid = str(q["id"]) if q.get("id") is not None else f"{title}\n{provider}"
+            self._rows.setdefault(qid, i)
+            self.ids.append(qid)
+            self.titles.append(title)
+            self.providers.append(provider)
+            text = normalize(f"{title}\n{provider}")
+            self._texts.append(text)
+            for g in bigrams(text):
+                p = self._postings.get(g)
+                if p is None:
+                    p = self._postings[g] = array("I")
+                p.append(i)
+
+    def ensure(self, n: int) -> int:
+        """少なくとも ``n`` 件（または全件）読み込まれるまでページを進め、件数を返す。"""
+        if self.complete or len(self) >= min(n, self.max_items):
+            return len(self)  # 読み込み済みなら裏の全件読み込みを待たない
+        with self._lock:
+            while len(self) < min(n, self.max_items) and not self.complete:
+                if self._pages is None:
+                    # 失敗後は読み込み済みの位置から再開する
+                    self._pages = iter_quest_pages(self._fetch, self.page_size, start=len(self))
+                try:
+                    quests, total = next(self._pages)
+                    self._add(quests)
+                    if total is not None:
+                        self.total = min(total, self.max_items)
+                    self.error = None
+                except StopIteration:
+                    self.complete = True
+                except CatalogError as e:
+                    self._pages = None
+                    self.error = str(e)
+                    break
+            if self.complete or len(self) >= self.max_items:
+                self.complete, self.total = True, len(self)
+            return len(self)
+
+    def load_all(self) -> int:
+        return self.ensure(self.max_items)
+
+    @property
+    def loading(self) -> bool:
+        return self._loader is not None and self._loader.is_alive()
+
+    def load_async(self) -> bool:
+        """残りのページを別スレッドで読み込む（読み込み中なら何もしない）。読み込み中かを返す。"""
+        with self._lock:
+            if self.complete:
+                return False
+            if not self.loading:
+                self._loader = threading.Thread(target=self.load_all, name="quest-catalog-load", daemon=True)
+                self._loader.start()
+        return True
+
+    def get(self, i: int):
+        return self.titles[i], self.providers[i]
+
+    def find(self, quest_id: str):
+        """クエストIDの行番号。読み込み済みの範囲に無ければ None。"""
+        return self._rows.get(quest_id)
+
+    def search(self, query: str, limit: int = 1000) -> tuple:
+        """空白区切りの全語を（タイトル+提供元に）含むクエストを探し、``(先頭 limit 件の番号, 該当件数)`` を返す。
+
+        検索するのは読み込み済みの範囲（``load_async`` 中なら読み込めた分まで）。
+        """
+        terms = [t for t in normalize(query).split() if t]
+        if not terms:
+            return [], 0
+        cand = None
+        for t in terms:
+            if len(t) < 2:
+                continue
+            # 出現数の少ない bigram から絞り込む
+            for g in sorted(bigrams(t), key=lambda g: len(self._postings.get(g, ()))):
+                p = self._postings.get(g)
+                if p is None:
+                    return [], 0
+                cand = set(p) if cand is None else cand.intersection(p)
+                if not cand:
+                    return [], 0
+        rows = range(len(self._texts)) if cand is None else sorted(cand)
+        out, count = [], 0
+        for i in rows:
+            if all(t in self._texts[i] for t in terms):
+                count += 1
+                if count <= limit:
+                    out.append(i)
+        return out, count
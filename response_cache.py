@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(path: str, params: dict | None = None, fields: dict | None = None) -> tuple:
+    # エンドポイント + パラメータ（順序非依存）をキーにする。抽出指定があればそれも含める
+    items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    if fields:
+        return (path, items, json.dumps(fields, sort_keys=True, separators=(",", ":")))
+    return (path, items)
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class ResponseCache:
+    """TTL + stale-while-revalidate のレスポンスキャッシュ（LRU上限付き）。
+
+    loader は ``(data, ok)`` を返す関数。ok=True の結果だけを保存する。
+    TTL 切れでも ``stale_ttl`` 以内なら古い値を即返し、裏で1本だけ再取得する。
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 128, stale_ttl: float = 600.0):
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, stale_hits=0, misses=0, refreshes=0, refresh_failures=0, evictions=0)
+
+    # --- 内部ヘルパ ---
+    def _store(self, key, value):
+        # 呼び出し側でロック取得済みであること
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _refresh(self, key, loader):
+        try:
+            value, ok = loader()
+        except Exception:
+            value, ok = None, False
+        with self._lock:
+            self._refreshing.discard(key)
+            if ok:
+                self._stats["refreshes"] += 1
+                self._store(key, (value, ok))
+            else:
+                # 失敗時は古い値を残す（次回アクセスで再試行）
+                self._stats["refresh_failures"] += 1
+
+    # --- 公開API ---
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                if age <= self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader),
+                            name="response-cache-refresh", daemon=True,
+                        ).start()
+                    return entry.value
+                del self._entries[key]
+            self._stats["misses"] += 1
+
+        value, ok = loader()
+        if ok:
+            with self._lock:
+                self._store(key, (value, ok))
+        return value, ok
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._entries)
+            out["max_entries"] = self.max_entries
+        lookups = out["hits"] + out["stale_hits"] + out["misses"]
+        out["hit_ratio"] = (out["hits"] + out["stale_hits"]) / lookups if lookups else 0.0
+        return out
+
+
+class ValidatorCache:
+    """条件付きリクエスト用に ETag / Last-Modified と最後の本文をキーごとに保持する（LRU）。"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict(revalidated=0, not_modified=0)
+
+    def get(self, key):
+        # (etag, last_modified, value) または None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag: str | None, last_modified: str | None, value):
+        with self._lock:
+            self._entries[key] = (etag, last_modified, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, not_modified: bool):
+        with self._lock:
+            self._stats["revalidated"] += 1
+            if not_modified:
+                self._stats["not_modified"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+
+import streamlit as st
+
+import metrics
+from anchoring import AnchorScheduler
+from api_client import get_setting
+from chain_client import DEFAULT_CONTRACT, ChainClient, ChainError
+from chain_node import LocalNode
+from issuance import COMMITTED, FAILED, PENDING, RUNNING, IssuanceQueue, QueueFull
+from ledger import Ledger, LedgerLocked, Record, merkle, records
+from ledger.index import CertificateIndex
+from ledger.merkle import verify_proof
+
+# ==============================
+# プロセス共有リソース（全セッションで1つ）
+# ==============================
+LEDGER_DIR = get_setting("LEDGER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ledger"))
+
+# 導出状態のスナップショット間隔（ブロック数。0 で無効） / 古いセグメントを圧縮アーカイブにするか
+LEDGER_SNAPSHOT_EVERY = get_setting("LEDGER_SNAPSHOT_EVERY", 1000)
+LEDGER_COMPACT = str(get_setting("LEDGER_COMPACT", "1")).lower() not in ("0", "false", "off")
+# ランキングで差分更新する上位件数（表示はこの件数まで）
+LEADERBOARD_K = get_setting("LEADERBOARD_K", 100)
+
+# 発行ワーカー数 / キュー上限（超えたら「混雑中」で受付を断る） / 状態ポーリング間隔（秒）
+ISSUANCE_WORKERS = get_setting("ISSUANCE_WORKERS", 2)
+ISSUANCE_QUEUE_SIZE = get_setting("ISSUANCE_QUEUE_SIZE", 256)
+ISSUANCE_POLL = get_setting("ISSUANCE_POLL", 0.5)
+
+# チェーンへのアンカリング: N 件 / T 秒ごとに1回書く。バッファ上限を超えたら発行ワーカーが待つ
+ANCHOR_BATCH = get_setting("ANCHOR_BATCH", 64)
+ANCHOR_INTERVAL = get_setting("ANCHOR_INTERVAL", 5.0)
+ANCHOR_MAX_PENDING = get_setting("ANCHOR_MAX_PENDING", 4096)
+
+# チェーンの JSON-RPC 接続先（空ならプロセス内のスタンドインノードを起動する）
+CHAIN_RPC_URL = get_setting("CHAIN_RPC_URL", "")
+CHAIN_CONTRACT = get_setting("CHAIN_CONTRACT", DEFAULT_CONTRACT)
+# 確定とみなす確認数 / 1回の POST にまとめる最大呼び出し数
+CHAIN_CONFIRMATIONS = get_setting("CHAIN_CONFIRMATIONS", 2)
+CHAIN_MAX_BATCH = get_setting("CHAIN_MAX_BATCH", 100)
+# スタンドインノードの HTTP 1往復の遅延（秒） / 空ブロックの間隔（秒）
+CHAIN_NODE_LATENCY = get_setting("CHAIN_NODE_LATENCY", 0.05)
+CHAIN_BLOCK_TIME = get_setting("CHAIN_BLOCK_TIME", 2.0)
+
+# 台帳のハッシュ計算を計測（ledger パッケージ自体は計測に依存させない。無効時は何もしない）
+metrics.instrument(records, "sha256_hex", "hash_seconds", fn="sha256")
+metrics.instrument(merkle, "leaf_hash", "hash_seconds", fn="merkle_leaf")
+metrics.instrument(merkle, "node_hash", "hash_seconds", fn="merkle_node")
+
+# デモの利用者（発行ペイロードと集計の対象）
+DEMO_USER = "拓叶"
+
+STATUS_LABELS = {PENDING: "受付済み", RUNNING: "処理中", COMMITTED: "確定", FAILED: "失敗"}
+CHAIN_LABELS = dict(pending="書き込み待ち", confirming="確認待ち", finalized="確定",
+                    missing="チェーン上に見つかりません", unavailable="照会できません")
+
+# st.fragment は 1.37 以降。それ以前は experimental_fragment
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+
+@st.cache_resource(show_spinner=False)
+def _open_ledger() -> Ledger:
+    return Ledger(LEDGER_DIR, snapshot_every=LEDGER_SNAPSHOT_EVERY, compact=LEDGER_COMPACT,
+                  leaderboard_k=LEADERBOARD_K)
+
+
+def get_ledger() -> Ledger:
+    # 台帳の書き込みプロセスは1つ。別のプロセス（レプリカ）が開いていれば理由を出してこの実行を止める
+    # （例外はキャッシュされないので、相手が止まれば次の実行で開ける）
+    try:
+        return _open_ledger()
+    except LedgerLocked as e:
+        st.error("証明書台帳は別のプロセス（レプリカ）が使用中のため、ここでは記録・検証・集計を行えません。"
+                 "台帳を担当するレプリカから開き直すか、管理者に連絡してください。")
+        st.caption(str(e))
+        st.stop()
+
+
+@st.cache_resource(show_spinner=False)
+def get_cert_index() -> CertificateIndex:
+    index = CertificateIndex(os.path.join(LEDGER_DIR, "index.sqlite"))
+    index.sync(get_ledger())
+    return index
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_exporter():
+    # 計測有効時のみ、Prometheus テキスト形式で定期的にファイルへ書き出す
+    if not metrics.ENABLED:
+        return None
+    return metrics.start_exporter()
+
+
+@st.cache_resource(show_spinner=False)
+def get_chain_node() -> LocalNode | None:
+    if CHAIN_RPC_URL:
+        return None
+    os.makedirs(LEDGER_DIR, exist_ok=True)
+    # 取引は台帳ディレクトリに追記し、再起動してもアンカーがチェーン上に残るようにする
+    return LocalNode(latency=CHAIN_NODE_LATENCY, block_time=CHAIN_BLOCK_TIME, contract=CHAIN_CONTRACT,
+                     path=os.path.join(LEDGER_DIR, "chain-node.jsonl")).start()
+
+
+@st.cache_resource(show_spinner=False)
+def get_chain_client() -> ChainClient:
+    node = get_chain_node()
+    return ChainClient(CHAIN_RPC_URL or node.url, contract=CHAIN_CONTRACT,
+                       confirmations=CHAIN_CONFIRMATIONS, max_batch=CHAIN_MAX_BATCH)
+
+
+def resubmit_unanchored(ledger: Ledger, index: CertificateIndex, scheduler: AnchorScheduler, end: int,
+                        batch: int = 5000) -> int:
+    """アンカーのない台帳の記録を投入し直し、投入した件数を返す（起動時に裏のスレッドで1回）。
+
+    一括取り込み（ledger.ingest）した記録や、停止時にバッファに残っていた記録が対象。
+    ブロックは1つずつ読んでハッシュだけを残し、約 ``batch`` 件ごとに照会・投入する。
+    投入は ``max_pending`` 件ずつに分けるので、途中でもバッファの上限（背圧）が効く。
+    先頭から途切れずにアンカー済みの高さを索引に残し、次回はその次のブロックから調べる。
+    """
+    submitted, contiguous = 0, True
+    chunk, size = [], 0  # [(ブロック番号, 記録ハッシュ), ...]
+
+    def flush():
+        nonlocal submitted, contiguous
+        missing = index.unanchored(h for _, hashes in chunk for h in hashes)
+        if contiguous:
+            done = 0
+            for number, hashes in chunk:
+                if missing.intersection(hashes):
+                    contiguous = False
+                    break
+                done = number
+            if done:
+                index.set_anchored_height(done)
+        todo = list(dict.fromkeys(h for _, hashes in chunk for h in hashes if h in missing))
+        for i in range(0, len(todo), scheduler.max_pending):
+            scheduler.submit(todo[i:i + scheduler.max_pending])  # バッファが詰まっていれば空くまで待つ
+        submitted += len(todo)
+
+    for block in ledger.iter_blocks(index.anchored_height + 1, end):
+        chunk.append((block.number, block.record_hashes))
+        size += len(block.record_hashes)
+        if size >= batch:
+            flush()
+            chunk, size = [], 0
+    if chunk:
+        flush()
+    return submitted
+
+
+@st.cache_resource(show_spinner=False)
+def get_anchor_scheduler() -> AnchorScheduler:
+    # 確定したアンカーは証明書索引（index.sqlite）に永続化し、再起動後も引けるようにする
+    ledger, index = get_ledger(), get_cert_index()
+    scheduler = AnchorScheduler(get_chain_client(), max_batch=ANCHOR_BATCH, max_delay=ANCHOR_INTERVAL,
+                                max_pending=ANCHOR_MAX_PENDING, store=index)
+    threading.Thread(target=resubmit_unanchored, args=(ledger, index, scheduler, ledger.height),
+                     name="anchor-resubmit", daemon=True).start()
+    return scheduler
+
+
+def anchor_status(record_hashes) -> dict:
+    """記録ハッシュ → チェーン上のアンカー状態 ``dict(state, block, tx_hash, confirmations)``。
+
+    根と証明は索引に永続化したアンカーから引く（再起動後も同じ）。まず確定済みの高さで
+    全件を1回のバッチで照会し（応答はキャッシュされる）、見つからなかった根だけを先端で
+    もう1回照会する。それでも見つからない根は、記録したブロックの範囲の ``Anchored``
+    イベントから探す（``anchoredAt`` を読めないノード向け）。
+    """
+    scheduler, client = get_anchor_scheduler(), get_chain_client()
+    found = {h: scheduler.lookup(h) for h in dict.fromkeys(record_hashes)}
+    anchors = {a["root"]: a for h, a in found.items() if a and verify_proof(h, a["proof"], a["root"])}
+    try:
+        at = client.anchored_at(list(anchors), block=client.finalized) if anchors else {}
+        final = {r for r, n in at.items() if n}
+        rest = [r for r in anchors if r not in final]
+        if rest:
+            at.update(client.anchored_at(rest))
+        lost = [r for r in rest if not at.get(r)]
+        if lost:
+            blocks = [anchors[r]["block"] for r in lost]
+            for root, _, n, _ in client.anchor_logs(min(blocks), max(blocks)):
+                if root in lost and not at.get(root):
+                    at[root] = n
+        head, finalized = client.stats()["head"], client.finalized
+    except ChainError:
+        return {h: dict(state="unavailable") for h in found}
+    out = {}
+    for h, a in found.items():
+        n = at.get(a["root"], 0) if a else 0
+        if a is None:
+            out[h] = dict(state="pending")
+        elif not n:
+            out[h] = dict(state="missing", tx_hash=a["tx_hash"])
+        else:
+            out[h] = dict(state="finalized" if a["root"] in final or n <= finalized else "confirming",
+                          block=n, tx_hash=a["tx_hash"], confirmations=max(1, head - n + 1))
+    return out
+
+
+def get_user_counters(name: str = DEMO_USER) -> dict:
+    """ユーザー別の実績（総合スコア・学習記録数・NFT証明書数）。
+
+    台帳の集計は発行ごとに差分更新されるので、履歴の長さによらず参照は O(1)。
+    """
+    s = get_ledger().user_stats(name)
+    return dict(score=s["score"], courses=s["courses"], certificates=s["certificates"])
+
+
+def get_leaderboard(n: int = 10, name: str | None = DEMO_USER) -> dict:
+    """ランキング（JSON にそのまま出せる dict）。上位 ``n`` 件と ``name`` の順位。
+
+    上位件数と順位は発行ごとに差分更新されるので、全ユーザーを並べ直さない。
+    """
+    ledger = get_ledger()
+    top = [dict(rank=r, name=u, score=s) for r, u, s in ledger.top_users(n)]
+    me = ledger.user_rank(name) if name else None
+    return dict(height=ledger.height, users=ledger.state_summary()["users"], top=top,
+                me=dict(name=name, **me) if me else None)
+
+
+def issue_jobs(ledger: Ledger, index: CertificateIndex, anchors: AnchorScheduler, jobs) -> list:
+    # 取り出した発行ジョブをまとめて1ブロックに確定し、記録ハッシュをアンカリング待ちに渡す
+    # （ワーカースレッドで実行。アンカリングが詰まっていればここで待つ）
+    records = []
+    for job in jobs:
+        p = job.payload
+        records.append(Record(
+            name=p["name"], course=p["course"], score=p.get("score"), date=p["date"],
+            kind=job.kind,
+            cert_id=index.allocate_cert_id() if job.kind == "certificate" else None,
+            issued_at=p.get("issued_at", ""),
+        ))
+    block = ledger.append(records)
+    index.add_block(block)
+    anchors.submit(block.record_hashes)
+    return [
+        dict(hash=block.record_hashes[i], block=block.number, leaf=i, timestamp=block.timestamp,
+             block_hash=block.hash, cert_id=rec.cert_id)
+        for i, rec in enumerate(records)
+    ]
+
+
+@st.cache_resource(show_spinner=False)
+def get_issuance_queue() -> IssuanceQueue:
+    ledger, index, anchors = get_ledger(), get_cert_index(), get_anchor_scheduler()
+    return IssuanceQueue(
+        lambda jobs: issue_jobs(ledger, index, anchors, jobs),
+        workers=ISSUANCE_WORKERS, maxsize=ISSUANCE_QUEUE_SIZE,
+    )
+
+
+def submit_issuance(kind: str, payload: dict) -> str | None:
+    # 発行ジョブを投入してジョブIDを返す。満杯なら警告を出して None
+    try:
+        return get_issuance_queue().submit(kind, payload)
+    except QueueFull:
+        st.warning("ただいま発行処理が混み合っています。少し待ってから再度お試しください。")
+        return None
+
+
+def _job_status(job_id: str, label: str):
+    job = get_issuance_queue().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.info(f"⏳ {label}（ジョブ {job_id}: {STATUS_LABELS[job.status]}）")
+    if _fragment is None:
+        time.sleep(ISSUANCE_POLL)
+        st.rerun()
+
+
+if _fragment is not None:
+    _job_status = _fragment(run_every=ISSUANCE_POLL)(_job_status)
+
+
+def await_job(job_id: str | None, label: str):
+    """ジョブを返す。未完了なら状態表示を定期更新し、完了時にアプリ全体を再実行する。"""
+    if not job_id:
+        return None
+    job = get_issuance_queue().get(job_id)
+    if job is not None and not job.done:
+        _job_status(job_id, label)
+    return job
@@ -0,0 +1,203 @@
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# ==============================
+# セッション状態の永続化（再起動・別レプリカへの再接続後に続きから再開する）
+# ==============================
+# URL のセッショントークンをキーに、キー単位で値を保存する。変更のあったキーだけを
+# 書き戻せるよう1キー1行で持つ。値は JSON（一定サイズ以上は zlib 圧縮）。
+# 既定はローカル SQLite。SESSION_STORE にクラスのパス（"module:Class"）を指定すれば差し替えられる。
+COMPRESS_MIN_BYTES = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    seen  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_seen ON sessions (seen);
+CREATE TABLE IF NOT EXISTS session_values (
+    token TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (token, key)
+) WITHOUT ROWID;
+"""
+
+
+def encode_value(value) -> bytes:
+    # 先頭1バイトで形式を区別（j: JSON / z: zlib 圧縮した JSON）
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw, 6)
+    return b"j" + raw
+
+
+def decode_value(blob: bytes):
+    kind, body = blob[:1], blob[1:]
+    if kind == b"z":
+        body = zlib.decompress(body)
+    return json.loads(body.decode("utf-8"))
+
+
+class SessionStore:
+    """セッションストアのインターフェース（値は JSON にできるもの）。"""
+
+    def load(self, token: str) -> dict | None:
+        """保存済みの値を返す。無ければ None。"""
+        raise NotImplementedError
+
+    def save(self, token: str, changes: dict, deleted=()):
+        """変更のあったキーだけを書き、``deleted`` のキーを消す。最終アクセス時刻も更新する。"""
+        raise NotImplementedError
+
+    def sweep(self, idle: float) -> int:
+        """``idle`` 秒以上アクセスの無いセッションを消し、件数を返す。"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """プロセス内のみ（再接続には効くが再起動・別レプリカでは消える）。"""
+
+    def __init__(self, path: str = ""):
+        self._data = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def load(self, token: str) -> dict | None:
+        with self._lock:
+            values = self._data.get(token)
+            if values is None:
+                return None
+            self._seen[token] = time.time()
+            return {k: decode_value(v) for k, v in values.items()}
+
+    def save(self, token: str, changes: dict, deleted=()):
+        with self._lock:
+            values = self._data.setdefault(token, {})
+            values.update((k, encode_value(v)) for k, v in changes.items())
+            for k in deleted:
+                values.pop(k, None)
+            self._seen[token] = time.time()
+
+    def sweep(self, idle: float) -> int:
+        cutoff = time.time() - idle
+        with self._lock:
+            expired = [t for t, seen in self._seen.items() if seen < cutoff]
+            for t in expired:
+                self._data.pop(t, None)
+                self._seen.pop(t, None)
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """ローカル SQLite（WALモード）。同一ホストの全ワーカーで共有できる。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, token: str) -> dict | None:
+        conn = self._conn()
+        if conn.execute("UPDATE sessions SET seen = ? WHERE token = ?", (time.time(), token)).rowcount == 0:
+            return None
+        rows = conn.execute("SELECT key, value FROM session_values WHERE token = ?", (token,)).fetchall()
+        return {k: decode_value(v) for k, v in rows}
+
+    def save(self, token: str, changes: dict, deleted=()):
+        values = [(token, k, encode_value(v)) for k, v in changes.items()]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO sessions VALUES (?, ?) ON CONFLICT(token) DO UPDATE SET seen = excluded.seen",
+                (token, time.time()),
+            )
+            conn.executemany("INSERT OR REPLACE INTO session_values VALUES (?, ?, ?)", values)
+            conn.executemany("DELETE FROM session_values WHERE token = ? AND key = ?",
+                             [(token, k) for k in deleted])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sweep(self, idle: float) -> int:
+        cutoff = time.time() - idle
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM session_values WHERE token IN (SELECT token FROM sessions WHERE seen < ?)",
+                (cutoff,),
+            )
+            n = conn.execute("DELETE FROM sessions WHERE seen < ?", (cutoff,)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return n
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+STORES = {"sqlite": SQLiteSessionStore, "memory": MemorySessionStore}
+
+
+def open_session_store(kind: str, path: str) -> SessionStore | None:
+    """``kind`` は "sqlite" / "memory" / "module:Class"。"off" などは None（永続化しない）。"""
+    kind = (kind or "").strip()
+    if kind.lower() in ("", "0", "off", "false", "none"):
+        return None
+    cls = STORES.get(kind.lower())
+    if cls is None:
+        module, _, name = kind.partition(":")
+        cls = getattr(importlib.import_module(module), name)
+    return cls(path)
+
+
+class Sweeper:
+    """一定間隔で期限切れセッションを消すバックグラウンドスレッド。"""
+
+    def __init__(self, store: SessionStore, idle: float, interval: float):
+        self.store = store
+        self.idle = float(idle)
+        self.interval = float(interval)
+        self.swept = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="session-sweeper", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.swept += self.store.sweep(self.idle)
+            except Exception:
+                pass  # 次の周期で再試行（ロック競合等で止めない）
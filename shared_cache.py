@@ -0,0 +1,313 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN
+
+# ==============================
+# 同一ホストの全ワーカーで共有するキャッシュ / API ヘルス（SQLite WALモード）
+# ==============================
+# レプリカごとに別々にAPIを叩かないよう、レスポンスとサーキットブレーカーの状態を
+# 1つの SQLite ファイルに置く。期限切れキーの再取得はリース（有効期限付きの行ロック）
+# を取れた1ワーカーだけが行い、他は結果が書かれるのを待つ（single-flight）。
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key    TEXT PRIMARY KEY,
+    value  TEXT NOT NULL,
+    stored REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    key     TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS health (
+    name      TEXT PRIMARY KEY,
+    state     TEXT NOT NULL,
+    failures  INTEGER NOT NULL,
+    last_ok   INTEGER,
+    opened_at REAL NOT NULL,
+    since     REAL NOT NULL
+) WITHOUT ROWID;
+"""
+POLL_INTERVAL = 0.05
+
+
+class SharedStore:
+    """SQLite（WALモード）の共有ストア。スレッドごとに接続を持つ。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 自動コミット（isolation_level=None）。複数文の更新は BEGIN IMMEDIATE で囲む
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- リース（ワーカー間の single-flight 用） ---
+    def acquire(self, key: str, ttl: float) -> str | None:
+        """``key`` のリースを取れたら owner トークンを返す（期限切れのリースは奪える）。"""
+        owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO leases VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner=excluded.owner, expires=excluded.expires "
+            "WHERE leases.expires < ?",
+            (key, owner, now + ttl, now),
+        )
+        return owner if cur.rowcount == 1 else None
+
+    def release(self, key: str, owner: str):
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def lease_expires(self, key: str) -> float:
+        row = self._conn().execute("SELECT expires FROM leases WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0.0
+
+    # --- レスポンス ---
+    def get(self, key: str):
+        row = self._conn().execute("SELECT value, stored FROM responses WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, key: str, value, max_entries: int) -> int:
+        # 保存して、古いものから max_entries を超えた分を削除。削除件数を返す
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False, separators=(",", ":")), time.time()),
+        )
+        return conn.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY stored DESC LIMIT ?)",
+            (max_entries,),
+        ).rowcount
+
+    def delete(self, key: str | None = None):
+        if key is None:
+            self._conn().execute("DELETE FROM responses")
+        else:
+            self._conn().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT count(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SharedResponseCache:
+    """ResponseCache と同じインターフェースのワーカー間共有版。
+
+    TTL 内は共有ストアの値を返す。TTL 切れ（``stale_ttl`` 以内）は古い値を返し、
+    リースを取れた1スレッドだけが裏で再取得する。値が無いときはリースを取れた
+    ワーカーだけが取得し、他は最大 ``wait`` 秒その結果を待つ（待ちきれなければ自分で取得）。
+    """
+
+    def __init__(self, store: SharedStore, ttl: float = 60.0, max_entries: int = 128,
+                 stale_ttl: float = 600.0, lease_ttl: float = 15.0, wait: float = 2.0,
+                 namespace: str = ""):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.max_entries = max(1, int(max_entries))
+        self.lease_ttl = float(lease_ttl)
+        self.wait = float(wait)
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, stale_hits=0, misses=0, refreshes=0, refresh_failures=0,
+                           evictions=0, coalesced=0)
+
+    def _skey(self, key) -> str:
+        # 接続先ごとに分ける（同じファイルを別のAPIに向けたワーカーと共有しても混ざらない）
+        return self.namespace + json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _load_and_store(self, skey: str, loader):
+        value, ok = loader()
+        if ok:
+            self._count("evictions", self.store.put(skey, value, self.max_entries))
+        return value, ok
+
+    def _refresh(self, skey: str, loader, owner: str):
+        try:
+            _, ok = self._load_and_store(skey, loader)
+        except Exception:
+            ok = False
+        finally:
+            self.store.release(skey, owner)
+        self._count("refreshes" if ok else "refresh_failures")
+
+    def _wait_for(self, skey: str, since: float):
+        # 他ワーカーの取得結果（since 以降に保存されたもの）を待つ
+        deadline = time.time() + self.wait
+        while time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            row = self.store.get(skey)
+            if row is not None and row[1] >= since:
+                return row[0]
+            if self.store.lease_expires(skey) < time.time():
+                break  # 取得側が諦めた / 落ちた
+        return None
+
+    # --- 公開API ---
+    def get_or_load(self, key, loader):
+        skey = self._skey(key)
+        now = time.time()
+        row = self.store.get(skey)
+        if row is not None:
+            value, stored = row
+            age = now - stored
+            if age <= self.ttl:
+                self._count("hits")
+                return value, True
+            if age <= self.ttl + self.stale_ttl:
+                self._count("stale_hits")
+                owner = self.store.acquire(skey, self.lease_ttl)
+                if owner is not None:
+                    threading.Thread(
+                        target=self._refresh, args=(skey, loader, owner),
+                        name="shared-cache-refresh", daemon=True,
+                    ).start()
+                return value, True
+
+        self._count("misses")
+        owner = self.store.acquire(skey, self.lease_ttl)
+        if owner is None:
+            value = self._wait_for(skey, now)
+            if value is not None:
+                self._count("coalesced")
+                return value, True
+            return self._load_and_store(skey, loader)
+        try:
+            return self._load_and_store(skey, loader)
+        finally:
+            self.store.release(skey, owner)
+
+    def invalidate(self, key=None):
+        self.store.delete(None if key is None else self._skey(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        out["entries"] = self.store.count()
+        out["max_entries"] = self.max_entries
+        lookups = out["hits"] + out["stale_hits"] + out["misses"]
+        out["hit_ratio"] = (out["hits"] + out["stale_hits"] + out["coalesced"]) / lookups if lookups else 0.0
+        return out
+
+
+class SharedCircuitBreaker:
+    """CircuitBreaker と同じインターフェースで、状態を共有ストアに置く版。
+
+    全ワーカーが同じ ONLINE/OFFLINE を見る。HALF_OPEN の試行はリースで
+    ホスト全体で1件に絞る。時刻はプロセス間で比較できる wall clock を使う。
+    """
+
+    def __init__(self, store: SharedStore, name: str = "api", failure_threshold: int = 3,
+                 reset_timeout: float = 30.0, trial_ttl: float = 15.0):
+        self.store = store
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.trial_ttl = float(trial_ttl)
+        self._trial_key = f"breaker-trial:{name}"
+        # 試行リースは取ったスレッドだけが返す（別スレッドの成功/失敗で他人の試行を解放しない）
+        self._local = threading.local()
+        self.store._conn().execute(
+            "INSERT OR IGNORE INTO health VALUES (?, ?, 0, NULL, 0, ?)", (name, CLOSED, time.time())
+        )
+
+    def _row(self) -> dict:
+        state, failures, last_ok, opened_at, since = self.store._conn().execute(
+            "SELECT state, failures, last_ok, opened_at, since FROM health WHERE name = ?", (self.name,)
+        ).fetchone()
+        return dict(state=state, failures=failures, last_ok=None if last_ok is None else bool(last_ok),
+                    opened_at=opened_at, since=since)
+
+    def _update(self, fn):
+        # 読み取り → 更新を1トランザクションで（他ワーカーの更新と競合させない）
+        conn = self.store._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._row()
+            new = fn(dict(row))
+            if new["state"] != row["state"]:
+                new["since"] = time.time()
+            conn.execute(
+                "UPDATE health SET state=?, failures=?, last_ok=?, opened_at=?, since=? WHERE name=?",
+                (new["state"], new["failures"], None if new["last_ok"] is None else int(new["last_ok"]),
+                 new["opened_at"], new["since"], self.name),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _release_trial(self):
+        owner = getattr(self._local, "trial_owner", None)
+        if owner is not None:
+            self.store.release(self._trial_key, owner)
+            self._local.trial_owner = None
+
+    def allow(self) -> bool:
+        # 通信してよいか（OPEN中は False、HALF_OPEN はホスト全体で試行1件のみ True）
+        row = self._row()
+        if row["state"] == CLOSED:
+            return True
+        if row["state"] == OPEN and time.time() - row["opened_at"] < self.reset_timeout:
+            return False
+        owner = self.store.acquire(self._trial_key, self.trial_ttl)
+        if owner is None:
+            return False
+        self._local.trial_owner = owner
+        if row["state"] == OPEN:
+            self._update(lambda r: dict(r, state=HALF_OPEN))
+        return True
+
+    def record_success(self):
+        # 平常時（CLOSED・失敗0・直近成功）は状態が変わらないので書き込まない
+        row = self._row()
+        if not (row["state"] == CLOSED and row["failures"] == 0 and row["last_ok"] is True):
+            self._update(lambda r: dict(r, state=CLOSED, failures=0, last_ok=True))
+        self._release_trial()
+
+    def record_failure(self):
+        def fail(r):
+            r.update(failures=r["failures"] + 1, last_ok=False)
+            if r["state"] == HALF_OPEN or r["failures"] >= self.failure_threshold:
+                r.update(state=OPEN, opened_at=time.time())
+            return r
+        self._update(fail)
+        self._release_trial()
+
+    @property
+    def state(self) -> str:
+        return self._row()["state"]
+
+    def health(self) -> dict:
+        # render_status_float 用の共有ヘルス情報（全ワーカーで同じ値）
+        row = self._row()
+        retry_in = 0.0
+        if row["state"] == OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.time() - row["opened_at"]))
+        return dict(state=row["state"], last_ok=row["last_ok"], failures=row["failures"],
+                    retry_in=retry_in, since=row["since"])
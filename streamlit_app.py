@@ -1,26 +1,27 @@
-import os
-import re
 import time
-import hashlib
-import requests
 import streamlit as st
+import metrics
+from api_client import get_response_cache, ping_api
+from issuance import COMMITTED, FAILED
+from ledger import verify_certificate
+from services import (
+    CHAIN_LABELS, DEMO_USER, anchor_status, await_job, get_cert_index, get_ledger, get_metrics_exporter,
+    get_user_counters, submit_issuance,
+)
+from prefetch import PREFETCH_ENABLED, endpoints_for, start_prefetch
+from templates import Template, render_card
+from utils import (
+    HISTORY_MAX, api_enabled, css, get_overview_counters, get_quest_catalog, get_quests_available, header, hr,
+    now_jst_str, persist_session, primary_button, render_status_float, restore_session,
+    sample_history_md,
+)
+from history import HistoryRecord, RecordHistory
 from html import escape
-from textwrap import dedent
-from datetime import datetime, timezone, timedelta
-
-# components はフォールバック用に遅延import（未使用環境でもエラーにしない）
-try:
-    import streamlit.components.v1 as components
-except Exception:
-    components = None
 
 # ==============================
-# 基本設定（環境変数/Secrets対応）
+# 基本設定（API接続先は api_client で環境変数/Secretsから解決）
 # ==============================
-DEFAULT_API_BASE = "https://teamx-quest-api-234584649227.asia-northeast1.run.app"
-# 優先順: 1) OS環境変数 2) Streamlit Secrets 3) デフォルト
-API_BASE_URL = os.getenv("API_BASE_URL") or st.secrets.get("API_BASE_URL", DEFAULT_API_BASE)
-JST = timezone(timedelta(hours=9))
+_rerun_t0 = time.perf_counter()
 
 st.set_page_config(
     page_title="Team X ブロックチェーン学習・クエスト証明",
@@ -29,129 +30,76 @@ st.set_page_config(
     initial_sidebar_state="collapsed"  # サイドバーは使わない
 )
 
-# ==============================
-# CSS（カード/ボタン/フローティング・ステータス、h3アンカー消し）
-# ==============================
-st.markdown("""
-<style>
-    .stApp { max-width: 100%; padding: 0; }
-    .main { padding: 0 1rem; }
-    .main-header {
-        text-align: center; padding: 1.5rem 1rem;
-        background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
-        color: white; border-radius: 10px; margin-bottom: 1.5rem;
-    }
-    .main-header h1 { font-size: 1.5rem; margin-bottom: 0.5rem; }
-    .main-header p { font-size: 0.9rem; margin-top: 0.5rem; }
-
-    .demo-card {
-        background: white; padding: 1.5rem; border-radius: 15px;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        margin-bottom: 1.5rem; border: 2px solid #f0f0f0;
-        animation: slideDown 0.5s ease-out;
-    }
-    
-    @keyframes slideDown {
-        from {
-            opacity: 0;
-            transform: translateY(-20px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .highlight-box {
-        background: #f8f9fa; padding: 1rem; border-radius: 10px;
-        border-left: 4px solid #1e3c72; margin: 1rem 0; font-size: 0.9rem;
-    }
-    .big-number { font-size: 2rem; font-weight: bold; color: #1e3c72; text-align: center; }
-    .certificate {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white; padding: 1.5rem; border-radius: 15px;
-        text-align: center; margin: 1.5rem 0;
-    }
-    .benefit-box {
-        background: #e3f2fd; padding: 1rem; border-radius: 10px;
-        margin: 1rem 0; border: 1px solid #90caf9; font-size: 0.9rem;
-    }
-    .step-indicator {
-        background: #1e3c72; color: white; padding: 0.4rem 0.8rem;
-        border-radius: 20px; display: inline-block; margin-bottom: 1rem; font-size: 0.85rem;
-    }
-    
-    .step-completed {
-        background: #4caf50; color: white; padding: 0.4rem 0.8rem;
-        border-radius: 20px; display: inline-block; margin-bottom: 1rem; font-size: 0.85rem;
-    }
-
-    /* ボタンはカード/ナビ内のみワイド化 */
-    .demo-card div[data-testid="stButton"] > button,
-    .step-nav  div[data-testid="stButton"] > button { width: 100%; padding: 0.8rem; font-size: 1rem; }
-    .demo-card div[data-testid="stButton"] > button:disabled,
-    .step-nav  div[data-testid="stButton"] > button:disabled {
-        background-color: #cccccc !important; color: #666666 !important;
-        cursor: not-allowed !important; opacity: 0.6 !important;
-    }
-
-    /* ラベル無し内部ボタンを非表示（謎の空白pill対策） */
-    div[data-testid="stButton"] > button:empty { display:none !important; padding:0 !important; border:0 !important; width:0 !important; height:0 !important; }
-
-    .step-nav { margin-top: 1rem; }
-    .soft-hr { border: none; border-top: 1px solid #ECEFF4; margin: 16px 0; }
-
-    /* 右下フローティング・ステータス */
-    .status-float { position: fixed; right: 16px; bottom: 16px; z-index: 1000; }
-    @media (max-width: 600px) { .status-float { right: 10px; bottom: 10px; transform: scale(.95); } }
-
-    /* h3 見出しのアンカーリンクアイコンを非表示 */
-    h3 a, .stMarkdown h3 a, h3 .anchor, h3 .anchor-link { display: none !important; }
-    
-    /* 完了セクションを少し薄く */
-    .completed-section {
-        opacity: 0.9;
-    }
-    
-    /* プログレスバー */
-    .progress-container {
-        background: #f0f0f0;
-        border-radius: 10px;
-        height: 8px;
-        margin: 1rem 0;
-        overflow: hidden;
-    }
-    .progress-bar {
-        background: linear-gradient(90deg, #1e3c72, #2a5298);
-        height: 100%;
-        transition: width 0.5s ease;
-    }
-</style>
-""", unsafe_allow_html=True)
+css()
 
 # ==============================
-# ユーティリティ
+# 動的カードのテンプレート（プロセスで1回だけ整形）
 # ==============================
-def now_jst_str(fmt="%Y-%m-%d %H:%M:%S"):
-    return datetime.now(JST).strftime(fmt)
-
-def clean_html(s: str) -> str:
-    s = dedent(s)
-    s = re.sub(r'^[ \t]+', '', s, flags=re.MULTILINE)
-    return s.strip()
-
-def card(md: str, completed=False):
-    class_name = "demo-card completed-section" if completed else "demo-card"
-    st.markdown(f'<div class="{class_name}">{clean_html(md)}</div>', unsafe_allow_html=True)
-
-def hr():
-    st.markdown('<hr class="soft-hr" />', unsafe_allow_html=True)
-
-def primary_button(label: str, disabled: bool = False):
-    try:
-        return st.button(label, type="primary", use_container_width=True, disabled=disabled)
-    except TypeError:
-        return st.button(label, disabled=disabled)
+RECORD_INFO_CARD = Template("record_info", """
+<div class="highlight-box" style="background: #e8f5e9;">
+    <p><strong>🔐 記録ID:</strong></p>
+    <code>$hash_short...</code>
+</div>
+<div class="highlight-box" style="background: #f5f5f5;">
+    <p><strong>📦 ブロック情報:</strong></p>
+    <p>ブロック番号: #$block_number</p>
+    <p>ブロックハッシュ: <code>$block_hash...</code></p>
+    <p>タイムスタンプ: $timestamp</p>
+    <p>ネットワーク: Polygon Amoy (testnet)</p>
+    <p>チェーン: $chain</p>
+</div>
+<div class="benefit-box" style="background:#e8f4ff;border-color:#90caf9;">
+    💡 学習記録もNFT証明書として発行できます
+</div>
+""")
+
+QUEST_CARD = Template("quest", """
+<h3>🎓 クエスト完了！</h3>
+<p><strong>「$title」</strong></p>
+<div class="highlight-box">
+    <p><strong>提供元:</strong> $provider</p>
+    <p><strong>期間:</strong> 3ヶ月</p>
+    <p><strong>成果:</strong> フォロワー2,000人獲得</p>
+    <p><strong>獲得スキル:</strong> SNS運用、マーケティング、データ分析</p>
+</div>
+""")
+
+CERTIFICATE_CARD = Template("certificate", """
+<div class="certificate">
+    <h3>🏅 デジタル証明書</h3>
+    <p>Quest Completion NFT</p>
+    <p><strong>ID:</strong> #$cert_id</p>
+    <p><strong>所有者:</strong> 拓叶</p>
+    <p style="font-size: 0.7rem;"><strong>Hash:</strong> $hash_short...</p>
+    <hr style="opacity: 0.3; margin: 1rem 0;">
+</div>
+""")
+
+HR_CARD = Template("hr_verification", """
+<h3>🏢 採用企業での活用</h3>
+<div class="benefit-box">
+    <h4>株式会社〇〇 人事部</h4>
+    <p><strong>応募者:</strong> $applicant</p>
+    <p><strong>証明書ID:</strong> #$cert_id</p>
+    <p><strong>検証結果:</strong> $verdict</p>
+    <hr style="margin: 0.5rem 0;">
+    <p><strong>確認された実績:</strong></p>
+    <ul style="font-size: 0.85rem;">
+        <li>$achievement</li>
+        <li>学習記録 $courses件 / NFT証明書 $certificates件</li>
+        <li>総合スコア: $total_score点</li>
+    </ul>
+</div>
+""")
+
+STATS_CARD = Template("stats", """
+<h3>📊 記録された実績</h3>
+<div style="display:grid; grid-template-columns: repeat(3, 1fr); gap: 16px;">
+    <div><div class="big-number">$total_score</div><p style="text-align:center; font-size:0.8rem;">総合スコア</p></div>
+    <div><div class="big-number">$courses</div><p style="text-align:center; font-size:0.8rem;">学習記録</p></div>
+    <div><div class="big-number">$certificates</div><p style="text-align:center; font-size:0.8rem;">NFT証明書</p></div>
+</div>
+""")
 
 # --- Query Params helpers（新旧API両対応） ---
 def _qp_get():
@@ -176,7 +124,7 @@ def reset_demo():
     # デモをリセット
     st.session_state.demo_step = 0
     defaults = dict(
-        records=[],
+        records=RecordHistory(HISTORY_MAX),
         show_certificate=False,
         blockchain_recorded=False,
         nft_issued=False,
@@ -184,6 +132,10 @@ def reset_demo():
         block_info=None,
         nft_hash=None,
         certificate_id=None,
+        record_job=None,
+        nft_job=None,
+        selected_quest=None,
+        frozen={},
     )
     for k, v in defaults.items():
         st.session_state[k] = v
@@ -191,58 +143,55 @@ def reset_demo():
     st.rerun()
 
 # --- APIラッパー ---
-def render_status_float(container, mode_on: bool, last_ok: bool | None):
-    if not mode_on:
-        text = "API: OFF（手動）"; bg, fg = "#F1F3F4", "#5F6368"
-    else:
-        if last_ok is True:
-            text = "API: 🟢 ONLINE"; bg, fg = "#E6F4EA", "#137333"
-        elif last_ok is False:
-            text = "API: 🔴 OFFLINE（フォールバック）"; bg, fg = "#FCE8E6", "#A50E0E"
-        else:
-            text = "API: ⏳ 未チェック"; bg, fg = "#FFF4CE", "#5C2E00"
-    container.markdown(
-        f"<div class='status-float'><span style='padding:4px 10px; border-radius:12px; background:{bg}; color:{fg}; font-size:0.85rem;'>{text}</span></div>",
-        unsafe_allow_html=True
+def verdict_html(v) -> str:
+    return (
+        '<span style="color: green;">✓ 真正性確認済み</span> '
+        f'<span style="font-size: 0.75rem; color: #666;">(ブロック #{v.block_number}・証明 {v.proof_length} ハッシュ)</span>'
     )
 
-def ping_api(timeout=3) -> bool:
-    try:
-        r = requests.get(f"{API_BASE_URL}/api/v1/quests/available", timeout=timeout)
-        return r.status_code == 200
-    except requests.RequestException:
-        return False
+def chain_html(status: dict) -> str:
+    # アンカーの状態（確定 / 確認待ちは取引ハッシュとブロック番号も出す）
+    label = escape(CHAIN_LABELS.get(status.get("state"), "不明"))
+    if "block" not in status:
+        return label
+    return (f'{label} <span style="font-size: 0.75rem; color: #666;">(ブロック #{status["block"]}・'
+            f'確認 {status["confirmations"]}・<code>{escape(status["tx_hash"][:12])}...</code>)</span>')
+
+def render_cache_stats():
+    # キャッシュのサイズ調整用カウンタ（ヒット数等はこのワーカー分、件数は共有キャッシュ全体）
+    s = get_response_cache().stats()
+    coalesced = f" / 待ち合わせ {s['coalesced']}" if "coalesced" in s else ""
+    st.caption(
+        f"キャッシュ: hit {s['hits']} / stale {s['stale_hits']} / miss {s['misses']}{coalesced} / "
+        f"refresh {s['refreshes']} ・ {s['entries']}/{s['max_entries']}件"
+    )
 
-def hit_api(path: str, timeout=5):
-    try:
-        r = requests.get(f"{API_BASE_URL}{path}", timeout=timeout)
-        if r.status_code == 200:
-            return r.json(), True
-        return {}, False
-    except requests.RequestException:
-        return {}, False
-
-def get_quests_available():
-    if not st.session_state.api_on:
-        return {"status": "available", "quests": [], "total_count": 0}, None
-    data, ok = hit_api("/api/v1/quests/available")
-    if not ok:
-        data = {"status": "available", "quests": [], "total_count": 0}
-    st.session_state.api_last_ok = ok
-    return data, ok
-
-def get_profile():
-    if not st.session_state.api_on:
-        return {}, None
-    data, ok = hit_api("/api/v1/profile")
-    if not ok:
-        data = {}
-    st.session_state.api_last_ok = ok
-    return data, ok
+# ==============================
+# 診断ビュー（計測有効時のみ。?diag=1 で開く隠しページ）
+# ==============================
+if metrics.ENABLED:
+    get_metrics_exporter()
+    raw_diag = _qp_get().get("diag")
+    if isinstance(raw_diag, list):
+        raw_diag = raw_diag[0]
+    if raw_diag == "1":
+        from diagnostics import render_diagnostics
+        render_diagnostics()
+        st.stop()
 
 # ==============================
 # セッション状態 初期化
 # ==============================
+# 再起動・別レプリカへの再接続後も続きから見られるよう、進行状況は ?sid= ごとに保存する
+# （発行ジョブIDや凍結HTMLはワーカー内でしか意味が無いので保存しない）
+PERSIST_KEYS = (
+    "demo_step", "api_on", "records", "show_certificate", "blockchain_recorded", "nft_issued",
+    "hash_value", "block_info", "nft_hash", "certificate_id", "selected_quest", "quest",
+)
+restore_session(PERSIST_KEYS, decoders=dict(
+    records=lambda s: RecordHistory.from_state(s, HISTORY_MAX),
+))
+
 if "demo_step" not in st.session_state:
     qp = _qp_get()
     raw = qp.get("step")
@@ -259,11 +208,9 @@ if "api_on" not in st.session_state:
     if isinstance(raw_api, list):
         raw_api = raw_api[0]
     st.session_state.api_on = (raw_api is None) or (str(raw_api) == "1")  # デフォルトON
-if "api_last_ok" not in st.session_state:
-    st.session_state.api_last_ok = None
 
 defaults = dict(
-    records=[],
+    records=RecordHistory(HISTORY_MAX),  # 直近 HISTORY_MAX 件の記録（HistoryRecord）
     show_certificate=False,
     blockchain_recorded=False,
     nft_issued=False,
@@ -271,19 +218,27 @@ defaults = dict(
     block_info=None,
     nft_hash=None,
     certificate_id=None,
+    record_job=None,
+    nft_job=None,
+    selected_quest=None,  # クエスト一覧で選んだ (タイトル, 提供元)
+    frozen={},  # 完了ステップの凍結済みHTML（ステップ番号 → Markdown）
 )
 for k, v in defaults.items():
     st.session_state.setdefault(k, v)
 
+# 次のステップで使うAPIを先読み（初回は現在ステップまでの分もまとめて並列投入）
+if "prefetch" not in st.session_state:
+    st.session_state.prefetch = {}
+    first_run = True
+else:
+    first_run = False
+if PREFETCH_ENABLED and st.session_state.api_on:
+    start_prefetch(st.session_state.prefetch, endpoints_for(st.session_state.demo_step, include_current=first_run))
+
 # ==============================
 # ヘッダー（右上に⚙️ポップオーバー）
 # ==============================
-st.markdown("""
-<div class="main-header">
-    <h1>🎓 Team X ブロックチェーン学習・実績証明</h1>
-    <p>実績を永久に、確実に、証明する</p>
-</div>
-""", unsafe_allow_html=True)
+header()
 
 # プログレスバー
 progress = (st.session_state.demo_step / 4) * 100
@@ -311,11 +266,11 @@ with c_right:
 
                 if st.button("接続テスト", use_container_width=True):
                     ok = ping_api()
-                    st.session_state.api_last_ok = ok
                     if ok:
                         st.success("APIはONLINEです。")
                     else:
                         st.warning("APIに接続できません（フォールバック表示）。")
+                render_cache_stats()
         except Exception:
             with st.expander("⚙️ API設定", expanded=False):
                 try:
@@ -329,27 +284,157 @@ with c_right:
 
                 if st.button("接続テストを実行", use_container_width=True):
                     ok = ping_api()
-                    st.session_state.api_last_ok = ok
                     if ok:
                         st.success("APIはONLINEです。")
                     else:
                         st.warning("APIに接続できません（フォールバック表示）。")
+                render_cache_stats()
 
 # 右下のフローティング・ステータス（常に1つだけ）
 status_float = st.empty()
-render_status_float(status_float, st.session_state.api_on, st.session_state.api_last_ok)
 
 # ==============================
 # コンテンツ（累積表示方式）
 # ==============================
+# 完了したステップは1つの Markdown 要素に凍結し、以降の再実行では組み立て直さない。
+# 操作中のステップだけを fragment で囲み、ボタン等の操作ではそこだけを再実行する。
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
 
-# ステップ 0: はじめに（常に表示）
-if st.session_state.demo_step >= 0:
-    is_completed = st.session_state.demo_step > 0
-    if is_completed:
-        st.markdown('<div class="step-completed">✅ 導入: 完了</div>', unsafe_allow_html=True)
-    
-    card("""
+DEFAULT_QUEST = ("地域農産物PR用SNS運用", "Team X")
+
+class StepWriter:
+    """ステップの出力先。live なら即描画し、そうでなければ凍結用にHTMLを溜める。"""
+
+    def __init__(self, live: bool):
+        self.live = live
+        self.parts = []
+
+    def html(self, s: str):
+        if self.live:
+            st.markdown(s, unsafe_allow_html=True)
+        else:
+            self.parts.append(s)
+
+    @metrics.timed("card_render_seconds", kind="static")
+    def card(self, md: str, completed=False):
+        # 静的カードは前処理済みHTMLをキャッシュから返す
+        self.html(render_card(md, completed))
+
+    @metrics.timed("card_render_seconds", kind="template")
+    def card_t(self, template: Template, completed=False, **params):
+        # 動的カードは値だけ差し込む（値のエスケープは呼び出し側）
+        self.html(template.render(completed, **params))
+
+    def hr(self):
+        self.html('<hr class="soft-hr" />')
+
+    def header(self, active: bool, done_label: str, active_label: str):
+        if active:
+            self.html(f'<div class="step-indicator">{active_label}</div>')
+        else:
+            self.html(f'<div class="step-completed">✅ {done_label}: 完了</div>')
+
+    def frozen(self) -> str:
+        return "\n\n".join(self.parts)
+
+def step_nav(label: str = "次のステップへ") -> bool:
+    st.markdown('<div class="step-nav">', unsafe_allow_html=True)
+    clicked = primary_button(label)
+    st.markdown('</div>', unsafe_allow_html=True)
+    return clicked
+
+def load_quest():
+    # ステップ2で使うクエスト（凍結時にも使うのでセッションに保持）。一覧で選んだものを優先
+    if st.session_state.selected_quest is not None:
+        st.session_state.quest = st.session_state.selected_quest
+        return
+    quests_json, ok = get_quests_available()
+    quests = quests_json.get("quests", [])
+    if isinstance(quests, list) and quests:
+        q = quests[0]
+        st.session_state.quest = (
+            str(q.get("title", DEFAULT_QUEST[0])),
+            str(q.get("provider_name") or q.get("provider") or DEFAULT_QUEST[1]),
+        )
+    else:
+        st.session_state.quest = DEFAULT_QUEST
+
+def load_counters():
+    st.session_state.counters = get_overview_counters(DEMO_USER)
+
+QUEST_WINDOW = 20  # クエスト一覧で一度に描画する行数
+CATALOG_POLL = 0.5  # 検索中にカタログの読み込み完了を確認する間隔（秒）
+
+def _pick_quest():
+    # 選択はクエストIDで持つ（カタログが作り直されても行番号のずれで別のクエストにならない）
+    quest_id = st.session_state.get("quest_pick")
+    catalog = get_quest_catalog()
+    i = catalog.find(quest_id) if quest_id is not None else None
+    if i is not None:
+        st.session_state.selected_quest = st.session_state.quest = catalog.get(i)
+
+def _catalog_loading():
+    # 裏で全件を読み込み中。終わったらアプリ全体を再実行して全件から検索し直す
+    catalog = get_quest_catalog()
+    if not catalog.loading:
+        st.rerun()
+    total = f"{catalog.total:,}" if catalog.total is not None else "?"
+    st.caption(f"⏳ クエスト一覧を読み込み中（{len(catalog):,} / {total} 件）。読み込み済みの分から検索しています")
+    if _fragment is None:
+        time.sleep(CATALOG_POLL)
+        st.rerun()
+
+if _fragment is not None:
+    _catalog_loading = _fragment(run_every=CATALOG_POLL)(_catalog_loading)
+
+def render_quest_picker():
+    # 表示する窓の分だけカタログを読み込み、その行だけを描画する（件数が増えても一定コスト）
+    with st.expander("📚 ほかのクエストを選ぶ", expanded=False):
+        if not api_enabled():
+            st.caption("API連携がOFFのため一覧は表示できません")
+            return
+        catalog = get_quest_catalog()
+        query = st.text_input("タイトル・提供元で検索", key="quest_query", placeholder="例: 農産物 Team X")
+        if query.strip():
+            # 全件読み込みは待たずに、読み込み済みの分から検索する（取得に失敗した後は自動で再試行しない）
+            loading = catalog.load_async() if catalog.error is None else catalog.loading
+            hits, count = catalog.search(query)
+            if loading:
+                _catalog_loading()
+        else:
+            hits = None
+            catalog.ensure(QUEST_WINDOW)
+            count = catalog.total if catalog.total is not None else len(catalog)
+
+        # 件数は実際の該当数を出すが、ページ送りできるのは検索結果として保持した分まで
+        pages = max(1, -(-(count if hits is None else len(hits)) // QUEST_WINDOW))
+        if st.session_state.get("quest_page", 1) > pages:
+            st.session_state.quest_page = pages
+        page = st.number_input(f"ページ（全 {pages:,}）", min_value=1, max_value=pages, step=1,
+                               key="quest_page")
+        start = (page - 1) * QUEST_WINDOW
+        if hits is None:
+            end = min(start + QUEST_WINDOW, catalog.ensure(start + QUEST_WINDOW))
+            rows = list(range(start, end))
+        else:
+            rows = hits[start:start + QUEST_WINDOW]
+        if catalog.error:
+            st.caption("⚠️ クエスト一覧の一部を取得できませんでした")
+        if not rows:
+            st.caption("該当するクエストがありません" if hits is not None else "クエストがありません")
+            return
+        st.radio(
+            f"{count:,} 件中 {start + 1:,}〜{start + len(rows):,} 件目",
+            [catalog.ids[i] for i in rows], index=None, key="quest_pick", on_change=_pick_quest,
+            format_func=lambda quest_id: " — ".join(catalog.get(catalog.find(quest_id))),
+        )
+
+# ステップ 0: はじめに
+def step_0(w: StepWriter, active: bool):
+    if not active:
+        w.html('<div class="step-completed">✅ 導入: 完了</div>')
+
+    w.card("""
     <h3>🤔 現在の課題</h3>
     <div class="highlight-box">
         <ul>
@@ -366,23 +451,19 @@ if st.session_state.demo_step >= 0:
             <li>♾️ <strong>永久保存</strong></li>
         </ul>
     </div>
-    """, completed=is_completed)
-    
-    if st.session_state.demo_step == 0:
+    """, completed=not active)
+
+    if active:
         hr()
         if primary_button("🚀 実際に体験してみる"):
             goto_next_step()
 
 # ステップ 1: 学習記録を保存
-if st.session_state.demo_step >= 1:
-    hr()
-    is_completed = st.session_state.demo_step > 1
-    if is_completed:
-        st.markdown('<div class="step-completed">✅ ステップ 1/3: 完了</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="step-indicator">ステップ 1/3: 学習記録を保存</div>', unsafe_allow_html=True)
-    
-    card("""
+def step_1(w: StepWriter, active: bool):
+    w.hr()
+    w.header(active, "ステップ 1/3", "ステップ 1/3: 学習記録を保存")
+
+    w.card("""
     <h3>📝 拓叶さんが「Python基礎講座」を完了</h3>
     <div class="highlight-box">
         <p><strong>受講者:</strong> 拓叶さん</p>
@@ -390,196 +471,164 @@ if st.session_state.demo_step >= 1:
         <p><strong>完了日:</strong> 2025年8月30日</p>
         <p><strong>スコア:</strong> 95点</p>
     </div>
-    """, completed=is_completed)
-    
-    if st.session_state.demo_step == 1:
+    """, completed=not active)
+
+    if active:
         if not st.session_state.blockchain_recorded:
-            if primary_button("🔗 ブロックチェーンに記録する"):
-                with st.spinner("記録を保存中..."):
-                    time.sleep(1.2)
-                payload = f"拓叶-Python基礎講座-95点-{now_jst_str()}"
-                hash_value = hashlib.sha256(payload.encode("utf-8")).hexdigest()
-                st.session_state.hash_value = hash_value
-                st.session_state.block_info = {"number": 1247, "timestamp": now_jst_str()}
-                st.session_state.records.append({
-                    "name": "拓叶", "course": "Python基礎講座", "score": 95,
-                    "hash": hash_value, "date": "2025-08-30",
-                })
+            # 記録はワーカーで非同期に確定し、ジョブ状態をポーリングして反映する
+            job = await_job(st.session_state.record_job, "記録を保存中...")
+            if job is not None and job.status == COMMITTED:
+                r = job.result
+                st.session_state.hash_value = r["hash"]
+                st.session_state.block_info = {
+                    "number": r["block"], "timestamp": r["timestamp"], "hash": r["block_hash"],
+                }
+                st.session_state.records.append(HistoryRecord.from_hex(
+                    job.payload["name"], job.payload["course"], job.payload["score"],
+                    r["hash"], job.payload["date"], r["block"],
+                ))
                 st.session_state.blockchain_recorded = True
+                st.session_state.record_job = None
                 st.rerun()
+            elif job is None or job.status == FAILED:
+                if job is not None:
+                    st.error(f"記録に失敗しました（{job.error}）")
+                if primary_button("🔗 ブロックチェーンに記録する"):
+                    job_id = submit_issuance("course", dict(
+                        name=DEMO_USER, course="Python基礎講座", score=95, date="2025-08-30",
+                        issued_at=now_jst_str(),
+                    ))
+                    if job_id:
+                        st.session_state.record_job = job_id
+                        st.rerun()
+            else:
+                primary_button("⏳ 記録を保存中...", disabled=True)
         else:
             primary_button("✅ ブロックチェーンに記録済み", disabled=True)
 
     if st.session_state.blockchain_recorded and st.session_state.hash_value:
-        card(f"""
-        <div class="highlight-box" style="background: #e8f5e9;">
-            <p><strong>🔐 記録ID:</strong></p>
-            <code>{st.session_state.hash_value[:24]}...</code>
-        </div>
-        <div class="highlight-box" style="background: #f5f5f5;">
-            <p><strong>📦 ブロック情報:</strong></p>
-            <p>ブロック番号: #{st.session_state.block_info['number']}</p>
-            <p>タイムスタンプ: {st.session_state.block_info['timestamp']}</p>
-            <p>ネットワーク: Polygon Amoy (testnet)</p>
-        </div>
-        <div class="benefit-box" style="background:#e8f4ff;border-color:#90caf9;">
-            💡 学習記録もNFT証明書として発行できます
-        </div>
-        """, completed=is_completed)
-
-    if st.session_state.demo_step == 1 and st.session_state.blockchain_recorded:
-        st.markdown('<div class="step-nav">', unsafe_allow_html=True)
-        if primary_button("次のステップへ"):
+        w.card_t(
+            RECORD_INFO_CARD, not active,
+            hash_short=escape(st.session_state.hash_value[:24]),
+            block_number=st.session_state.block_info["number"],
+            block_hash=escape(st.session_state.block_info.get("hash", "")[:16]),
+            timestamp=escape(st.session_state.block_info["timestamp"]),
+            chain=chain_html(anchor_status([st.session_state.hash_value])[st.session_state.hash_value]),
+        )
+
+    if active and st.session_state.blockchain_recorded:
+        if step_nav():
             goto_next_step()
-        st.markdown('</div>', unsafe_allow_html=True)
 
 # ステップ 2: デジタル証明書の発行
-if st.session_state.demo_step >= 2:
-    hr()
-    is_completed = st.session_state.demo_step > 2
-    if is_completed:
-        st.markdown('<div class="step-completed">✅ ステップ 2/3: 完了</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="step-indicator">ステップ 2/3: デジタル証明書の発行</div>', unsafe_allow_html=True)
-    
-    quests_json, ok = get_quests_available()
-    quests = quests_json.get("quests", [])
-    if isinstance(quests, list) and quests:
-        q = quests[0]
-        quest_title = str(q.get("title", "地域農産物PR用SNS運用"))
-        quest_provider = str(q.get("provider_name") or q.get("provider") or "Team X")
-    else:
-        quest_title = "地域農産物PR用SNS運用"
-        quest_provider = "Team X"
-    render_status_float(status_float, st.session_state.api_on, ok if st.session_state.api_on else None)
+def step_2(w: StepWriter, active: bool):
+    w.hr()
+    w.header(active, "ステップ 2/3", "ステップ 2/3: デジタル証明書の発行")
 
-    card(f"""
-    <h3>🎓 クエスト完了！</h3>
-    <p><strong>「{escape(quest_title)}」</strong></p>
-    <div class="highlight-box">
-        <p><strong>提供元:</strong> {escape(quest_provider)}</p>
-        <p><strong>期間:</strong> 3ヶ月</p>
-        <p><strong>成果:</strong> フォロワー2,000人獲得</p>
-        <p><strong>獲得スキル:</strong> SNS運用、マーケティング、データ分析</p>
-    </div>
-    """, completed=is_completed)
-    
-    if st.session_state.demo_step == 2:
+    quest_title, quest_provider = st.session_state.get("quest", DEFAULT_QUEST)
+    w.card_t(QUEST_CARD, not active, title=escape(quest_title), provider=escape(quest_provider))
+
+    if active:
         if not st.session_state.show_certificate:
-            if primary_button("🎨 NFT証明書を発行"):
-                with st.spinner("NFT証明書を生成中..."):
-                    time.sleep(1.2)
-                nft_data = f"QuestNFT-{quest_title}-拓叶-{now_jst_str()}"
-                st.session_state.nft_hash = hashlib.sha256(nft_data.encode("utf-8")).hexdigest()
-                st.session_state.certificate_id = "TXQ-0023"
+            if st.session_state.nft_job is None:
+                render_quest_picker()
+            job = await_job(st.session_state.nft_job, "NFT証明書を生成中...")
+            if job is not None and job.status == COMMITTED:
+                st.session_state.nft_hash = job.result["hash"]
+                st.session_state.certificate_id = job.result["cert_id"]
                 st.session_state.show_certificate = True
                 st.session_state.nft_issued = True
+                st.session_state.nft_job = None
                 st.rerun()
+            elif job is None or job.status == FAILED:
+                if job is not None:
+                    st.error(f"NFT証明書の発行に失敗しました（{job.error}）")
+                if primary_button("🎨 NFT証明書を発行"):
+                    job_id = submit_issuance("certificate", dict(
+                        name=DEMO_USER, course=quest_title, score=None, date=now_jst_str("%Y-%m-%d"),
+                        issued_at=now_jst_str(),
+                    ))
+                    if job_id:
+                        st.session_state.nft_job = job_id
+                        st.rerun()
+            else:
+                primary_button("⏳ NFT証明書を生成中...", disabled=True)
         else:
             primary_button("✅ NFT証明書発行済み", disabled=True)
-    
+
     if st.session_state.show_certificate:
-        card(f"""
-        <div class="certificate">
-            <h3>🏅 デジタル証明書</h3>
-            <p>Quest Completion NFT</p>
-            <p><strong>ID:</strong> #{st.session_state.certificate_id}</p>
-            <p><strong>所有者:</strong> 拓叶</p>
-            <p style="font-size: 0.7rem;"><strong>Hash:</strong> {st.session_state.nft_hash[:12]}...</p>
-            <hr style="opacity: 0.3; margin: 1rem 0;">
-        </div>
-        """, completed=is_completed)
-        if st.session_state.demo_step == 2:
+        w.card_t(
+            CERTIFICATE_CARD, not active,
+            cert_id=escape(st.session_state.certificate_id or ""),
+            hash_short=escape(st.session_state.nft_hash[:12]),
+        )
+        if active:
             st.success("✅ NFT証明書が発行されました！")
-    
-    if st.session_state.demo_step == 2 and st.session_state.nft_issued:
-        st.markdown('<div class="step-nav">', unsafe_allow_html=True)
-        if primary_button("次のステップへ"):
+
+    if active and st.session_state.nft_issued:
+        if step_nav():
             goto_next_step()
-        st.markdown('</div>', unsafe_allow_html=True)
 
 # ステップ 3: 企業での活用
-if st.session_state.demo_step >= 3:
-    hr()
-    is_completed = st.session_state.demo_step > 3
-    if is_completed:
-        st.markdown('<div class="step-completed">✅ ステップ 3/4: 完了</div>', unsafe_allow_html=True)
+def step_3(w: StepWriter, active: bool):
+    w.hr()
+    w.header(active, "ステップ 3/4", "ステップ 3/4: 企業での活用")
+
+    # 証明書IDを索引で引き、Merkle 包含証明で検証（ブロックヘッダ + O(log n) ハッシュ）
+    cert_id = st.session_state.certificate_id or "TXQ-0023"
+    if active:
+        cert_query = st.text_input(
+            "証明書ID または 記録ハッシュ（8桁以上）", value=f"#{cert_id}",
+            help="例: #TXQ-0001 / 画面に表示されたハッシュの先頭部分",
+        )
     else:
-        st.markdown('<div class="step-indicator">ステップ 3/4: 企業での活用</div>', unsafe_allow_html=True)
-    
-    card("""
-    <h3>🏢 採用企業での活用</h3>
-    <div class="benefit-box">
-        <h4>株式会社〇〇 人事部</h4>
-        <p><strong>応募者:</strong> 拓叶</p>
-        <p><strong>証明書ID:</strong> #TXQ-0023</p>
-        <p><strong>検証結果:</strong> <span style="color: green;">✓ 真正性確認済み</span></p>
-        <hr style="margin: 0.5rem 0;">
-        <p><strong>確認された実績:</strong></p>
-        <ul style="font-size: 0.85rem;">
-            <li>Python基礎講座 (95点)</li>
-            <li>地域農産物PR用SNS運用</li>
-            <li>総合スコア: 782点</li>
-        </ul>
-    </div>
-    """, completed=is_completed)
-    
-    card("""
+        cert_query = f"#{cert_id}"
+    v = verify_certificate(get_ledger(), get_cert_index(), cert_query)
+    # 実績は検証できた記録と、その応募者の台帳上の集計から出す
+    applicant, achievement = DEMO_USER, DEFAULT_QUEST[0]
+    if v.ok:
+        verdict = verdict_html(v) + "<br>チェーン: " + chain_html(anchor_status([v.record_hash])[v.record_hash])
+        applicant, achievement = v.record.name, v.record.course
+        if v.record.score is not None:
+            achievement += f" ({v.record.score}点)"
+        if v.record.cert_id:
+            cert_id = v.record.cert_id
+    else:
+        verdict = f'<span style="color: #A50E0E;">✗ 検証できません（{escape(v.reason)}）</span>'
+    c = get_user_counters(applicant)
+
+    w.card_t(HR_CARD, not active, cert_id=escape(cert_id), verdict=verdict, applicant=escape(applicant),
+             achievement=escape(achievement), courses=f"{c['courses']:,}",
+             certificates=f"{c['certificates']:,}", total_score=f"{c['score']:,}")
+
+    w.card("""
     <h3>🔍 証明書の検証プロセス</h3>
     <div class="highlight-box">
         <ol style="font-size: 0.9rem;">
             <li><strong>証明書IDの入力</strong><br>応募者が提出した証明書IDを入力</li>
-            <li><strong>ブロックチェーン照会</strong><br>分散台帳から該当記録を検索</li>
-            <li><strong>真正性の確認</strong><br>改ざん不可能なデータで実績を確認</li>
+            <li><strong>ブロックチェーン照会</strong><br>分散台帳から該当記録とMerkle包含証明を取得</li>
+            <li><strong>真正性の確認</strong><br>証明をブロックの Merkle ルートまで辿り、改ざんがないことを確認</li>
             <li><strong>詳細情報の取得</strong><br>学習履歴、スコア、完了日時を確認</li>
         </ol>
     </div>
-    """, completed=is_completed)
-    
-    if st.session_state.demo_step == 3:
-        st.markdown('<div class="step-nav">', unsafe_allow_html=True)
-        if primary_button("次のステップへ"):
+    """, completed=not active)
+
+    if active:
+        if step_nav():
             goto_next_step()
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# ステップ 4: システムの全体像
-if st.session_state.demo_step >= 4:
-    hr()
-    st.markdown('<div class="step-indicator">ステップ 4/4: システムの全体像</div>', unsafe_allow_html=True)
-    profile_json, ok = get_profile()
-    render_status_float(status_float, st.session_state.api_on, ok if st.session_state.api_on else None)
-
-    total_score = profile_json.get("user", {}).get("current_total_score") if profile_json else None
-    if total_score is None:
-        total_score = 782
-
-    card(f"""
-    <h3>📊 記録された実績</h3>
-    <div style="display:grid; grid-template-columns: repeat(3, 1fr); gap: 16px;">
-        <div><div class="big-number">{total_score}</div><p style="text-align:center; font-size:0.8rem;">総合スコア</p></div>
-        <div><div class="big-number">15</div><p style="text-align:center; font-size:0.8rem;">完了クエスト</p></div>
-        <div><div class="big-number">8</div><p style="text-align:center; font-size:0.8rem;">NFT証明書</p></div>
-    </div>
-    """)
 
-    rec_html = []
-    sample_records = [
-        {"title": "Python基礎講座", "score": 95},
-        {"title": "データ分析入門", "score": 88},
-        {"title": "機械学習基礎", "score": 92},
-    ]
-    for r in sample_records:
-        hv = hashlib.sha256(f"{r['title']}-{r['score']}".encode("utf-8")).hexdigest()
-        rec_html.append(f"""
-<div class="highlight-box" style="margin-bottom: 0.5rem; padding: 0.8rem;">
-<p style="margin: 0;"><strong>{escape(r['title'])}</strong> ({r['score']}点)</p>
-<p style="font-size: 0.7rem; color: #666; margin: 0.3rem 0 0 0;">Hash: {hv[:20]}...</p>
-</div>""")
-    card("""
-    <h3>🔍 検証可能な学習履歴</h3>
-    """ + "\n".join(rec_html))
-
-    card("""
+# ステップ 4: システムの全体像（最終ステップなので常に操作中）
+def step_4(w: StepWriter, active: bool):
+    w.hr()
+    w.html('<div class="step-indicator">ステップ 4/4: システムの全体像</div>')
+
+    c = st.session_state.get("counters") or get_user_counters(DEMO_USER)
+    w.card_t(STATS_CARD, total_score=f"{c['score']:,}", courses=f"{c['courses']:,}",
+             certificates=f"{c['certificates']:,}")
+
+    w.card(sample_history_md())
+
+    w.card("""
 <h3>🔧 ブロックチェーン実動モック構成案</h3>
     <div class="highlight-box">
         <h4 style="font-size: 1rem;">ブロックチェーン関連技術</h4>
@@ -626,10 +675,39 @@ if st.session_state.demo_step >= 4:
     </div>
     """)
 
-    st.markdown('<div class="step-nav">', unsafe_allow_html=True)
-    if primary_button("🔄 最初から見る"):
+    if active and step_nav("🔄 最初から見る"):
         reset_demo()
-    st.markdown('</div>', unsafe_allow_html=True)
+
+STEPS = (step_0, step_1, step_2, step_3, step_4)
+
+def render_active_step():
+    step = min(st.session_state.demo_step, len(STEPS) - 1)
+    with metrics.timer("step_seconds", step=step, mode="live"):
+        STEPS[step](StepWriter(live=True), active=True)
+    persist_session(PERSIST_KEYS)  # 全体・fragment どちらの再実行でも最後にここを通る
+
+if _fragment is not None:
+    render_active_step = _fragment(render_active_step)
+
+current_step = min(st.session_state.demo_step, len(STEPS) - 1)
+
+# API を使うステップのデータは fragment の外で取得する（ステータス表示を更新するため）
+if current_step == 2 or (current_step > 2 and "quest" not in st.session_state):
+    load_quest()
+if current_step == 4:
+    load_counters()
+render_status_float(status_float, st.session_state.api_on)
+
+for n in range(current_step):
+    if n not in st.session_state.frozen:
+        with metrics.timer("step_seconds", step=n, mode="build"):
+            w = StepWriter(live=False)
+            STEPS[n](w, active=False)
+            st.session_state.frozen[n] = w.frozen()
+    with metrics.timer("step_seconds", step=n, mode="frozen"):
+        st.markdown(st.session_state.frozen[n], unsafe_allow_html=True)
+
+render_active_step()
 
 # ==============================
 # フッター
@@ -640,3 +718,6 @@ st.markdown("""
     <p>Team X - ブロックチェーン　モック</p>
 </div>
 """, unsafe_allow_html=True)
+
+if metrics.ENABLED:
+    metrics.observe("rerun_seconds", time.perf_counter() - _rerun_t0, step=current_step)
@@ -0,0 +1,69 @@
+import re
+from functools import lru_cache
+from string import Template as _StringTemplate
+from textwrap import dedent
+
+# ==============================
+# HTMLフラグメントのテンプレート層（プロセス内で前処理・LRUキャッシュ）
+# ==============================
+FRAGMENT_CACHE_SIZE = 512
+
+_LEADING_WS = re.compile(r"^[ \t]+", re.MULTILINE)
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCT = re.compile(r"\s*([{};:,>])\s*")
+
+
+def clean_html(s: str) -> str:
+    # インデントを除去（Markdown のコードブロック扱いを防ぐ）
+    s = dedent(s)
+    s = _LEADING_WS.sub("", s)
+    return s.strip()
+
+
+def card_class(completed: bool) -> str:
+    return "demo-card completed-section" if completed else "demo-card"
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def render_card(md: str, completed: bool = False) -> str:
+    """静的カード。同じ本文なら2回目以降は前処理済みのHTMLを返す。"""
+    return f'<div class="{card_class(completed)}">{clean_html(md)}</div>'
+
+
+class Template:
+    """``$name`` 形式のプレースホルダーを持つカード。
+
+    本文の整形（dedent / 行頭空白除去）は生成時に1回だけ行い、描画結果は
+    (テンプレート, completed, パラメータ) をキーに LRU でキャッシュする。
+    値のエスケープは呼び出し側で行う（HTMLをそのまま差し込む箇所があるため）。
+    """
+
+    _registry: dict = {}
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self._tpl = _StringTemplate(clean_html(source))
+        Template._registry[name] = self
+
+    def render(self, completed: bool = False, **params) -> str:
+        return _render_template(self.name, completed, tuple(sorted(params.items())))
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _render_template(name: str, completed: bool, items: tuple) -> str:
+    body = Template._registry[name]._tpl.substitute(dict(items))
+    return f'<div class="{card_class(completed)}">{body}</div>'
+
+
+@lru_cache(maxsize=8)
+def style_block(css: str) -> str:
+    """<style> ブロックをコメント・空白を削って1回だけ生成する。"""
+    css = _CSS_COMMENT.sub("", css)
+    css = _CSS_SPACE.sub(" ", css)
+    css = _CSS_PUNCT.sub(r"\1", css)
+    return f"<style>{css.strip()}</style>"
+
+
+def cache_info() -> dict:
+    return dict(cards=render_card.cache_info()._asdict(), templates=_render_template.cache_info()._asdict())
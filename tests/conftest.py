@@ -0,0 +1,22 @@
+import os
+import sys
+
+# リポジトリ直下のモジュール（ledger, anchoring など）を import できるようにする（bench/ と同じ）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from ledger import Record  # noqa: E402
+
+
+def make_records(n: int, start: int = 0, kind: str = "course", course: str = "Python基礎講座") -> list:
+    return [
+        Record(name=f"user{(start + i) % 7}", course=course, score=(start + i) % 100, date="2025-08-30",
+               kind=kind, cert_id=f"TXQ-{start + i + 1:04d}" if kind == "certificate" else None)
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def records():
+    return make_records
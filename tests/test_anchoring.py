@@ -0,0 +1,82 @@
+import hashlib
+import os
+import time
+
+from anchoring import AnchorScheduler, LocalChain
+from ledger import CertificateIndex, verify_proof
+
+
+def hashes(n: int, start: int = 0) -> list:
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(start, start + n)]
+
+
+def wait_for(cond, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_flush_by_size():
+    chain = LocalChain(latency=0)
+    scheduler = AnchorScheduler(chain, max_batch=4, max_delay=60)
+    try:
+        hs = hashes(8)
+        scheduler.submit(hs)
+        wait_for(lambda: scheduler.stats()["writes"] == 2)
+        s = scheduler.stats()
+        assert (s["by_size"], s["by_time"], s["records"], chain.writes) == (2, 0, 8, 2)
+        a = scheduler.lookup(hs[5])
+        assert (a["size"], a["leaf"]) == (4, 1)
+        assert verify_proof(hs[5], a["proof"], a["root"])
+    finally:
+        scheduler.close()
+
+
+def test_flush_by_time():
+    scheduler = AnchorScheduler(LocalChain(latency=0), max_batch=100, max_delay=0.05)
+    try:
+        t0 = time.monotonic()
+        scheduler.submit(hashes(3))
+        wait_for(lambda: scheduler.stats()["writes"] == 1)
+        assert time.monotonic() - t0 >= 0.05
+        assert scheduler.stats()["by_time"] == 1
+    finally:
+        scheduler.close()
+
+
+def test_close_flushes_the_buffer():
+    scheduler = AnchorScheduler(LocalChain(latency=0), max_batch=100, max_delay=60)
+    hs = hashes(3)
+    scheduler.submit(hs + hs[:1])  # 同じハッシュは1つの葉
+    scheduler.close()
+    assert scheduler.stats()["records"] == 3
+    assert scheduler.lookup(hs[0])["size"] == 3
+
+
+def test_store_lookup_after_restart(tmp_path):
+    index = CertificateIndex(os.path.join(str(tmp_path), "index.sqlite"))
+    try:
+        hs = hashes(10)
+        scheduler = AnchorScheduler(LocalChain(latency=0), max_batch=4, max_delay=0.01, store=index)
+        scheduler.submit(hs)
+        scheduler.close()
+        before = {h: scheduler.lookup(h) for h in hs}
+
+        restarted = AnchorScheduler(LocalChain(latency=0), max_batch=4, max_delay=0.01, store=index)
+        try:
+            for h in hs:
+                a = restarted.lookup(h)
+                assert verify_proof(h, a["proof"], a["root"])
+                assert {k: a[k] for k in ("seq", "root", "tx_hash", "block", "leaf")} == \
+                    {k: before[h][k] for k in ("seq", "root", "tx_hash", "block", "leaf")}
+            assert restarted.lookup(hashes(1, start=99)[0]) is None
+            assert index.unanchored(hs + hashes(1, start=99)) == set(hashes(1, start=99))
+            # 採番は永続化した続きから
+            restarted.submit(hashes(2, start=50))
+            restarted.close()
+            assert restarted.lookup(hashes(1, start=50)[0])["seq"] == max(a["seq"] for a in before.values()) + 1
+        finally:
+            restarted.close()
+    finally:
+        index.close()
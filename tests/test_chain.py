@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from chain_client import ChainClient, ChainError
+from chain_node import LocalNode
+
+
+def roots(n: int, start: int = 1) -> list:
+    return [f"{i:064x}" for i in range(start, start + n)]
+
+
+@pytest.fixture
+def node():
+    with LocalNode(block_time=0) as n:
+        yield n
+
+
+def test_anchor_and_batched_reads(node):
+    client = ChainClient(node.url, confirmations=0)
+    rs = roots(5)
+    receipts = [client.anchor(r, 3) for r in rs]
+    assert [r["block"] for r in receipts] == [1, 2, 3, 4, 5]
+
+    before = client.stats()["http_requests"]
+    at = client.anchored_at(rs + roots(1, start=99))
+    assert at == {**{r: i for i, r in enumerate(rs, 1)}, roots(1, start=99)[0]: 0}
+    assert client.stats()["http_requests"] - before == 1  # 全件で1往復
+
+    logs = client.anchor_logs(0, "latest")
+    assert [(root, count, block) for root, count, block, _ in logs] == [(r, 3, i) for i, r in enumerate(rs, 1)]
+    assert [tx for *_, tx in logs] == [r["tx_hash"] for r in receipts]
+
+
+def test_finalized_reads_are_cached(node):
+    client = ChainClient(node.url, confirmations=0)
+    rs = roots(3)
+    for r in rs:
+        client.anchor(r, 1)
+    head = client.head()
+    client.anchored_at(rs, block=head)
+    before = client.stats()["http_requests"]
+    assert client.anchored_at(rs, block=head) == {r: i for i, r in enumerate(rs, 1)}
+    assert client.stats()["http_requests"] == before
+
+
+def test_rpc_errors_raise(node):
+    client = ChainClient(node.url, confirmations=0)
+    with pytest.raises(ChainError):
+        client.batch([("eth_noSuchMethod", [])])
+
+
+def test_node_journal_survives_restart(tmp_path):
+    path = os.path.join(str(tmp_path), "chain-node.jsonl")
+    rs = roots(3)
+    with LocalNode(block_time=0, path=path) as n:
+        client = ChainClient(n.url, confirmations=0)
+        for r in rs:
+            client.anchor(r, 1)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"root": "ab')  # 書き込み途中で止まった末尾
+
+    with LocalNode(block_time=0, path=path) as n:
+        client = ChainClient(n.url, confirmations=0)
+        assert client.anchored_at(rs) == {r: i for i, r in enumerate(rs, 1)}
+        assert client.anchor(roots(1, start=9)[0], 1)["block"] == 4
+    with open(path, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 4
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from ledger import CertificateIndex, Ledger
+from ledger.index import prefix_range
+
+
+@pytest.fixture
+def indexed(tmp_path, records):
+    ledger = Ledger(str(tmp_path), snapshot_every=0)
+    index = CertificateIndex(os.path.join(str(tmp_path), "index.sqlite"))
+    blocks = [
+        ledger.append(records(4, start=0)),
+        ledger.append(records(3, start=10, kind="certificate")),
+    ]
+    index.sync(ledger)
+    yield ledger, index, blocks
+    index.close()
+    ledger.close()
+
+
+def test_prefix_range():
+    assert prefix_range("ab") == (b"\xab", b"\xac")
+    assert prefix_range("abc") == (b"\xab\xc0", b"\xab\xd0")
+    assert prefix_range("ff") == (b"\xff", None)
+    assert prefix_range("12ff") == (b"\x12\xff", b"\x13")
+
+
+def test_cert_id_lookup(indexed):
+    _, index, blocks = indexed
+    cert = blocks[1]
+    assert index.indexed_height == 2
+    assert index.lookup_cert("TXQ-0012") == (cert.number, 1)
+    assert index.lookup_cert("TXQ-9999") is None
+    assert index.lookup_certs(["TXQ-0011", "TXQ-0013", "TXQ-9999"]) == {
+        "TXQ-0011": (cert.number, 0), "TXQ-0013": (cert.number, 2),
+    }
+
+
+def test_hash_lookup_exact_and_prefix(indexed):
+    _, index, blocks = indexed
+    for block in blocks:
+        for leaf, h in enumerate(block.record_hashes):
+            assert index.lookup_hash(h) == [(h, block.number, leaf)]
+            for n in (8, 9, 13):  # 偶数桁・奇数桁のプレフィックス
+                assert (h, block.number, leaf) in index.lookup_hash(h[:n])
+            assert index.lookup_hashes([h]) == {h: (block.number, leaf)}
+    assert index.lookup_hash("xyz") == []
+    assert index.lookup_hash("") == []
+
@@ -0,0 +1,56 @@
+import os
+
+from ledger import CertificateIndex, Ledger
+from ledger.ingest import ingest
+
+HEADER = "name,course,score,date,kind,cert_id\n"
+
+
+def write_csv(path, rows) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER + "".join(",".join(map(str, r)) + "\n" for r in rows))
+    return str(path)
+
+
+def test_ingest_skips_duplicate_cert_ids_and_advances_allocation(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger"), snapshot_every=0)
+    index = CertificateIndex(os.path.join(ledger.path, "index.sqlite"))
+    try:
+        first = write_csv(tmp_path / "a.csv", [
+            ("a", "c", 10, "2025-08-30", "certificate", "TXQ-0005"),
+            ("b", "c", 20, "2025-08-30", "certificate", "TXQ-0005"),  # 入力内の重複
+            ("c", "c", 30, "2025-08-30", "course", ""),
+            ("bad", "c", "not-a-number", "2025-08-30", "course", ""),  # 不正行
+        ])
+        result = ingest(first, ledger, index, batch=2, workers=1)
+        assert (result["records"], result["duplicates"], result["skipped"]) == (2, 1, 1)
+
+        second = write_csv(tmp_path / "b.csv", [
+            ("z", "c", 1, "2025-08-30", "certificate", "TXQ-0005"),  # 索引に登録済み
+            ("y", "c", 2, "2025-08-30", "certificate", "TXQ-0100"),
+        ])
+        result = ingest(second, ledger, index, batch=100, workers=1)
+        assert (result["records"], result["duplicates"]) == (1, 1)
+
+        block, leaf = index.lookup_cert("TXQ-0005")
+        assert ledger.get_block(block).records[leaf].name == "a"
+        assert index.indexed_height == ledger.height
+        # 取り込んだ最大の連番より後から採番する
+        assert index.allocate_cert_id() == "TXQ-0101"
+    finally:
+        index.close()
+        ledger.close()
+
+
+def test_reindexing_keeps_the_first_cert(tmp_path, records):
+    ledger = Ledger(str(tmp_path), snapshot_every=0)
+    index = CertificateIndex(os.path.join(str(tmp_path), "index.sqlite"))
+    try:
+        first = ledger.append(records(3, kind="certificate"))
+        index.add_block(first)
+        index.add_block(first)  # 同じブロックの再登録は冪等
+        index.add_block(ledger.append(records(1, start=1, kind="certificate")))  # TXQ-0002 を再利用
+        assert index.lookup_cert("TXQ-0002") == (first.number, 1)
+    finally:
+        index.close()
+        ledger.close()
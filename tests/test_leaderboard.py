@@ -0,0 +1,42 @@
+import random
+
+from ledger.leaderboard import Leaderboard
+
+
+def expected_top(scores: dict, k: int) -> list:
+    # 全件ソート: スコアの高い順、同点は名前順
+    return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+
+
+def names_scores(board: Leaderboard, n: int) -> list:
+    return [(name, score) for _, name, score in board.top(n)]
+
+
+def test_tie_at_k_boundary_keeps_smaller_name():
+    # K=2 の境界で3人が同点。差分更新でも作り直しでも名前の小さい方が残る
+    board = Leaderboard(k=2)
+    board.update("alice", 10)
+    board.update("carol", 5)
+    board.update("bob", 5)
+    board.update("aaron", 5)
+    scores = dict(alice=10, carol=5, bob=5, aaron=5)
+    assert names_scores(board, 2) == [("alice", 10), ("aaron", 5)]
+    assert names_scores(Leaderboard.from_scores(scores.items(), k=2), 2) == [("alice", 10), ("aaron", 5)]
+
+    # 境界の人のスコアが下がると作り直しになる。同点の並びは変わらない
+    board.update("alice", 5)
+    scores["alice"] = 5
+    assert names_scores(board, 2) == expected_top(scores, 2) == [("aaron", 5), ("alice", 5)]
+
+
+def test_incremental_matches_rebuild_with_many_ties():
+    rng = random.Random(7)
+    for k in (1, 3, 5):
+        board, scores = Leaderboard(k=k), {}
+        for _ in range(500):
+            name = f"u{rng.randrange(20)}"
+            scores[name] = scores.get(name, 0) + rng.choice((0, 1, 1, 2)) if rng.random() < 0.9 \
+                else rng.randrange(4)
+            board.update(name, scores[name])
+            assert names_scores(board, k) == expected_top(scores, k)
+        assert names_scores(Leaderboard.from_scores(scores.items(), k=k), k) == expected_top(scores, k)
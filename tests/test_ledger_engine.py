@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from ledger import Ledger, LedgerLocked
+from ledger.engine import INDEX_ENTRY
+
+
+def segments(path: str) -> list:
+    return sorted(n for n in os.listdir(path) if n.endswith(".log"))
+
+
+def test_append_and_reopen(tmp_path, records):
+    path = str(tmp_path)
+    ledger = Ledger(path, snapshot_every=0)
+    blocks = [ledger.append(records(5, start=i * 5)) for i in range(3)]
+    tip = ledger.tip_hash
+    ledger.close()
+
+    ledger = Ledger(path, snapshot_every=0)
+    try:
+        assert ledger.height == 3
+        assert ledger.tip_hash == tip == blocks[-1].hash
+        assert [ledger.get_block(b.number).records for b in blocks] == [b.records for b in blocks]
+        assert ledger.get_block(2).prev_hash == blocks[0].hash
+        assert ledger.verify_chain()
+        # 再起動後の追記も前のブロックに連結される
+        assert ledger.append(records(1)).prev_hash == tip
+    finally:
+        ledger.close()
+
+
+def test_torn_tail_is_truncated(tmp_path, records):
+    path = str(tmp_path)
+    ledger = Ledger(path, snapshot_every=0)
+    for i in range(2):
+        ledger.append(records(3, start=i * 3))
+    ledger.close()
+
+    # 書き込み途中で止まった: セグメント末尾に半端なフレーム、索引末尾に半端なエントリ
+    seg = os.path.join(path, segments(path)[-1])
+    seg_size = os.path.getsize(seg)
+    with open(seg, "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial")
+    with open(os.path.join(path, "blocks.idx"), "ab") as f:
+        f.write(b"\x00" * (INDEX_ENTRY.size // 2))
+
+    ledger = Ledger(path, snapshot_every=0)
+    try:
+        assert ledger.height == 2
+        assert os.path.getsize(seg) == seg_size
+        assert os.path.getsize(os.path.join(path, "blocks.idx")) == 2 * INDEX_ENTRY.size
+        ledger.append(records(3, start=6))
+    finally:
+        ledger.close()
+
+    ledger = Ledger(path, snapshot_every=0)
+    try:
+        assert ledger.height == 3
+        assert ledger.verify_chain()
+    finally:
+        ledger.close()
+
+
+def test_unindexed_newer_segment_is_dropped(tmp_path, records):
+    # セグメント切り替え直後に止まると、索引に載っていない新しいセグメントが残る
+    path = str(tmp_path)
+    ledger = Ledger(path, segment_max_bytes=1500, snapshot_every=0)
+    for i in range(3):
+        ledger.append(records(4, start=i * 4))
+    ledger.close()
+    assert len(segments(path)) > 1
+    last = int(segments(path)[-1][4:10])
+    with open(os.path.join(path, f"seg-{last + 1:06d}.log"), "wb") as f:
+        f.write(b"garbage" * 64)
+
+    ledger = Ledger(path, segment_max_bytes=1500, snapshot_every=0)
+    try:
+        assert f"seg-{last + 1:06d}.log" not in segments(path)
+        for i in range(3, 6):
+            ledger.append(records(4, start=i * 4))
+    finally:
+        ledger.close()
+
+    ledger = Ledger(path, segment_max_bytes=1500, snapshot_every=0)
+    try:
+        assert ledger.height == 6
+        assert ledger.verify_chain()
+    finally:
+        ledger.close()
+
+
+def test_second_writer_is_rejected(tmp_path):
+    path = str(tmp_path)
+    ledger = Ledger(path, snapshot_every=0)
+    try:
+        with pytest.raises(LedgerLocked):
+            Ledger(path, snapshot_every=0)
+    finally:
+        ledger.close()
+    Ledger(path, snapshot_every=0).close()  # 閉じればロックは解放される
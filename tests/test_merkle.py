@@ -0,0 +1,50 @@
+import hashlib
+
+import pytest
+
+from ledger import Ledger, MerkleTree, verify_proof
+from ledger.merkle import LEFT, merkle_root
+
+
+def hashes(n: int) -> list:
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 7, 8, 9, 16, 17, 33])
+def test_every_leaf_proves_against_the_root(n):
+    hs = hashes(n)
+    tree = MerkleTree(hs)
+    for i, h in enumerate(hs):
+        proof = tree.proof(i)
+        assert len(proof) <= max(1, (n - 1).bit_length())
+        assert verify_proof(h, proof, tree.root)
+
+
+def test_proof_rejects_wrong_leaf_and_root():
+    hs = hashes(9)
+    tree = MerkleTree(hs)
+    proof = tree.proof(4)
+    assert not verify_proof(hs[5], proof, tree.root)
+    assert not verify_proof(hs[4], proof, merkle_root(hs[:8]))
+    assert not verify_proof(hs[4], [(LEFT, "zz")], tree.root)  # 壊れた証明は False（例外にしない）
+    with pytest.raises(IndexError):
+        tree.proof(9)
+
+
+def test_incremental_extend_matches_batch_build():
+    hs = hashes(21)
+    tree = MerkleTree()
+    for start in range(0, len(hs), 4):
+        tree.extend(hs[start:start + 4])
+        assert tree.root == merkle_root(hs[:start + 4])
+    assert len(tree) == len(hs)
+
+
+def test_ledger_proof_round_trip(tmp_path, records):
+    ledger = Ledger(str(tmp_path), snapshot_every=0)
+    try:
+        block = ledger.append(records(11))
+        for i, h in enumerate(block.record_hashes):
+            assert verify_proof(h, ledger.prove(block.number, i), block.records_root)
+    finally:
+        ledger.close()
@@ -0,0 +1,71 @@
+import threading
+
+from quest_catalog import QuestCatalog
+
+
+def fake_api(total: int, fail_at=None):
+    calls = []
+
+    def fetch(offset, limit):
+        calls.append(offset)
+        if fail_at is not None and offset >= fail_at:
+            return None, False
+        items = [{"id": i, "title": f"クエスト {i:04d}", "provider_name": f"Provider {'ABC'[i % 3]}"}
+                 for i in range(offset, min(offset + limit, total))]
+        return {"quests": items, "total_count": total}, True
+
+    return fetch, calls
+
+
+def test_ensure_loads_only_needed_pages():
+    fetch, calls = fake_api(250)
+    catalog = QuestCatalog(fetch, page_size=50)
+    assert catalog.ensure(20) == 50
+    assert catalog.ensure(50) == 50
+    assert calls == [0]
+    assert catalog.total == 250 and not catalog.complete
+
+
+def test_search_returns_real_count_beyond_limit():
+    fetch, _ = fake_api(250)
+    catalog = QuestCatalog(fetch, page_size=50)
+    catalog.load_all()
+    hits, count = catalog.search("provider b", limit=10)
+    assert len(hits) == 10
+    assert count == len([i for i in range(250) if i % 3 == 1])
+    assert catalog.search("ｐｒｏｖｉｄｅｒ Ｃ クエスト 0005", limit=10) == ([5], 1)
+    assert catalog.search("存在しない") == ([], 0)
+
+
+def test_load_async_and_find_by_id():
+    release = threading.Event()
+    fetch, _ = fake_api(120)
+
+    def slow_fetch(offset, limit):
+        if offset:
+            release.wait(5)
+        return fetch(offset, limit)
+
+    catalog = QuestCatalog(slow_fetch, page_size=40)
+    catalog.ensure(1)
+    assert catalog.load_async()
+    assert catalog.loading
+    # 読み込み中でも、読み込み済みの分は待たずに検索・表示できる
+    assert catalog.ensure(40) == 40
+    assert catalog.search("クエスト 0030") == ([30], 1)
+    assert catalog.find("100") is None
+    release.set()
+    catalog._loader.join(5)
+    assert catalog.complete and not catalog.loading
+    assert catalog.get(catalog.find("100")) == ("クエスト 0100", "Provider B")
+    assert not catalog.load_async()
+
+
+def test_failed_page_is_retried_from_loaded_position():
+    fetch, calls = fake_api(100, fail_at=50)
+    catalog = QuestCatalog(fetch, page_size=25)
+    assert catalog.load_all() == 50
+    assert catalog.error and not catalog.complete
+    catalog._fetch = fake_api(100)[0]
+    assert catalog.load_all() == 100
+    assert catalog.error is None and catalog.complete
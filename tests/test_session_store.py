@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+from session_store import (
+    COMPRESS_MIN_BYTES, MemorySessionStore, SQLiteSessionStore, decode_value, encode_value, open_session_store,
+)
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    s = open_session_store(request.param, os.path.join(str(tmp_path), "sessions.sqlite"))
+    yield s
+    s.close()
+
+
+def test_encode_round_trip_and_compression():
+    small = {"step": 2, "name": "拓叶"}
+    large = ["x" * 64] * (COMPRESS_MIN_BYTES // 32)
+    assert encode_value(small)[:1] == b"j"
+    assert encode_value(large)[:1] == b"z"
+    assert decode_value(encode_value(small)) == small
+    assert decode_value(encode_value(large)) == large
+
+
+def test_save_writes_only_changes_and_deletes(store):
+    assert store.load("t1") is None
+    store.save("t1", {"step": 1, "records": [1, 2]})
+    store.save("t1", {"step": 2}, deleted=["records"])
+    store.save("t2", {"step": 9})
+    assert store.load("t1") == {"step": 2}
+    assert store.load("t2") == {"step": 9}
+
+
+def test_sweep_expires_idle_sessions(store):
+    store.save("old", {"step": 1})
+    time.sleep(0.05)
+    store.save("fresh", {"step": 2})
+    assert store.sweep(0.03) == 1
+    assert store.load("old") is None
+    assert store.load("fresh") == {"step": 2}
+
+
+def test_sqlite_store_is_shared_across_instances(tmp_path):
+    path = os.path.join(str(tmp_path), "sessions.sqlite")
+    a, b = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    try:
+        a.save("t", {"nft_hash": "ab" * 32})
+        assert b.load("t") == {"nft_hash": "ab" * 32}
+    finally:
+        a.close()
+        b.close()
+
+
+def test_open_session_store_kinds(tmp_path):
+    path = os.path.join(str(tmp_path), "s.sqlite")
+    assert open_session_store("off", path) is None
+    assert isinstance(open_session_store("memory", path), MemorySessionStore)
+    assert isinstance(open_session_store("session_store:MemorySessionStore", path), MemorySessionStore)
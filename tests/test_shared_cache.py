@@ -0,0 +1,53 @@
+import os
+import threading
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from shared_cache import SharedCircuitBreaker, SharedStore
+
+
+def breaker(tmp_path, **kw):
+    store = SharedStore(os.path.join(str(tmp_path), "shared.sqlite"))
+    return SharedCircuitBreaker(store, name="api", **kw)
+
+
+def in_thread(fn):
+    out = []
+    t = threading.Thread(target=lambda: out.append(fn()))
+    t.start()
+    t.join()
+    return out[0]
+
+
+def test_opens_after_failures_and_closes_on_trial_success(tmp_path):
+    b = breaker(tmp_path, failure_threshold=2, reset_timeout=0)
+    b.record_failure()
+    assert b.state == CLOSED
+    b.record_failure()
+    assert b.state == OPEN
+    assert b.allow() and b.state == HALF_OPEN
+    assert not in_thread(b.allow)  # 試行はホスト全体で1件
+    b.record_success()
+    assert b.state == CLOSED and b.health()["last_ok"] is True
+
+
+def test_trial_lease_is_released_only_by_its_thread(tmp_path):
+    b = breaker(tmp_path, failure_threshold=1, reset_timeout=0)
+    b.record_failure()
+    assert b.allow()  # このスレッドが試行リースを持つ
+    in_thread(b.record_failure)  # 別スレッドの応答（CLOSED 時に出した要求）
+    assert not in_thread(b.allow)
+    b.record_failure()
+    assert in_thread(b.allow)
+
+
+def test_success_while_closed_does_not_write(tmp_path):
+    b = breaker(tmp_path)
+    b.record_success()
+    since = b.health()["since"]
+    writes = []
+    b.store._conn().set_trace_callback(writes.append)
+    for _ in range(5):
+        b.record_success()
+    b.store._conn().set_trace_callback(None)
+    assert not [s for s in writes if not s.lstrip().upper().startswith("SELECT")]
+    assert b.health()["since"] == since
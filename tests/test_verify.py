@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from ledger import CertificateIndex, Ledger, verify_certificate, verify_many
+
+
+@pytest.fixture
+def indexed(tmp_path, records):
+    ledger = Ledger(str(tmp_path), snapshot_every=0)
+    index = CertificateIndex(os.path.join(str(tmp_path), "index.sqlite"))
+    ledger.append(records(5))
+    ledger.append(records(3, start=20, kind="certificate"))
+    index.sync(ledger)
+    yield ledger, index
+    index.close()
+    ledger.close()
+
+
+def test_verify_certificate_by_id_and_hash_prefix(indexed):
+    ledger, index = indexed
+    v = verify_certificate(ledger, index, "#TXQ-0022")
+    assert v.ok and v.record.cert_id == "TXQ-0022" and (v.block_number, v.leaf_index) == (2, 1)
+    h = ledger.get_block(1).record_hashes[3]
+    v = verify_certificate(ledger, index, h[:10] + "...")
+    assert v.ok and v.record_hash == h
+    assert not verify_certificate(ledger, index, "TXQ-9999").ok
+    assert not verify_certificate(ledger, index, "abc").ok  # 8桁未満のプレフィックス
+
+
+def test_verify_many_dedups_after_normalizing(indexed):
+    ledger, index = indexed
+    h = ledger.get_block(1).record_hashes[0]
+    queries = ["#TXQ-0021", "TXQ-0021", " TXQ-0023 ", h, h[:12], "TXQ-9999", ""]
+    results = dict(verify_many(ledger, index, queries, workers=2))
+    assert set(results) == {"TXQ-0021", "TXQ-0023", h, h[:12], "TXQ-9999"}
+    assert all(results[q].ok for q in ("TXQ-0021", "TXQ-0023", h, h[:12]))
+    assert results[h[:12]].record_hash == h
+    assert not results["TXQ-9999"].ok
+
+
+def test_index_entry_past_the_block_fails_cleanly(indexed):
+    ledger, index = indexed
+    with index._conn() as conn:
+        conn.execute("INSERT INTO certs VALUES ('TXQ-0777', 2, 99), ('TXQ-0778', 42, 0)")
+    results = dict(verify_many(ledger, index, ["TXQ-0777", "TXQ-0778"]))
+    assert not results["TXQ-0777"].ok and not results["TXQ-0778"].ok
+    assert not verify_certificate(ledger, index, "TXQ-0777").ok
@@ -0,0 +1,16 @@
+from utils.data import (
+    api_enabled, fetch_step_data, get_overview_counters, get_profile, get_quest_catalog,
+    get_quests_available,
+    render_status_float,
+)
+from utils.session import HISTORY_MAX, persist_session, restore_session
+from utils.ui import (
+    APP_CSS, JST, card, card_t, css, go, header, hr, now_jst_str, primary_button,
+    sample_history_md,
+)
+
+__all__ = [
+    "APP_CSS", "HISTORY_MAX", "JST", "api_enabled", "card", "card_t", "css", "fetch_step_data",
+    "get_overview_counters", "get_profile", "get_quest_catalog", "get_quests_available", "go", "header", "hr", "now_jst_str",
+    "persist_session", "primary_button", "render_status_float", "restore_session", "sample_history_md",
+]
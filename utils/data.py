@@ -0,0 +1,100 @@
+import streamlit as st
+
+from api_client import api_health, cached_hit_api, get_setting, hit_api
+from prefetch import (
+    ENDPOINT_FIELDS, PENDING, PREFETCH_ENABLED, PROFILE_PATH, QUESTS_PATH, take_prefetched,
+)
+from quest_catalog import QuestCatalog
+from services import DEMO_USER, get_user_counters
+
+# ==============================
+# API データの取得とステータス表示（pages/ 単体で開いた場合もセッション状態が無くて動く）
+# ==============================
+CATALOG_PAGE_SIZE = get_setting("QUEST_CATALOG_PAGE_SIZE", 100)
+CATALOG_MAX_ITEMS = get_setting("QUEST_CATALOG_MAX_ITEMS", 100_000)
+# カタログを作り直す間隔（秒）。それまではプロセス内で読み込み済みの分を使い回す
+CATALOG_TTL = get_setting("QUEST_CATALOG_TTL", 600.0)
+CATALOG_FIELDS = {
+    "quests": {"id": True, "title": True, "provider_name": True, "provider": True},
+    "total_count": True,
+}
+
+
+def api_enabled() -> bool:
+    return st.session_state.get("api_on", True)
+
+
+def render_status_float(container, mode_on: bool):
+    # API 状態はプロセス共有のサーキットブレーカーから読む（セッションごとに疎通確認しない）
+    health = api_health()
+    last_ok = health["last_ok"]
+    if not mode_on:
+        text = "API: OFF（手動）"; bg, fg = "#F1F3F4", "#5F6368"
+    else:
+        if health["state"] == "open":
+            text = f"API: 🔴 OFFLINE（フォールバック・{int(health['retry_in'])}秒後に再試行）"; bg, fg = "#FCE8E6", "#A50E0E"
+        elif health["state"] == "half_open":
+            text = "API: ⏳ 再接続を確認中"; bg, fg = "#FFF4CE", "#5C2E00"
+        elif last_ok is True:
+            text = "API: 🟢 ONLINE"; bg, fg = "#E6F4EA", "#137333"
+        elif last_ok is False:
+            text = "API: 🔴 OFFLINE（フォールバック）"; bg, fg = "#FCE8E6", "#A50E0E"
+        else:
+            text = "API: ⏳ 未チェック"; bg, fg = "#FFF4CE", "#5C2E00"
+    container.markdown(
+        f"<div class='status-float'><span style='padding:4px 10px; border-radius:12px; background:{bg}; color:{fg}; font-size:0.85rem;'>{text}</span></div>",
+        unsafe_allow_html=True
+    )
+
+
+def fetch_step_data(path: str):
+    # 先読み済みならその結果、未完了ならプレースホルダー（ok=None）、無ければ同期取得
+    store = st.session_state.get("prefetch")
+    res = take_prefetched(store, path) if PREFETCH_ENABLED and store is not None else None
+    if res is PENDING:
+        return None, None
+    if res is None:
+        res = cached_hit_api(path, fields=ENDPOINT_FIELDS.get(path))
+    return res
+
+
+def get_quests_available():
+    if not api_enabled():
+        return {"status": "available", "quests": [], "total_count": 0}, None
+    data, ok = fetch_step_data(QUESTS_PATH)
+    if not ok:
+        data = {"status": "available", "quests": [], "total_count": 0}
+    return data, ok
+
+
+def get_profile():
+    if not api_enabled():
+        return {}, None
+    data, ok = fetch_step_data(PROFILE_PATH)
+    if not ok:
+        data = {}
+    return data, ok
+
+
+
+def get_overview_counters(name: str = DEMO_USER) -> dict:
+    # 件数は台帳の集計から。総合スコアはAPIのプロフィールにあればそれ（外部の活動も含む）、無ければ台帳の合計
+    counters = get_user_counters(name)
+    profile_json, ok = get_profile()
+    api_score = profile_json.get("user", {}).get("current_total_score") if profile_json else None
+    try:
+        counters["score"] = int(api_score) if api_score is not None else counters["score"]
+    except (TypeError, ValueError):
+        pass
+    return counters
+
+def _fetch_quest_page(offset: int, limit: int):
+    # ページはカタログ側が保持するので、応答キャッシュ / 検証用キャッシュには載せない
+    return hit_api(QUESTS_PATH, params={"offset": offset, "limit": limit},
+                   fields=CATALOG_FIELDS, revalidate=False)
+
+
+@st.cache_resource(show_spinner=False, ttl=CATALOG_TTL)
+def get_quest_catalog() -> QuestCatalog:
+    # 全セッション共有。ページは表示・検索で必要になった時点で読み込む
+    return QuestCatalog(_fetch_quest_page, page_size=CATALOG_PAGE_SIZE, max_items=CATALOG_MAX_ITEMS)
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import time
+
+import streamlit as st
+
+from api_client import get_setting
+from session_store import SessionStore, Sweeper, open_session_store
+
+# ==============================
+# セッション状態の保存と復元（URL の ?sid= をキーにストアへ）
+# ==============================
+# 初回の再実行でだけストアから読み込み、以降は前回保存した内容と比べて変わったキーだけを書き戻す。
+logger = logging.getLogger(__name__)
+
+SESSION_PARAM = "sid"
+SESSION_STORE = get_setting("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = get_setting(
+    "SESSION_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "sessions.sqlite"),
+)
+# 最終アクセスからこの秒数を過ぎたセッションは掃除する
+SESSION_IDLE_TTL = get_setting("SESSION_IDLE_TTL", 7 * 24 * 3600.0)
+SESSION_SWEEP_INTERVAL = get_setting("SESSION_SWEEP_INTERVAL", 600.0)
+# 変更が無くてもこの間隔で最終アクセス時刻を更新する（閲覧だけのセッションを消さないため）
+SESSION_TOUCH_INTERVAL = get_setting("SESSION_TOUCH_INTERVAL", 300.0)
+
+# セッションごとに保持する記録履歴の上限（古いものから捨てる）
+HISTORY_MAX = get_setting("SESSION_HISTORY_MAX", 50)
+
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+_TOKEN = "_session_token"
+_SNAPSHOT = "_session_snapshot"
+_TOUCHED = "_session_touched"
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_store() -> SessionStore | None:
+    # プロセス共有。開けなければ永続化なし（従来どおりメモリ上のセッション状態のみ）
+    try:
+        store = open_session_store(SESSION_STORE, SESSION_STORE_PATH)
+    except (OSError, sqlite3.Error, ImportError, AttributeError) as e:
+        logger.warning("session store disabled: %s", e)
+        return None
+    if store is not None:
+        Sweeper(store, SESSION_IDLE_TTL, SESSION_SWEEP_INTERVAL).start()
+    return store
+
+
+def to_state(value):
+    # json.dumps の default。to_state() を持つ値（RecordHistory 等）はその形で保存する
+    fn = getattr(value, "to_state", None)
+    if fn is None:
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return fn()
+
+
+def _encode(value) -> str | None:
+    try:
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=to_state)
+    except (TypeError, ValueError):
+        return None  # JSON にできない値は保存しない
+
+
+def _token_from_url() -> str | None:
+    try:
+        raw = st.query_params.get(SESSION_PARAM)
+    except Exception:
+        raw = st.experimental_get_query_params().get(SESSION_PARAM)
+    if isinstance(raw, list):
+        raw = raw[0] if raw else None
+    return raw if isinstance(raw, str) and _TOKEN_RE.match(raw) else None
+
+
+def restore_session(keys, decoders: dict | None = None) -> bool:
+    """初回の再実行で ``keys`` をストアから復元する。復元できたら True。
+
+    ``decoders`` はキーごとの復元関数（保存時に to_state() した値を元の型に戻す）。
+    """
+    if _SNAPSHOT in st.session_state:
+        return False
+    store = get_session_store()
+    if store is None:
+        return False
+    token = _token_from_url()
+    saved = None
+    if token is not None:
+        try:
+            saved = store.load(token)
+        except (OSError, sqlite3.Error, ValueError) as e:
+            logger.warning("session restore failed: %s", e)
+    else:
+        token = secrets.token_urlsafe(16)
+        try:
+            st.query_params[SESSION_PARAM] = token
+        except Exception:
+            st.experimental_set_query_params(**{SESSION_PARAM: token})
+
+    snapshot = {}
+    for k in keys:
+        if saved and k in saved:
+            value = saved[k]
+            if decoders and k in decoders:
+                try:
+                    value = decoders[k](value)
+                except (TypeError, ValueError, KeyError) as e:
+                    logger.warning("session value %s dropped: %s", k, e)
+                    continue
+            st.session_state[k] = value
+            snapshot[k] = _encode(value)
+    st.session_state[_TOKEN] = token
+    st.session_state[_SNAPSHOT] = snapshot
+    st.session_state[_TOUCHED] = time.time() if saved is not None else 0.0
+    return bool(saved)
+
+
+def persist_session(keys):
+    """前回保存時から変わった ``keys`` だけをストアへ書き戻す。"""
+    snapshot = st.session_state.get(_SNAPSHOT)
+    store = get_session_store()
+    if snapshot is None or store is None:
+        return
+    changes, encoded, deleted = {}, {}, []
+    for k in keys:
+        if k in st.session_state:
+            enc = _encode(st.session_state[k])
+            if enc is not None and snapshot.get(k) != enc:
+                changes[k], encoded[k] = json.loads(enc), enc
+        elif k in snapshot:
+            deleted.append(k)
+    now = time.time()
+    if not changes and not deleted and now - st.session_state.get(_TOUCHED, 0.0) < SESSION_TOUCH_INTERVAL:
+        return
+    try:
+        store.save(st.session_state[_TOKEN], changes, deleted)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("session save failed: %s", e)
+        return
+    snapshot.update(encoded)
+    for k in deleted:
+        snapshot.pop(k, None)
+    st.session_state[_TOUCHED] = now
@@ -0,0 +1,189 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from html import escape
+
+import streamlit as st
+
+from templates import Template, render_card, style_block
+
+# ==============================
+# 画面共通の部品（メイン画面と pages/ の両方で使う）
+# ==============================
+JST = timezone(timedelta(hours=9))
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(ROOT_DIR, "pages")
+MAIN_SCRIPT = "streamlit_app.py"
+
+# 旧マルチページ構成のページ名 → メイン画面のステップ（ページが無い場合の遷移先）
+PAGE_STEPS = {"01_record.py": 1, "02_nft.py": 2, "03_overview.py": 4, MAIN_SCRIPT: 0}
+
+# ==============================
+# CSS（カード/ボタン/フローティング・ステータス、h3アンカー消し）
+# ==============================
+APP_CSS = """
+    .stApp { max-width: 100%; padding: 0; }
+    .main { padding: 0 1rem; }
+    .main-header {
+        text-align: center; padding: 1.5rem 1rem;
+        background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
+        color: white; border-radius: 10px; margin-bottom: 1.5rem;
+    }
+    .main-header h1 { font-size: 1.5rem; margin-bottom: 0.5rem; }
+    .main-header p { font-size: 0.9rem; margin-top: 0.5rem; }
+
+    .demo-card {
+        background: white; padding: 1.5rem; border-radius: 15px;
+        box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        margin-bottom: 1.5rem; border: 2px solid #f0f0f0;
+        animation: slideDown 0.5s ease-out;
+    }
+    
+    @keyframes slideDown {
+        from {
+            opacity: 0;
+            transform: translateY(-20px);
+        }
+        to {
+            opacity: 1;
+            transform: translateY(0);
+        }
+    }
+    
+    .highlight-box {
+        background: #f8f9fa; padding: 1rem; border-radius: 10px;
+        border-left: 4px solid #1e3c72; margin: 1rem 0; font-size: 0.9rem;
+    }
+    .big-number { font-size: 2rem; font-weight: bold; color: #1e3c72; text-align: center; }
+    .certificate {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white; padding: 1.5rem; border-radius: 15px;
+        text-align: center; margin: 1.5rem 0;
+    }
+    .benefit-box {
+        background: #e3f2fd; padding: 1rem; border-radius: 10px;
+        margin: 1rem 0; border: 1px solid #90caf9; font-size: 0.9rem;
+    }
+    .step-indicator {
+        background: #1e3c72; color: white; padding: 0.4rem 0.8rem;
+        border-radius: 20px; display: inline-block; margin-bottom: 1rem; font-size: 0.85rem;
+    }
+    
+    .step-completed {
+        background: #4caf50; color: white; padding: 0.4rem 0.8rem;
+        border-radius: 20px; display: inline-block; margin-bottom: 1rem; font-size: 0.85rem;
+    }
+
+    /* ボタンはカード/ナビ内のみワイド化 */
+    .demo-card div[data-testid="stButton"] > button,
+    .step-nav  div[data-testid="stButton"] > button { width: 100%; padding: 0.8rem; font-size: 1rem; }
+    .demo-card div[data-testid="stButton"] > button:disabled,
+    .step-nav  div[data-testid="stButton"] > button:disabled {
+        background-color: #cccccc !important; color: #666666 !important;
+        cursor: not-allowed !important; opacity: 0.6 !important;
+    }
+
+    /* ラベル無し内部ボタンを非表示（謎の空白pill対策） */
+    div[data-testid="stButton"] > button:empty { display:none !important; padding:0 !important; border:0 !important; width:0 !important; height:0 !important; }
+
+    .step-nav { margin-top: 1rem; }
+    .soft-hr { border: none; border-top: 1px solid #ECEFF4; margin: 16px 0; }
+
+    /* 右下フローティング・ステータス */
+    .status-float { position: fixed; right: 16px; bottom: 16px; z-index: 1000; }
+    @media (max-width: 600px) { .status-float { right: 10px; bottom: 10px; transform: scale(.95); } }
+
+    /* h3 見出しのアンカーリンクアイコンを非表示 */
+    h3 a, .stMarkdown h3 a, h3 .anchor, h3 .anchor-link { display: none !important; }
+    
+    /* 完了セクションを少し薄く */
+    .completed-section {
+        opacity: 0.9;
+    }
+    
+    /* プログレスバー */
+    .progress-container {
+        background: #f0f0f0;
+        border-radius: 10px;
+        height: 8px;
+        margin: 1rem 0;
+        overflow: hidden;
+    }
+    .progress-bar {
+        background: linear-gradient(90deg, #1e3c72, #2a5298);
+        height: 100%;
+        transition: width 0.5s ease;
+    }
+"""
+
+HEADER_HTML = """
+<div class="main-header">
+    <h1>🎓 Team X ブロックチェーン学習・実績証明</h1>
+    <p>実績を永久に、確実に、証明する</p>
+</div>
+"""
+
+# 固定のサンプル履歴（全セッション・全ページ共通）
+SAMPLE_RECORDS = (
+    ("Python基礎講座", 95),
+    ("データ分析入門", 88),
+    ("機械学習基礎", 92),
+)
+
+
+def css():
+    # 空白・コメントを削った <style> をプロセスで1回だけ生成して送る
+    st.markdown(style_block(APP_CSS), unsafe_allow_html=True)
+
+
+def header():
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
+
+
+def now_jst_str(fmt="%Y-%m-%d %H:%M:%S"):
+    return datetime.now(JST).strftime(fmt)
+
+
+def card(md: str, completed=False):
+    # 静的カードは前処理済みHTMLをキャッシュから返す
+    st.markdown(render_card(md, completed), unsafe_allow_html=True)
+
+
+def card_t(template: Template, completed=False, **params):
+    # 動的カードは値だけ差し込む（値のエスケープは呼び出し側）
+    st.markdown(template.render(completed, **params), unsafe_allow_html=True)
+
+
+@st.cache_resource(show_spinner=False)
+def sample_history_md() -> str:
+    # ハッシュ計算ごとプロセスで1回だけ組み立て、全セッションで同じ文字列を参照する
+    rec_html = []
+    for title, score in SAMPLE_RECORDS:
+        hv = hashlib.sha256(f"{title}-{score}".encode("utf-8")).hexdigest()
+        rec_html.append(f"""
+<div class="highlight-box" style="margin-bottom: 0.5rem; padding: 0.8rem;">
+<p style="margin: 0;"><strong>{escape(title)}</strong> ({score}点)</p>
+<p style="font-size: 0.7rem; color: #666; margin: 0.3rem 0 0 0;">Hash: {hv[:20]}...</p>
+</div>""")
+    return "<h3>🔍 検証可能な学習履歴</h3>\n" + "\n".join(rec_html)
+
+
+def hr():
+    st.markdown('<hr class="soft-hr" />', unsafe_allow_html=True)
+
+
+def primary_button(label: str, disabled: bool = False):
+    try:
+        return st.button(label, type="primary", use_container_width=True, disabled=disabled)
+    except TypeError:
+        return st.button(label, disabled=disabled)
+
+
+def go(page: str):
+    """ページへ移動する。pages/ に無い旧ページ名はメイン画面の該当ステップへ。"""
+    name = os.path.basename(page)
+    if name != MAIN_SCRIPT and os.path.exists(os.path.join(PAGES_DIR, name)):
+        st.switch_page(f"pages/{name}")
+    st.session_state.demo_step = PAGE_STEPS.get(name, 0)
+    st.switch_page(MAIN_SCRIPT)